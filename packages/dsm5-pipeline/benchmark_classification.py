@@ -0,0 +1,102 @@
+"""
+benchmark_classification.py
+
+Scaling of the classification tokenizer (tokenize_classification, which backs
+extract_disorder_entries / build_family_hierarchy) on inflated input.
+
+The DSM-5 Classification section is repeated 1x, 2x, 4x, ... and tokenized at
+each size; the report has the best-of-N time, the time per line and the entry
+count per size, plus the exponent of a log-log fit of time against size. A
+linear parser fits an exponent close to 1; above --max-exponent the run fails
+(exit code 1).
+
+Example:
+    python benchmark_classification.py --factors 1 2 4 8 16 32
+    python benchmark_classification.py --text classification.txt --out scaling.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import time
+from typing import Any, Callable, Dict, List
+
+from dsm_pdf_parser import build_family_hierarchy, get_classification_text, tokenize_classification
+
+DEFAULT_PDF = "data/DSM-5-By-American-Psychiatric-Association.pdf"
+
+
+def _best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _loglog_slope(xs: List[float], ys: List[float]) -> float:
+    """Least-squares slope of log(y) against log(x)."""
+    lx = [math.log(x) for x in xs]
+    ly = [math.log(y) for y in ys]
+    mx, my = sum(lx) / len(lx), sum(ly) / len(ly)
+    den = sum((x - mx) ** 2 for x in lx)
+    return sum((x - mx) * (y - my) for x, y in zip(lx, ly)) / den if den else 0.0
+
+
+def benchmark_scaling(text: str, factors: List[int], repeat: int = 3) -> Dict[str, Any]:
+    sizes = []
+    for k in factors:
+        inflated = "\n".join([text] * k)
+        n_lines = inflated.count("\n") + 1
+        tokens = tokenize_classification(inflated)
+        seconds = _best_of(lambda: tokenize_classification(inflated), repeat)
+        sizes.append(
+            {
+                "factor": k,
+                "lines": n_lines,
+                "entries": sum(1 for tok in tokens if tok["kind"] == "entry"),
+                "ms": round(seconds * 1000, 3),
+                "us_per_line": round(seconds * 1e6 / n_lines, 3),
+            }
+        )
+    exponent = _loglog_slope([s["lines"] for s in sizes], [s["ms"] for s in sizes]) if len(sizes) > 1 else None
+    return {
+        "sizes": sizes,
+        "exponent": round(exponent, 3) if exponent is not None else None,
+        "hierarchy_ms": round(_best_of(lambda: build_family_hierarchy(text), repeat) * 1000, 3),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--pdf", default=DEFAULT_PDF, help="Read the classification section from this PDF")
+    src.add_argument("--text", help="Classification text file (skips PDF extraction)")
+    ap.add_argument("--factors", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-exponent", type=float, default=1.15, help="Fail when the fitted exponent is above this")
+    ap.add_argument("--out", help="Also write the report JSON here")
+    args = ap.parse_args()
+
+    if args.text:
+        with open(args.text, "r", encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = get_classification_text(args.pdf)
+
+    report = benchmark_scaling(text, args.factors, args.repeat)
+    report["max_exponent"] = args.max_exponent
+    blob = json.dumps(report, indent=2)
+    print(blob)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(blob + "\n")
+    if report["exponent"] is not None and report["exponent"] > args.max_exponent:
+        raise SystemExit(f"Tokenizer time grows as n^{report['exponent']} (limit n^{args.max_exponent})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+benchmark_formatter.py
+
+Throughput of the compiled formatter engine (format_engine) against the original
+chain of step functions, on the page texts of one or more extraction JSON files
+(the {"blacklist", "pages"} output of dsm_document_formatter.py / family_batch.py).
+The step functions live here only, as the reference the engine is checked against.
+
+Each input is formatted both ways as a whole document and page by page; the
+outputs must be identical, and the best-of-N time for each is reported.
+
+Example:
+    python benchmark_formatter.py data/disorders/*.json --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List
+
+from dsm_document_formatter import cleanup_blank_lines
+from format_engine import ENGINE
+
+# Reference implementation: the original formatting steps, one re.sub pass each. The
+# engine's rules are the only ones the pipeline runs; these are kept to check them against.
+
+HEADER_PATTERNS = [
+    re.compile(r"^\s*\d{1,4}\s+[A-Z][A-Za-z].*(Disorder|Disorders)\s*$"),
+    re.compile(r"^\s*[A-Z][A-Za-z].*(Disorder|Disorders)\s+\d{1,4}\s*$"),
+    re.compile(r"^\s*Depressive\s+Disorders\s*$", re.IGNORECASE),
+]
+
+
+def remove_running_headers(text: str) -> str:
+    text = re.sub(r"\s*\b\d{1,4}\s+Depressive\s+Disorders\b\s*", " ", text)
+    text = re.sub(r"\s*\bMajor\s+Depressive\s+Disorder\s+\d{1,4}\b\s*", " ", text)
+    text = re.sub(r"\s*\bDepressive\s+Disorders\b\s*", " ", text)
+
+    lines = text.splitlines()
+    kept = []
+    for ln in lines:
+        if any(p.match(ln.strip()) for p in HEADER_PATTERNS):
+            continue
+        kept.append(ln)
+    return "\n".join(kept)
+
+
+def fix_hyphen_linebreaks(text: str) -> str:
+    return re.sub(r"-\s*\n\s*", "", text)
+
+
+def normalize_spaces(text: str) -> str:
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+
+    text = re.sub(r",(?=\S)", ", ", text)
+    text = re.sub(r";(?=\S)", "; ", text)
+    text = re.sub(r":(?=\S)", ": ", text)
+
+    text = re.sub(r"([A-Za-z0-9])\(", r"\1 (", text)
+    text = re.sub(r"\s+([,.;:!?])", r"\1", text)
+    text = re.sub(r"\(\s+", "(", text)
+    text = re.sub(r"\s+\)", ")", text)
+
+    return text.strip()
+
+
+def collapse_spaced_letters(text: str) -> str:
+    def _collapse(match: re.Match) -> str:
+        return match.group(0).replace(" ", "")
+
+    text = re.sub(r"(?<!\w)(?:[A-Za-z]\s){2,}[A-Za-z](?!\w)", _collapse, text)
+    text = re.sub(r"(?<!\d)(?:\d\s){1,}\d(?!\d)", _collapse, text)
+    return text
+
+
+def normalize_icd_codes(text: str) -> str:
+    def compact(code: str) -> str:
+        return re.sub(r"\s+", "", code)
+
+    text = re.sub(
+        r"\(\s*F\s*([0-9][0-9.\s]*)\)",
+        lambda m: f"(F{compact(m.group(1))})",
+        text,
+    )
+    text = re.sub(
+        r"\bF\s*([0-9][0-9.\s]*[0-9])\b",
+        lambda m: f"F{compact(m.group(1))}",
+        text,
+    )
+    return text
+
+
+def insert_section_breaks(text: str) -> str:
+    text = re.sub(r"\n(?=[A-Z][A-Za-z].*(Disorder|Disorders)\b)", "\n\n", text)
+    text = re.sub(r"\s*(Note:)\s*", r"\n\n\1 ", text)
+    return text
+
+
+def format_lettered_criteria(text: str) -> str:
+    text = re.sub(r"\s*([A-Z])\.\s*", r"\n\n\1.\n", text)
+    text = re.sub(
+        r"\bCriteria\s+([A-Z])\s*[\u2013-]\s*([A-Z])\b",
+        lambda m: f"Criteria {m.group(1)}{chr(8211)}{m.group(2)}",
+        text,
+    )
+    return text
+
+
+def format_numbered_list(text: str) -> str:
+    text = re.sub(r"(\b\d{1,2})\.\s*", r"\1. ", text)
+    text = re.sub(r"(?<!\n)(\b\d{1,2}\.)\s*", r"\n\n\1 ", text)
+    return text
+
+
+def format_notes_and_coding(text: str) -> str:
+    text = re.sub(r"\s*(Coding and Recording Procedures)\s*", r"\n\n\1\n", text)
+    text = re.sub(r"\s*(Recording Procedures)\s*", r"\n\n\1\n", text)
+    text = re.sub(r"\s*(Specify:)\s*", r"\n\n\1\n", text)
+    text = re.sub(r"\s*(Specify if:)\s*", r"\n\n\1\n", text)
+    return text
+
+
+def deglue_common_collapses(text: str) -> str:
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    text = re.sub(r"([A-Za-z])(\d)", r"\1 \2", text)
+    text = re.sub(r"(\d)([A-Za-z])", r"\1 \2", text)
+    return text
+
+
+CHAIN_NORMALIZE = [
+    fix_hyphen_linebreaks,
+    normalize_icd_codes,
+    remove_running_headers,
+    normalize_spaces,
+    collapse_spaced_letters,
+    deglue_common_collapses,
+]
+
+CHAIN_DOCUMENT = CHAIN_NORMALIZE + [
+    insert_section_breaks,
+    format_lettered_criteria,
+    format_numbered_list,
+    format_notes_and_coding,
+    cleanup_blank_lines,
+]
+
+
+def _chain(steps: List[Callable[[str], str]]) -> Callable[[str], str]:
+    def run(text: str) -> str:
+        for step in steps:
+            text = step(text)
+        return text
+
+    return run
+
+
+def _best_of(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def benchmark(texts: List[str], repeat: int = 3) -> Dict[str, Any]:
+    raw = "\n".join(texts)
+    report: Dict[str, Any] = {"pages": len(texts), "chars": len(raw)}
+    for name, chain, engine in (
+        ("normalize", _chain(CHAIN_NORMALIZE), ENGINE.normalize),
+        ("document", _chain(CHAIN_DOCUMENT), ENGINE.document),
+    ):
+        identical = chain(raw) == engine(raw) and all(chain(t) == engine(t) for t in texts)
+        t_chain = _best_of(lambda: chain(raw), repeat)
+        t_engine = _best_of(lambda: engine(raw), repeat)
+        t_chain_pages = _best_of(lambda: [chain(t) for t in texts], repeat)
+        t_engine_pages = _best_of(lambda: [engine(t) for t in texts], repeat)
+        report[name] = {
+            "identical": identical,
+            "chain_seconds": round(t_chain, 4),
+            "engine_seconds": round(t_engine, 4),
+            "chain_mchars_per_sec": round(len(raw) / t_chain / 1e6, 3),
+            "engine_mchars_per_sec": round(len(raw) / t_engine / 1e6, 3),
+            "speedup": round(t_chain / t_engine, 2),
+            "per_page_chain_seconds": round(t_chain_pages, 4),
+            "per_page_engine_seconds": round(t_engine_pages, 4),
+            "per_page_speedup": round(t_chain_pages / t_engine_pages, 2),
+        }
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("inputs", nargs="+", help="Extraction JSON files ({'pages': [{'text': ...}]})")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", help="Also write the report JSON here")
+    args = ap.parse_args()
+
+    texts: List[str] = []
+    for path in args.inputs:
+        with open(path, "r", encoding="utf-8") as f:
+            texts.extend(p.get("text", "") for p in json.load(f)["pages"])
+
+    report = benchmark(texts, args.repeat)
+    blob = json.dumps(report, indent=2)
+    print(blob)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(blob + "\n")
+    if not all(report[k]["identical"] for k in ("normalize", "document")):
+        raise SystemExit("Engine output differs from the step-function chain")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+benchmark_pipeline.py
+
+Stage-level benchmark of the extraction + formatting pipeline on fixed page sets
+of the bundled DSM-5 PDF.
+
+Each stage runs in isolation: its inputs are prepared first, then only the stage
+itself is timed, once per page per repeat.
+- parse:      backend.page(i) with its layout forced, on a separate backend instance
+- words:      BackendPage.words(), chars grouped into words
+- tables:     _extract_tables_best_effort (ruled-lines precheck + find_tables)
+- lines:      _page_lines, words clustered into line records (table text dropped)
+- order:      _detect_columns + _order_lines_reading
+- cleanup:    _cleanup_text on the ordered page text
+- format_txt: format_as_document on the page text
+- format_md:  format_as_markdown on the page record
+
+Per page set and stage the report has pages/sec, p50/p90/p99 milliseconds per
+page and the peak traced Python allocation (tracemalloc, measured in a separate
+untimed pass). With --baseline, every stage's p50 is compared to the stored
+report and a slowdown above --threshold is listed under "regressions" (exit code 1).
+
+Example:
+    python benchmark_pipeline.py --out bench.json
+    python benchmark_pipeline.py --baseline bench.json --threshold 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dsm_document_formatter import (
+    PageLayer,
+    _cleanup_text,
+    _detect_columns,
+    _extract_tables_best_effort,
+    _order_lines_reading,
+    _page_lines,
+    _peak_rss_bytes,
+    format_as_document,
+    format_as_markdown,
+)
+from extraction_backends import BACKENDS, open_backend
+
+DEFAULT_PDF = "data/DSM-5-By-American-Psychiatric-Association.pdf"
+
+# 1-based PDF pages
+PAGE_SETS: Dict[str, List[int]] = {
+    # criteria sets and running text (Depressive Disorders), no ruled lines
+    "narrative": [144, 147, 151, 153, 157, 158, 159, 160],
+    # DSM-5 Classification listing: codes, names and page refs, many short lines
+    "classification": [14, 16, 18, 19, 20, 21, 22, 23],
+    # index pages laid out in two columns
+    "two_column": [430, 434, 436, 440],
+    # pages with ruled lines, so table detection runs (page 4 has real tables)
+    "tables": [2, 4, 6, 10, 13],
+}
+
+STAGES = ["parse", "words", "tables", "lines", "order", "cleanup", "format_txt", "format_md"]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _page_stage_calls(
+    backend: str, pdf_path: str, page_no: int
+) -> Tuple[List[Tuple[str, Callable[[], Any]]], Callable[[], None]]:
+    """
+    ([(stage, zero-arg call)], close) for one page; the inputs of every call are
+    computed up front. "parse" gets its own backend instance: it drops the parsed
+    layout after each call (pdfplumber parses lazily and keeps it on the page), which
+    must not make the later stages re-parse.
+    """
+    index = page_no - 1
+    src = open_backend(backend, pdf_path)
+    parse_src = open_backend(backend, pdf_path)
+
+    def close() -> None:
+        src.close()
+        parse_src.close()
+
+    try:
+        page = src.page(index)
+        words = page.words()
+        tables, skipped = _extract_tables_best_effort(page)
+        layer = PageLayer(page.width, page.height, words, tables, skipped)
+        page_lines = _page_lines(layer, page_no, remove_table_text_from_flow=True)
+        line_tuples = [(x0, txt, top) for x0, txt, top, _ in page_lines.lines]
+        width = page.width
+        raw_text = "\n".join(_order_lines_reading(line_tuples, _detect_columns(line_tuples, width), width))
+        text = _cleanup_text(raw_text)
+        record = {"page": page_no, "text": text, "tables": tables}
+    except Exception:
+        close()
+        raise
+
+    def parse() -> None:
+        parsed = parse_src.page(index)
+        parsed.edges()  # forces pdfplumber's lazy layout pass
+        parsed.close()
+
+    def order() -> Any:
+        return _order_lines_reading(line_tuples, _detect_columns(line_tuples, width), width)
+
+    calls = [
+        ("parse", parse),
+        ("words", page.words),
+        ("tables", lambda: _extract_tables_best_effort(page)),
+        ("lines", lambda: _page_lines(layer, page_no, remove_table_text_from_flow=True)),
+        ("order", order),
+        ("cleanup", lambda: _cleanup_text(raw_text)),
+        ("format_txt", lambda: format_as_document([text])),
+        ("format_md", lambda: format_as_markdown([record])),
+    ]
+    return calls, close
+
+
+def benchmark_page_set(
+    pdf_path: str,
+    pages: List[int],
+    repeat: int = 3,
+    backend: str = "pdfplumber",
+    measure_memory: bool = True,
+) -> Dict[str, Any]:
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    peak_kb: Dict[str, int] = {stage: 0 for stage in STAGES}
+    for page_no in pages:
+        calls, close = _page_stage_calls(backend, pdf_path, page_no)
+        try:
+            for stage, call in calls:
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    call()
+                    timings[stage].append(time.perf_counter() - t0)
+                if measure_memory:
+                    tracemalloc.start()
+                    call()
+                    peak_kb[stage] = max(peak_kb[stage], tracemalloc.get_traced_memory()[1] // 1024)
+                    tracemalloc.stop()
+        finally:
+            close()
+
+    out: Dict[str, Any] = {"pages": pages, "stages": {}}
+    total = 0.0
+    for stage in STAGES:
+        values = timings[stage]
+        per_page = sum(values) / repeat / len(pages)
+        total += per_page
+        out["stages"][stage] = {
+            "pages_per_sec": round(1 / per_page, 2) if per_page else None,
+            "p50_ms": round(_percentile(values, 50) * 1000, 3),
+            "p90_ms": round(_percentile(values, 90) * 1000, 3),
+            "p99_ms": round(_percentile(values, 99) * 1000, 3),
+            "peak_kb": peak_kb[stage] if measure_memory else None,
+        }
+    out["pipeline_pages_per_sec"] = round(1 / total, 2) if total else None
+    return out
+
+
+def find_regressions(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Stages whose p50 is more than `threshold` (0.2 = 20%) slower than in `baseline`."""
+    regressions = []
+    for set_name, result in report["page_sets"].items():
+        base_set = baseline.get("page_sets", {}).get(set_name)
+        if not base_set:
+            continue
+        for stage, stats in result["stages"].items():
+            base = base_set["stages"].get(stage)
+            if not base or not base["p50_ms"]:
+                continue
+            ratio = stats["p50_ms"] / base["p50_ms"]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    {
+                        "page_set": set_name,
+                        "stage": stage,
+                        "baseline_p50_ms": base["p50_ms"],
+                        "p50_ms": stats["p50_ms"],
+                        "slowdown": round(ratio - 1, 3),
+                    }
+                )
+    return regressions
+
+
+def run_benchmarks(
+    pdf_path: str = DEFAULT_PDF,
+    page_sets: Optional[List[str]] = None,
+    repeat: int = 3,
+    backend: str = "pdfplumber",
+    measure_memory: bool = True,
+) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"pdf": pdf_path, "backend": backend, "repeat": repeat, "page_sets": {}}
+    for name in page_sets or list(PAGE_SETS):
+        report["page_sets"][name] = benchmark_page_set(pdf_path, PAGE_SETS[name], repeat, backend, measure_memory)
+    report["peak_rss_mb"] = round(_peak_rss_bytes() / (1024 * 1024), 1)
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf", default=DEFAULT_PDF)
+    ap.add_argument("--sets", nargs="+", choices=sorted(PAGE_SETS), help="Page sets to run (default: all)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--backend", choices=sorted(BACKENDS), default="pdfplumber")
+    ap.add_argument("--no-memory", action="store_true", default=False, help="Skip the tracemalloc pass")
+    ap.add_argument("--out", help="Write the report JSON here (use it later as --baseline)")
+    ap.add_argument("--baseline", help="Earlier report to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="Allowed p50 slowdown per stage (0.2 = 20%%)")
+    args = ap.parse_args()
+
+    report = run_benchmarks(args.pdf, args.sets, args.repeat, args.backend, not args.no_memory)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["baseline"] = args.baseline
+        report["threshold"] = args.threshold
+        report["regressions"] = find_regressions(report, baseline, args.threshold)
+
+    blob = json.dumps(report, indent=2)
+    print(blob)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(blob + "\n")
+    if report.get("regressions"):
+        raise SystemExit(f"{len(report['regressions'])} stage regression(s) above {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+compare_backends.py
+
+Throughput and parity check between extraction backends on one PDF.
+
+For each backend the page range is extracted end to end (words, tables and the
+flow text of extract_dsm_pages_structured, no cache) and timed. Every backend is
+then compared page by page against the first one: raw words, tables and the final
+page text.
+
+Example:
+    python compare_backends.py --pdf data/DSM-5-By-American-Psychiatric-Association.pdf --start 1 --end 444
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from dsm_document_formatter import extract_dsm_pages_structured
+from extraction_backends import BACKENDS, open_backend
+
+
+def _raw_pages(backend: str, pdf_path: str, page_start: int, page_end: int) -> List[Dict[str, Any]]:
+    src = open_backend(backend, pdf_path)
+    try:
+        out = []
+        for i in range(page_start - 1, page_end):
+            page = src.page(i)
+            tables, _ = page.tables()
+            out.append({"size": (page.width, page.height), "words": page.words().tuples(), "tables": tables})
+        return out
+    finally:
+        src.close()
+
+
+def compare_backends(
+    pdf_path: str,
+    page_start: int = 1,
+    page_end: Optional[int] = None,
+    backends: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    backends = backends or list(BACKENDS)
+    if page_end is None:
+        src = open_backend(backends[0], pdf_path)
+        page_end = src.page_count()
+        src.close()
+    n_pages = page_end - page_start + 1
+
+    report: Dict[str, Any] = {"pdf": pdf_path, "pages": n_pages, "backends": {}}
+    raw: Dict[str, List[Dict[str, Any]]] = {}
+    texts: Dict[str, List[str]] = {}
+    for name in backends:
+        t0 = time.perf_counter()
+        raw[name] = _raw_pages(name, pdf_path, page_start, page_end)
+        t_layer = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        pages = extract_dsm_pages_structured(pdf_path, page_start=page_start, page_end=page_end, backend=name)
+        t_full = time.perf_counter() - t0
+        texts[name] = [p["text"] for p in pages]
+
+        report["backends"][name] = {
+            "layer_seconds": round(t_layer, 3),
+            "layer_pages_per_sec": round(n_pages / t_layer, 2) if t_layer else None,
+            "structured_seconds": round(t_full, 3),
+            "structured_pages_per_sec": round(n_pages / t_full, 2) if t_full else None,
+        }
+
+    reference = backends[0]
+    for name in backends[1:]:
+        mismatched = {"size": [], "words": [], "tables": [], "text": []}
+        for k in range(n_pages):
+            a, b = raw[reference][k], raw[name][k]
+            for field in ("size", "words", "tables"):
+                if a[field] != b[field]:
+                    mismatched[field].append(page_start + k)
+            if texts[reference][k] != texts[name][k]:
+                mismatched["text"].append(page_start + k)
+        identical = n_pages - len({p for pages in mismatched.values() for p in pages})
+        report["backends"][name]["parity_vs"] = reference
+        report["backends"][name]["identical_pages"] = identical
+        report["backends"][name]["mismatched_pages"] = mismatched
+
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf", required=True)
+    ap.add_argument("--start", type=int, default=1)
+    ap.add_argument("--end", type=int)
+    ap.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), help="First one is the parity reference")
+    ap.add_argument("--out", help="Also write the report JSON here")
+    args = ap.parse_args()
+
+    report = compare_backends(args.pdf, args.start, args.end, args.backends)
+    blob = json.dumps(report, indent=2)
+    print(blob)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(blob + "\n")
+
+
+if __name__ == "__main__":
+    main()
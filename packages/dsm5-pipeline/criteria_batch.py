@@ -0,0 +1,394 @@
+"""
+criteria_batch.py
+
+Batch criteria extraction: lettered diagnostic criteria (A., B., ...) for every
+disorder record in disorders.json, written to one criteria.json.
+
+Page windows come from the records' classification pages and the hierarchy
+ranges (PageRangeIndex over build_family_hierarchy output): a disorder's window
+runs from its page to the page where the next disorder of its family starts
+(inclusive, the two can share it), or to the end of its family. Those are
+printed pages; the PDF page offset is detected from the running heads (or given
+with --page-offset).
+
+Within a window the criteria run from the first start marker after the
+disorder's name to the first end marker after that, with the markers taken from
+CRITERIA_MARKERS: a default entry plus per-disorder overrides (the hand-entered
+CRITERIA_DEMO_CONFIG entries included). A later disorder's heading ends them
+too; running heads ("Conduct Disorder 221") are dropped from the text.
+
+A segment can hold several criteria sets (Bipolar I lists the Manic, Hypomanic
+and Major Depressive Episode criteria, each from "A."): the letters restart, and
+each set gets a `set` number. The first set keeps the <disorder>_A ids, later
+ones are <disorder>_S2_A, ... (group "S2_A"). A disorder whose criterion ids
+still collide is reported as "failed" and contributes no criteria.
+
+Families are extracted in a process pool, one task per family, so the pages
+that neighbouring windows share are read once by one worker. Each disorder gets
+a report entry: window, status ("ok", "no_criteria" or "failed" with the error),
+criteria and set counts, and seconds.
+
+Example:
+    python criteria_batch.py --disorders dsm5_data/disorders.json --out dsm5_data/criteria.json --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from dsm_document import DSMDocument, PdfSource, open_document, source_path
+from dsm_document_formatter import detect_page_offset
+from dsm_pdf_parser import (
+    CRITERIA_DEMO_CONFIG,
+    PageRangeIndex,
+    normalize_text_block,
+)
+
+DEFAULT_PDF = "data/DSM-5-By-American-Psychiatric-Association.pdf"
+
+# Markers are matched in the whitespace-normalized window text (normalize_text_block).
+CRITERIA_MARKERS: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "start_markers": ["A. "],
+        "end_markers": ["Specify", "Coding note", "Code based on", "Recording Procedures", "Subtypes"],
+        # Criteria follow the name and code line directly; a start marker further
+        # away belongs to some other text in the window.
+        "max_gap": 300,
+        "type": "symptom_cluster",
+    },
+    # The demo entries: the page window is derived, the markers are kept.
+    **{
+        disorder_id: {
+            "start_markers": [cfg["start_marker"]],
+            "end_markers": cfg["end_markers"],
+            "max_gap": None,
+            "type": cfg.get("type", "symptom_cluster"),
+        }
+        for disorder_id, cfg in CRITERIA_DEMO_CONFIG.items()
+    },
+}
+
+
+def _markers(disorder_id: str) -> Dict[str, Any]:
+    return {**CRITERIA_MARKERS["default"], **CRITERIA_MARKERS.get(disorder_id, {})}
+
+
+def disorder_windows(
+    disorders: List[Dict[str, Any]], sections: PageRangeIndex
+) -> Dict[str, Optional[Tuple[int, int]]]:
+    """disorder id -> inclusive printed-page window, or None when its page is outside every family."""
+    windows: Dict[str, Optional[Tuple[int, int]]] = {}
+    for disorder in disorders:
+        page = disorder["page"]
+        family = sections.bounds(page, "family")
+        own = sections.bounds(page, "disorder")
+        if family is None:
+            windows[disorder["id"]] = None
+            continue
+        end = min(own[1] + 1, family[1]) if own else family[1]
+        windows[disorder["id"]] = (page, max(end, page))
+    return windows
+
+
+# A candidate criterion letter: "A. " at the start of the text or after whitespace.
+_CRITERION_MARK_RE = re.compile(r"(?:^|(?<=\s))([A-Z])\.\s+")
+# "... in Criterion A. C. The disturbance": a letter after these words is a reference, not a criterion.
+_CRITERION_REFERENCE_RE = re.compile(r"\b(?:Criterion|Criteria|and|or)\s*$")
+# Footnote letters the classification appends to a name: "Disordera", "(Dysthymia)a", "Disordera, b".
+_FOOTNOTE_RE = re.compile(r"(?:(?<=Disorder)|(?<=Disorders)|(?<=\)))[a-e](?:, [a-e])*$")
+# A disorder heading's code line: "312.33 (F63.1)", "311 (F32.9)".
+_CODE_LINE_RE = re.compile(r"\b\d{3}(?:\.\d{1,2})? \([A-Z]\d{2}(?:\.[0-9A-Z]{1,4})?\)")
+
+
+def _find_first(text: str, markers: List[str], start: int = 0) -> Tuple[int, str]:
+    """(position, marker) of the earliest marker at or after `start`, or (-1, "")."""
+    best, found = -1, ""
+    for marker in markers:
+        at = text.find(marker, start)
+        if at != -1 and (best == -1 or at < best):
+            best, found = at, marker
+    return best, found
+
+
+def _name_text(name: str) -> str:
+    # A name broken at a hyphen ("Obsessive-\nCompulsive") keeps the hyphen in the running text,
+    # and footnote letters from the classification ("Major Depressive Disordera") are not in it.
+    name = normalize_text_block(re.sub(r"-\s*\n\s*", "-", name))
+    return _FOOTNOTE_RE.sub("", name)
+
+
+def _heading_re(name: str) -> "re.Pattern[str]":
+    """
+    `name` (already _name_text) as a heading, not a running head ("Kleptomania 225"): it
+    is not followed by a page number, though it can be by a code ("Unspecified Depressive
+    Disorder 311 (F32.9)"). A hyphen the classification dropped ("ObsessiveCompulsive") may be back.
+    """
+    pattern = re.sub(r"([a-z])([A-Z])", r"\1-?\2", re.escape(name))
+    return re.compile(pattern + r"(?! \d{1,3}(?: (?!\()|$))")
+
+
+def criteria_segment(
+    text: str, name: str, markers: Dict[str, Any], stop_names: Optional[List[str]] = None
+) -> Optional[str]:
+    """
+    The criteria text of disorder `name` in a normalized window, or None when it
+    has no start marker before the first of `stop_names` (the disorders after it).
+    """
+    name = _name_text(name)
+    heading_re = _heading_re(name)
+    heading = heading_re.search(text)
+    name_at = heading.start() if heading else -1
+    after_name = heading.end() if heading else 0
+    stop_res = [_heading_re(n) for n in map(_name_text, stop_names or []) if n != name]
+    stops = [m.start() for m in (r.search(text, after_name) for r in stop_res) if m]
+    if stops:
+        text = text[: min(stops)]
+    start, marker = _find_first(text, markers["start_markers"], after_name)
+    # "... in Criterion A. Severe: ..." refers to a criterion of the previous disorder.
+    while start != -1 and _CRITERION_REFERENCE_RE.search(text[:start]):
+        start, marker = _find_first(text, markers["start_markers"], start + 1)
+    if start == -1:
+        return None
+    if name_at != -1 and markers["max_gap"] is not None and start - after_name > markers["max_gap"]:
+        return None
+    # A start marker phrase is not part of the criteria; "A. " is the first of them.
+    if marker.strip() != "A.":
+        start += len(marker)
+    end, _ = _find_first(text, markers["end_markers"], start + 1)
+    segment = text[start:end] if end != -1 else text[start:]
+    # Drop running heads ("Conduct Disorder 221") of this disorder and the ones after it.
+    for head_re in [heading_re] + stop_res:
+        segment = re.sub(r"\s+" + head_re.pattern.split("(?!", 1)[0] + r" \d{1,3}(?= |$)", "", segment)
+    return segment
+
+
+def criteria_sets(segment: str) -> List[List[Dict[str, Any]]]:
+    """
+    Lettered criteria of a segment, split into sets: a letter continues the current
+    set only if it is the next one (A, B, C, ...), and an "A. " after later letters
+    starts a new set (Bipolar I's Manic, Hypomanic and Major Depressive Episode
+    criteria), unless a disorder code line comes before it: that is the next
+    disorder, and the criteria end there. Any other letter is left in the
+    description it appears in.
+    """
+    marks: List[Tuple[int, int, str]] = []
+    end = len(segment)
+    for m in _CRITERION_MARK_RE.finditer(segment):
+        letter = m.group(1)
+        expected = chr(ord(marks[-1][2]) + 1) if marks else "A"
+        if letter == expected:
+            marks.append((m.start(), m.end(), letter))
+        elif letter == "A" and not _CRITERION_REFERENCE_RE.search(segment[: m.start()]):
+            code = _CODE_LINE_RE.search(segment, marks[-1][1], m.start())
+            if code:
+                # The next disorder's heading and code line: the criteria end before its name.
+                sentence_end = segment.rfind(". ", marks[-1][1], code.start())
+                end = sentence_end + 1 if sentence_end != -1 else code.start()
+                break
+            marks.append((m.start(), m.end(), letter))
+
+    sets: List[List[Dict[str, Any]]] = []
+    for k, (_, body_start, letter) in enumerate(marks):
+        body_end = marks[k + 1][0] if k + 1 < len(marks) else end
+        if letter == "A":
+            sets.append([])
+        sets[-1].append({"code": letter, "description": segment[body_start:body_end].strip(), "subcriteria": []})
+    return sets
+
+
+def _disorder_criteria(
+    doc: DSMDocument,
+    disorder: Dict[str, Any],
+    window: Tuple[int, int],
+    stop_names: List[str],
+    page_offset: int,
+) -> List[Dict[str, Any]]:
+    markers = _markers(disorder["id"])
+    text = normalize_text_block(doc.page_range_text(window[0] + page_offset, window[1] + page_offset))
+    segment = criteria_segment(text, disorder["name"], markers, stop_names)
+    if segment is None:
+        return []
+    records: List[Dict[str, Any]] = []
+    for set_no, criteria in enumerate(criteria_sets(segment), start=1):
+        # The first set keeps the demo ids (<disorder>_A); later ones are <disorder>_S2_A, ...
+        prefix = disorder["id"] if set_no == 1 else f"{disorder['id']}_S{set_no}"
+        for criterion in criteria:
+            records.append(
+                {
+                    "id": f"{prefix}_{criterion['code']}",
+                    "disorder_id": disorder["id"],
+                    "code": criterion["code"],
+                    "group": criterion["code"] if set_no == 1 else f"S{set_no}_{criterion['code']}",
+                    "set": set_no,
+                    "type": markers["type"],
+                    "description": criterion["description"],
+                    "question_suggestion_id": None,
+                    "required": True,
+                    "subcriteria": criterion["subcriteria"],
+                }
+            )
+    return records
+
+
+def _duplicate_ids(criteria: List[Dict[str, Any]]) -> List[str]:
+    seen: set = set()
+    duplicates = [c["id"] for c in criteria if c["id"] in seen or seen.add(c["id"])]
+    return sorted(set(duplicates))
+
+
+def _criteria_worker(
+    pdf: PdfSource, tasks: List[Tuple[Dict[str, Any], Tuple[int, int]]], page_offset: int
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Criteria and report entries for one family's disorders, over one document handle."""
+    criteria: List[Dict[str, Any]] = []
+    report: List[Dict[str, Any]] = []
+    with open_document(pdf) as doc:
+        for k, (disorder, window) in enumerate(tasks):
+            # Disorders of the family that start on a later page (the list is not in page
+            # order), or on the same page but listed later.
+            stop_names = [
+                d["name"]
+                for j, (d, _) in enumerate(tasks)
+                if d["page"] > disorder["page"] or (j > k and d["page"] == disorder["page"])
+            ]
+            entry: Dict[str, Any] = {"disorder_id": disorder["id"], "pages": list(window)}
+            t0 = time.perf_counter()
+            try:
+                found = _disorder_criteria(doc, disorder, window, stop_names, page_offset)
+            except Exception as exc:
+                entry.update(status="failed", error=f"{type(exc).__name__}: {exc}", traceback=traceback.format_exc())
+                found = []
+            else:
+                duplicates = _duplicate_ids(found)
+                if duplicates:
+                    # Colliding ids can't be used as keys; report them instead of emitting them.
+                    entry.update(status="failed", error=f"duplicate criterion ids: {', '.join(duplicates)}")
+                    found = []
+                else:
+                    entry.update(
+                        status="ok" if found else "no_criteria",
+                        criteria=len(found),
+                        criteria_sets=max((c["set"] for c in found), default=0),
+                    )
+            entry["seconds"] = round(time.perf_counter() - t0, 4)
+            criteria.extend(found)
+            report.append(entry)
+    return criteria, report
+
+
+def extract_all_criteria(
+    pdf: PdfSource,
+    disorders: List[Dict[str, Any]],
+    sections: PageRangeIndex,
+    page_offset: int,
+    workers: int = 1,
+) -> Dict[str, Any]:
+    """
+    {"criteria": [...], "disorders": [report entry per disorder], "summary": {...}},
+    both lists in the order of `disorders`.
+    """
+    t0 = time.perf_counter()
+    windows = disorder_windows(disorders, sections)
+    by_family: Dict[str, List[Tuple[Dict[str, Any], Tuple[int, int]]]] = defaultdict(list)
+    reports: Dict[str, Dict[str, Any]] = {}
+    for disorder in disorders:
+        window = windows[disorder["id"]]
+        if window is None:
+            reports[disorder["id"]] = {
+                "disorder_id": disorder["id"],
+                "pages": None,
+                "status": "failed",
+                "error": f"page {disorder['page']} is outside every family range",
+                "seconds": 0.0,
+            }
+            continue
+        by_family[disorder.get("family_id") or ""].append((disorder, window))
+
+    tasks = list(by_family.values())
+    if workers > 1 and len(tasks) > 1:
+        # Workers get the path; a DSMDocument would be reopened per task anyway.
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            n = len(tasks)
+            results = list(pool.map(_criteria_worker, [source_path(pdf)] * n, tasks, [page_offset] * n))
+    else:
+        results = [_criteria_worker(pdf, family_tasks, page_offset) for family_tasks in tasks]
+
+    criteria_by_disorder: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for chunk_criteria, chunk_report in results:
+        for criterion in chunk_criteria:
+            criteria_by_disorder[criterion["disorder_id"]].append(criterion)
+        for entry in chunk_report:
+            reports[entry["disorder_id"]] = entry
+
+    ordered = [reports[d["id"]] for d in disorders]
+    statuses = [entry["status"] for entry in ordered]
+    return {
+        "criteria": [c for d in disorders for c in criteria_by_disorder[d["id"]]],
+        "disorders": ordered,
+        "summary": {
+            "disorders": len(ordered),
+            "ok": statuses.count("ok"),
+            "no_criteria": statuses.count("no_criteria"),
+            "failed": statuses.count("failed"),
+            "criteria": sum(len(v) for v in criteria_by_disorder.values()),
+            "workers": workers,
+            "seconds": round(time.perf_counter() - t0, 3),
+        },
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Extract lettered criteria for every disorder in disorders.json")
+    ap.add_argument("--pdf", default=DEFAULT_PDF)
+    ap.add_argument("--disorders", default="dsm5_data/disorders.json")
+    ap.add_argument(
+        "--hierarchy",
+        default="data/dsm_families.json",
+        help="build_family_hierarchy output (dsm_pdf_parser.py --output) for the page ranges",
+    )
+    ap.add_argument("--out", default="dsm5_data/criteria.json")
+    ap.add_argument("--page-offset", type=int, help="PDF page minus printed page (default: detect)")
+    ap.add_argument("--only", nargs="+", help="Only these disorder ids")
+    ap.add_argument("--workers", type=int, default=1)
+    args = ap.parse_args()
+
+    with open(args.disorders, "r", encoding="utf-8") as f:
+        disorders = json.load(f)["disorders"]
+    if args.only:
+        unknown = set(args.only) - {d["id"] for d in disorders}
+        if unknown:
+            ap.error(f"Unknown disorder ids: {sorted(unknown)}")
+        disorders = [d for d in disorders if d["id"] in args.only]
+    with open(args.hierarchy, "r", encoding="utf-8") as f:
+        sections = PageRangeIndex.from_hierarchy(json.load(f))
+
+    page_offset = args.page_offset
+    if page_offset is None:
+        page_offset = detect_page_offset(args.pdf)
+
+    result = extract_all_criteria(args.pdf, disorders, sections, page_offset, workers=args.workers)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+
+    summary = result["summary"]
+    for entry in result["disorders"]:
+        if entry["status"] == "failed":
+            print(f"FAILED {entry['disorder_id']}: {entry['error']}")
+    print(
+        f"{summary['criteria']} criteria for {summary['ok']}/{summary['disorders']} disorders "
+        f"({summary['no_criteria']} without criteria, {summary['failed']} failed) in {summary['seconds']}s"
+    )
+    print(f"Wrote {os.path.abspath(args.out)}")
+
+
+if __name__ == "__main__":
+    main()
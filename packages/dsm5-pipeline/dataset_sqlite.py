@@ -0,0 +1,302 @@
+"""
+dataset_sqlite.py
+
+SQLite export of the structured dataset (the families / groups / disorders /
+specifiers records that export_structured_dataset writes as JSON), so consumers
+can query one indexed file instead of loading and joining every JSON blob.
+
+Tables mirror the JSON records; list fields become rows of link tables, with a
+`position` column keeping the JSON order:
+
+    families(id, name, page_start, page_end, description, position)
+    groups(id, family_id, name, page_start, page_end, position)
+    disorders(id, family_id, group_id, name, description, dsm_code, icd9_code,
+              icd10_code, dsm_reference, page, rule_id, position)
+    specifiers(id, label, applies_to, type, position)
+    specifier_values(specifier_id, id, label, icd9_code, icd10_code, table_text, position)
+    disorder_specifiers(disorder_id, specifier_id, position)
+    disorder_criteria(disorder_id, criterion_id, position)
+
+Disorders are indexed on ICD-9, ICD-10, family, group and page (ids are primary
+keys). The code columns compare case-insensitively, so a `LIKE 'F32%'` prefix
+match is answered from the index. disorders_fts is an FTS5 index over disorder
+names and descriptions, and specifier_values_fts over the values' table text.
+
+The file is written to a temporary path in one transaction and moved into
+place, so readers never see a partial database.
+
+Example:
+    python dataset_sqlite.py --structured-dir dsm5_data --out dsm5_data/dsm5.sqlite
+    python dataset_sqlite.py --db dsm5_data/dsm5.sqlite --group MOTOR_DISORDERS --icd10-prefix F95
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Bump when the tables change; stored in meta.schema_version.
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE families (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    page_start INTEGER,
+    page_end INTEGER,
+    description TEXT,
+    position INTEGER NOT NULL
+);
+CREATE TABLE groups (
+    id TEXT PRIMARY KEY,
+    family_id TEXT NOT NULL REFERENCES families(id),
+    name TEXT NOT NULL,
+    page_start INTEGER,
+    page_end INTEGER,
+    position INTEGER NOT NULL
+);
+CREATE TABLE disorders (
+    id TEXT PRIMARY KEY,
+    family_id TEXT NOT NULL REFERENCES families(id),
+    group_id TEXT REFERENCES groups(id),
+    name TEXT NOT NULL,
+    description TEXT,
+    dsm_code TEXT,
+    icd9_code TEXT COLLATE NOCASE,
+    icd10_code TEXT COLLATE NOCASE,
+    dsm_reference TEXT,
+    page INTEGER,
+    rule_id TEXT,
+    position INTEGER NOT NULL
+);
+CREATE TABLE specifiers (
+    id TEXT PRIMARY KEY,
+    label TEXT,
+    applies_to TEXT,
+    type TEXT,
+    position INTEGER NOT NULL
+);
+CREATE TABLE specifier_values (
+    specifier_id TEXT NOT NULL REFERENCES specifiers(id),
+    id TEXT NOT NULL,
+    label TEXT,
+    icd9_code TEXT COLLATE NOCASE,
+    icd10_code TEXT COLLATE NOCASE,
+    table_text TEXT,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (specifier_id, id)
+);
+CREATE TABLE disorder_specifiers (
+    disorder_id TEXT NOT NULL REFERENCES disorders(id),
+    specifier_id TEXT NOT NULL REFERENCES specifiers(id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (disorder_id, specifier_id)
+);
+CREATE TABLE disorder_criteria (
+    disorder_id TEXT NOT NULL REFERENCES disorders(id),
+    criterion_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (disorder_id, criterion_id)
+);
+"""
+
+# Built after the rows are in: one sort per index instead of per-row updates.
+INDEXES = """
+CREATE INDEX idx_groups_family ON groups(family_id);
+CREATE INDEX idx_disorders_icd9 ON disorders(icd9_code);
+CREATE INDEX idx_disorders_icd10 ON disorders(icd10_code);
+CREATE INDEX idx_disorders_family ON disorders(family_id);
+CREATE INDEX idx_disorders_group ON disorders(group_id, icd10_code);
+CREATE INDEX idx_disorders_page ON disorders(page);
+CREATE INDEX idx_specifier_values_icd9 ON specifier_values(icd9_code);
+CREATE INDEX idx_specifier_values_icd10 ON specifier_values(icd10_code);
+CREATE INDEX idx_disorder_specifiers_specifier ON disorder_specifiers(specifier_id);
+"""
+
+FTS = """
+CREATE VIRTUAL TABLE disorders_fts USING fts5(name, description, content='disorders', content_rowid='rowid');
+INSERT INTO disorders_fts(disorders_fts) VALUES ('rebuild');
+CREATE VIRTUAL TABLE specifier_values_fts USING fts5(label, table_text, content='specifier_values', content_rowid='rowid');
+INSERT INTO specifier_values_fts(specifier_values_fts) VALUES ('rebuild');
+"""
+
+
+def _statements(script: str) -> List[str]:
+    return [statement.strip() for statement in script.split(";") if statement.strip()]
+
+
+def _insert(conn: sqlite3.Connection, table: str, fields: Sequence[str], records: Iterable[Dict[str, Any]]) -> None:
+    """Insert one row per record (missing fields as NULL), numbering them in `position`."""
+    columns = ", ".join(list(fields) + ["position"])
+    marks = ", ".join("?" * (len(fields) + 1))
+    rows = [tuple(record.get(f) for f in fields) + (i,) for i, record in enumerate(records)]
+    conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({marks})", rows)
+
+
+def write_structured_sqlite(
+    path: str,
+    families: List[Dict[str, Any]],
+    groups: List[Dict[str, Any]],
+    disorders: List[Dict[str, Any]],
+    specifiers: List[Dict[str, Any]],
+) -> None:
+    """Write the structured records to a new SQLite file at `path`, replacing any existing one."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".dataset-", suffix=".sqlite", dir=directory)
+    os.close(fd)
+    try:
+        # Autocommit mode, so the one BEGIN ... COMMIT below is the only transaction.
+        conn = sqlite3.connect(tmp_path, isolation_level=None)
+        try:
+            # Nobody else sees the file before the rename: no journal to keep.
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("BEGIN")
+            for statement in _statements(SCHEMA):
+                conn.execute(statement)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+            _insert(conn, "families", ("id", "name", "page_start", "page_end", "description"), families)
+            _insert(conn, "groups", ("id", "family_id", "name", "page_start", "page_end"), groups)
+            _insert(
+                conn,
+                "disorders",
+                (
+                    "id", "family_id", "group_id", "name", "description", "dsm_code",
+                    "icd9_code", "icd10_code", "dsm_reference", "page", "rule_id",
+                ),
+                disorders,
+            )
+            _insert(conn, "specifiers", ("id", "label", "applies_to", "type"), specifiers)
+            for spec in specifiers:
+                _insert(
+                    conn,
+                    "specifier_values",
+                    ("specifier_id", "id", "label", "icd9_code", "icd10_code", "table_text"),
+                    [{**value, "specifier_id": spec["id"]} for value in spec.get("values", [])],
+                )
+            for disorder in disorders:
+                _insert(
+                    conn,
+                    "disorder_specifiers",
+                    ("disorder_id", "specifier_id"),
+                    [{"disorder_id": disorder["id"], "specifier_id": s} for s in disorder.get("specifier_ids", [])],
+                )
+                _insert(
+                    conn,
+                    "disorder_criteria",
+                    ("disorder_id", "criterion_id"),
+                    [{"disorder_id": disorder["id"], "criterion_id": c} for c in disorder.get("criterion_ids", [])],
+                )
+            for statement in _statements(INDEXES) + _statements(FTS):
+                conn.execute(statement)
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_structured_dir(structured_dir: str) -> Dict[str, List[Dict[str, Any]]]:
+    """{"families", "groups", "disorders", "specifiers"} records from export_structured_dataset's JSON files."""
+    dataset: Dict[str, List[Dict[str, Any]]] = {}
+    for name in ("families", "groups", "disorders", "specifiers"):
+        with open(os.path.join(structured_dir, f"{name}.json"), "r", encoding="utf-8") as fh:
+            dataset[name] = json.load(fh)[name]
+    return dataset
+
+
+def find_disorders(
+    conn: sqlite3.Connection,
+    family_id: Optional[str] = None,
+    group_id: Optional[str] = None,
+    icd10_prefix: Optional[str] = None,
+    icd9_prefix: Optional[str] = None,
+    text: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Disorder rows matching every given filter, in dataset order. `text` is an
+    FTS5 query over names and descriptions ("panic", "sleep AND apnea").
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    if family_id:
+        clauses.append("d.family_id = ?")
+        params.append(family_id)
+    if group_id:
+        clauses.append("d.group_id = ?")
+        params.append(group_id)
+    # LIKE patterns are escaped so a code's "." or "_" is matched literally.
+    for column, prefix in (("d.icd10_code", icd10_prefix), ("d.icd9_code", icd9_prefix)):
+        if prefix:
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+            params.append(escaped + "%")
+    if text:
+        clauses.append("d.rowid IN (SELECT rowid FROM disorders_fts WHERE disorders_fts MATCH ?)")
+        params.append(text)
+    sql = "SELECT d.* FROM disorders d"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY d.position"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    conn.row_factory = sqlite3.Row
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Export the structured DSM-5 dataset to SQLite, or query an export")
+    ap.add_argument("--structured-dir", default="dsm5_data", help="Directory with families/groups/disorders/specifiers.json")
+    ap.add_argument("--out", help="Write the SQLite export here")
+    ap.add_argument("--db", help="Query this SQLite export instead of writing one")
+    ap.add_argument("--family")
+    ap.add_argument("--group")
+    ap.add_argument("--icd10-prefix")
+    ap.add_argument("--icd9-prefix")
+    ap.add_argument("--text", help="FTS5 query over disorder names and descriptions")
+    ap.add_argument("--limit", type=int)
+    args = ap.parse_args()
+
+    if bool(args.out) == bool(args.db):
+        ap.error("Pass exactly one of --out (export) or --db (query)")
+
+    if args.out:
+        dataset = load_structured_dir(args.structured_dir)
+        write_structured_sqlite(args.out, **dataset)
+        print(
+            f"Wrote {len(dataset['disorders'])} disorders, {len(dataset['groups'])} groups, "
+            f"{len(dataset['families'])} families, {len(dataset['specifiers'])} specifiers to {args.out}"
+        )
+        return
+
+    conn = sqlite3.connect(args.db)
+    try:
+        rows = find_disorders(
+            conn,
+            family_id=args.family,
+            group_id=args.group,
+            icd10_prefix=args.icd10_prefix,
+            icd9_prefix=args.icd9_prefix,
+            text=args.text,
+            limit=args.limit,
+        )
+    finally:
+        conn.close()
+    for row in rows:
+        print(f"{row['page'] or '':>4} {row['icd9_code'] or '':<8} {row['icd10_code'] or '':<8} {row['id']}")
+    print(f"{len(rows)} disorders")
+
+
+if __name__ == "__main__":
+    main()
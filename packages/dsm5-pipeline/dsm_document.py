@@ -0,0 +1,188 @@
+"""
+dsm_document.py
+
+One shared, open DSM-5 PDF with a bounded LRU cache of per-page results.
+
+    with DSMDocument("data/DSM-5-By-American-Psychiatric-Association.pdf") as doc:
+        classification = get_classification_text(doc)
+        hierarchy = build_family_hierarchy(classification)
+        criteria = build_demo_criteria(doc)
+
+The entry points of dsm_pdf_parser, layout_aware_dsm_pdf and dsm_document_formatter
+accept a DSMDocument wherever they take a PDF path, so a run that goes through
+several of them opens (and parses the xref of) the file once, and a page that
+one step already read is not extracted again.
+
+Pages are 1-based, like extract_page_range. The cache holds up to `max_pages`
+pages: their page_text / page_words results and pdfplumber's parsed layout of the
+page (so tables can be found on a page whose words were just read). Evicting a
+page flushes both. Returned word lists are shared with the cache; don't mutate them.
+
+A DSMDocument pickles as its path and cache size, so it can be handed to worker
+processes; each worker opens its own handle on first use.
+
+Example:
+    doc = DSMDocument(pdf_path, max_pages=64)
+    doc.page_range_text(10, 49)
+    doc.page_words(151)   # WORD_SETTINGS by default
+    doc.close()
+"""
+
+from __future__ import annotations
+
+import json
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import pdfplumber
+
+from extraction_backends import WORD_SETTINGS, PdfplumberBackend, PdfplumberPage, word_store_from_dicts
+from word_store import WordStore
+
+
+class DSMDocument:
+    def __init__(self, path: str, max_pages: int = 64):
+        self.path = path
+        self.max_pages = max(max_pages, 1)
+        self._pdf: Optional[pdfplumber.PDF] = None
+        self._pages: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()  # page number -> cached results
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Ship only the configuration to worker processes; each one opens the file lazily.
+        return {"path": self.path, "max_pages": self.max_pages}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["path"], state["max_pages"])
+
+    def __enter__(self) -> "DSMDocument":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        self._pages.clear()
+
+    @property
+    def pdf(self) -> pdfplumber.PDF:
+        if self._pdf is None:
+            self._pdf = pdfplumber.open(self.path)
+        return self._pdf
+
+    def page_count(self) -> int:
+        return len(self.pdf.pages)
+
+    def _entry(self, page_no: int) -> Dict[str, Any]:
+        entry = self._pages.get(page_no)
+        if entry is not None:
+            self._pages.move_to_end(page_no)
+            return entry
+        if not 1 <= page_no <= self.page_count():
+            raise IndexError(f"Page {page_no} out of range 1-{self.page_count()} in {self.path}")
+        entry = self._pages[page_no] = {}
+        while len(self._pages) > self.max_pages:
+            evicted, _ = self._pages.popitem(last=False)
+            self.pdf.pages[evicted - 1].close()
+        return entry
+
+    def page(self, page_no: int) -> pdfplumber.page.Page:
+        """The pdfplumber page; its parsed layout is kept until the page leaves the cache."""
+        self._entry(page_no)
+        return self.pdf.pages[page_no - 1]
+
+    def page_text(self, page_no: int) -> str:
+        """page.extract_text() (or "")."""
+        entry = self._entry(page_no)
+        if "text" in entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry["text"] = self.pdf.pages[page_no - 1].extract_text() or ""
+        return entry["text"]
+
+    def page_band_text(self, page_no: int, height: float) -> str:
+        """extract_text() of the top `height` points of the page (or "")."""
+        key = f"band:{height}"
+        entry = self._entry(page_no)
+        if key in entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+            page = self.pdf.pages[page_no - 1]
+            x0, top, x1, bottom = page.bbox
+            entry[key] = page.crop((x0, top, x1, min(top + height, bottom))).extract_text() or ""
+        return entry[key]
+
+    def page_words(self, page_no: int, **settings: Any) -> List[Dict[str, Any]]:
+        """page.extract_words(**settings) (WORD_SETTINGS when none are given)."""
+        settings = settings or WORD_SETTINGS
+        key = "words:" + json.dumps(settings, sort_keys=True)
+        entry = self._entry(page_no)
+        if key in entry:
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry[key] = self.pdf.pages[page_no - 1].extract_words(**settings) or []
+        return entry[key]
+
+    def page_range_text(self, start_page: int, end_page: int) -> str:
+        """page_text of pages start_page..end_page (inclusive), joined with newlines."""
+        return "\n".join(self.page_text(i) for i in range(start_page, end_page + 1))
+
+    def backend(self) -> "DocumentBackend":
+        """An ExtractionBackend (pdfplumber) over this document's handle and word cache."""
+        return DocumentBackend(self)
+
+
+class _DocumentPage(PdfplumberPage):
+    def __init__(self, document: DSMDocument, index: int):
+        super().__init__(document.page(index + 1))
+        self._document = document
+        self._index = index
+
+    def words(self) -> WordStore:
+        return word_store_from_dicts(self._document.page_words(self._index + 1, **WORD_SETTINGS))
+
+    def close(self) -> None:
+        # The document flushes the page when it leaves its cache.
+        pass
+
+
+class DocumentBackend(PdfplumberBackend):
+    """PdfplumberBackend sharing a DSMDocument's handle; closing it leaves the document open."""
+
+    def __init__(self, document: DSMDocument):
+        self._document = document
+        self._pdf = document.pdf
+
+    def page(self, index: int) -> _DocumentPage:
+        return _DocumentPage(self._document, index)
+
+    def close(self) -> None:
+        pass
+
+
+PdfSource = Union[str, DSMDocument]
+
+
+def source_path(pdf: PdfSource) -> str:
+    return pdf.path if isinstance(pdf, DSMDocument) else pdf
+
+
+@contextmanager
+def open_document(pdf: PdfSource, max_pages: int = 64) -> Iterator[DSMDocument]:
+    """The given DSMDocument (left open), or a DSMDocument on the path, closed on exit."""
+    if isinstance(pdf, DSMDocument):
+        yield pdf
+        return
+    doc = DSMDocument(pdf, max_pages)
+    try:
+        yield doc
+    finally:
+        doc.close()
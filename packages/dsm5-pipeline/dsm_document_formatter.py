@@ -5,13 +5,38 @@ Combined DSM PDF extractor + document formatter.
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
+import multiprocessing
 import os
+import random
 import re
+import sys
+import tempfile
+import textwrap
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from multiprocessing.connection import Connection, wait as mp_wait
+from typing import Any, Deque, Dict, IO, Iterable, Iterator, List, Optional, Tuple
 
-import pdfplumber
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then reported as 0
+    resource = None
+
+from dsm_document import DSMDocument, PdfSource, source_path
+from dsm_pdf_parser import PageRangeIndex
+from extraction_backends import BACKENDS, TABLE_SETTINGS, WORD_SETTINGS, BackendPage, ExtractionBackend, open_backend
+from extraction_checkpoint import ExtractionCheckpoint
+from format_engine import ENGINE as FORMAT_ENGINE
+from page_layer_cache import PageLayerCache, file_content_hash, params_key
+from paged_formatter import format_pages_paged, iter_pages_paged
+from tracing import span, start_tracing, stop_tracing, traced_map, traced_result, traced_submit, write_profile
+from word_store import TableRegionIndex, WordStore, cluster_lines, line_extents
 
 
 # ===========================
@@ -89,102 +114,45 @@ def _cleanup_text(text: str) -> str:
 # Layout reconstruction
 # ===========================
 
-@dataclass
-class Word:
-    text: str
-    x0: float
-    x1: float
-    top: float
-    bottom: float
-
-
-def _extract_words(page: pdfplumber.page.Page) -> List[Word]:
-    words_raw = page.extract_words(
-        use_text_flow=True,
-        keep_blank_chars=False,
-        extra_attrs=["x0", "x1", "top", "bottom"],
-    ) or []
-    words: List[Word] = []
-    for w in words_raw:
-        t = (w.get("text") or "").strip()
-        if not t:
-            continue
-        words.append(Word(t, float(w["x0"]), float(w["x1"]), float(w["top"]), float(w["bottom"])))
-    return words
-
-
-def _cluster_words_into_lines(words: List[Word], y_tol: float = 3.0) -> List[List[Word]]:
-    if not words:
-        return []
-    words = sorted(words, key=lambda w: (w.top, w.x0))
-    lines: List[List[Word]] = []
-    current: List[Word] = [words[0]]
-    y_ref = words[0].top
-
-    for w in words[1:]:
-        if abs(w.top - y_ref) <= y_tol:
-            current.append(w)
-        else:
-            lines.append(sorted(current, key=lambda ww: ww.x0))
-            current = [w]
-            y_ref = w.top
-    if current:
-        lines.append(sorted(current, key=lambda ww: ww.x0))
-    return lines
-
-
-def _merge_spaced_letter_words(line_words: List[Word]) -> List[Word]:
-    if len(line_words) < 6:
-        return line_words
-    single_letter = [w for w in line_words if len(w.text) == 1 and w.text.isalpha()]
-    if len(single_letter) / max(len(line_words), 1) < 0.6:
-        return line_words
-
-    gaps: List[float] = []
-    widths: List[float] = []
-    for prev, nxt in zip(line_words, line_words[1:]):
-        gaps.append(max(0.0, nxt.x0 - prev.x1))
-        widths.append(max(0.0, prev.x1 - prev.x0))
-    if not gaps:
-        return line_words
-
-    gaps_sorted = sorted(gaps)
-    p50 = gaps_sorted[len(gaps_sorted) // 2]
+def _merge_spaced_letter_words(words: WordStore, idx: np.ndarray, texts: List[str]) -> List[str]:
+    """
+    Re-glue letter-spaced lines ("w e e k" -> "week"): when most words on the line are
+    single letters, words separated by a gap at or below the line's gap threshold are
+    concatenated. Works on the line's box columns; returns the merged word texts.
+    """
+    if len(texts) < 6:
+        return texts
+    single_letter = sum(1 for t in texts if len(t) == 1 and t.isalpha())
+    if single_letter / max(len(texts), 1) < 0.6:
+        return texts
+
+    boxes = words.boxes[idx]
+    gaps = np.maximum(0.0, boxes["x0"][1:] - boxes["x1"][:-1])
+
+    gaps_sorted = np.sort(gaps)
+    p50 = float(gaps_sorted[len(gaps_sorted) // 2])
     p90_idx = max(0, int(len(gaps_sorted) * 0.9) - 1)
-    p90 = gaps_sorted[p90_idx]
+    p90 = float(gaps_sorted[p90_idx])
     threshold = max(p50 * 1.5, (p50 + p90) / 2.0, 1.0)
 
-    merged: List[Word] = []
-    buf_text = line_words[0].text
-    buf_x0 = line_words[0].x0
-    buf_x1 = line_words[0].x1
-    buf_top = line_words[0].top
-    buf_bottom = line_words[0].bottom
-
-    for prev, nxt in zip(line_words, line_words[1:]):
-        gap = max(0.0, nxt.x0 - prev.x1)
-        if gap <= threshold:
-            buf_text += nxt.text
-            buf_x1 = nxt.x1
-            buf_top = min(buf_top, nxt.top)
-            buf_bottom = max(buf_bottom, nxt.bottom)
-        else:
-            merged.append(Word(buf_text, buf_x0, buf_x1, buf_top, buf_bottom))
-            buf_text = nxt.text
-            buf_x0 = nxt.x0
-            buf_x1 = nxt.x1
-            buf_top = nxt.top
-            buf_bottom = nxt.bottom
-
-    merged.append(Word(buf_text, buf_x0, buf_x1, buf_top, buf_bottom))
+    merged: List[str] = []
+    start = 0
+    for k in np.flatnonzero(gaps > threshold).tolist():
+        merged.append("".join(texts[start:k + 1]))
+        start = k + 1
+    merged.append("".join(texts[start:]))
     return merged
 
 
-def _line_text(line_words: List[Word]) -> str:
-    if not line_words:
+def _line_text(words: WordStore, idx: np.ndarray) -> str:
+    texts = words.texts(idx)
+    if not texts:
         return ""
-    line_words = _merge_spaced_letter_words(line_words)
-    text = " ".join(w.text for w in line_words)
+    return _join_line_texts(_merge_spaced_letter_words(words, idx, texts))
+
+
+def _join_line_texts(texts: List[str]) -> str:
+    text = " ".join(texts)
     text = re.sub(r"\s+([,.;:!?])", r"\1", text)
     text = re.sub(r"\(\s+", "(", text)
     text = re.sub(r"\s+\)", ")", text)
@@ -196,15 +164,15 @@ def _detect_columns(lines: List[Tuple[float, str, float]], page_width: float) ->
     if not lines:
         return "one"
 
-    x0s = [x0 for (x0, text, y_top) in lines if len(text) > 3]
-    if not x0s:
+    x0s = np.array([x0 for (x0, text, y_top) in lines if len(text) > 3], dtype="f8")
+    if not x0s.size:
         return "one"
 
     mid = page_width / 2.0
-    left = [x for x in x0s if x < mid - 20]
-    right = [x for x in x0s if x > mid + 20]
+    left = np.count_nonzero(x0s < mid - 20)
+    right = np.count_nonzero(x0s > mid + 20)
 
-    if len(left) >= 10 and len(right) >= 10:
+    if left >= 10 and right >= 10:
         return "two"
     return "one"
 
@@ -221,337 +189,1427 @@ def _order_lines_reading(lines: List[Tuple[float, str, float]], mode: str, page_
     return left_sorted + right_sorted
 
 
+# ===========================
+# Per-page line records
+# ===========================
+
+# (x0_min, text, y_top, y_bottom) for one clustered line
+LineRecord = Tuple[float, str, float, float]
+
+
+@dataclass
+class PageLines:
+    """Compact per-page form: clustered line records plus the page facts the flow pass needs."""
+    page: int
+    width: float
+    height: float
+    num_words: int
+    tables: List[Dict[str, Any]]
+    lines: List[LineRecord]
+    tables_skipped: bool = False
+
+
+def _line_records(words: WordStore) -> List[LineRecord]:
+    with span("lines.cluster"):
+        lines = cluster_lines(words)
+        x0_min, y_top, y_bot = line_extents(words, lines)
+    records: List[LineRecord] = []
+    for k, idx in enumerate(lines):
+        txt = _line_text(words, idx)
+        if not txt:
+            continue
+        records.append((float(x0_min[k]), txt, float(y_top[k]), float(y_bot[k])))
+    return records
+
+
+def _count_margin_lines(
+    records: List[LineRecord],
+    page_height: float,
+    headers_count: Dict[str, int],
+    footers_count: Dict[str, int],
+    top_margin: float,
+    bottom_margin: float,
+) -> None:
+    for _, txt, y_top, y_bot in records:
+        if y_top <= top_margin:
+            headers_count[txt] = headers_count.get(txt, 0) + 1
+        if (page_height - y_bot) <= bottom_margin:
+            footers_count[txt] = footers_count.get(txt, 0) + 1
+
+
+def _blacklist_from_counts(
+    headers_count: Dict[str, int],
+    footers_count: Dict[str, int],
+    total_pages: int,
+    min_repeat_ratio: float,
+) -> Dict[str, set]:
+    headers = {t for t, c in headers_count.items() if c / max(total_pages, 1) >= min_repeat_ratio}
+    footers = {t for t, c in footers_count.items() if c / max(total_pages, 1) >= min_repeat_ratio}
+    footers |= {t for t in footers if _looks_like_page_number(t)}
+
+    return {"headers": headers, "footers": footers}
+
+
 # ===========================
 # Header/footer detection
 # ===========================
 
 def build_header_footer_blacklist(
-    pdf_path: str,
+    pdf_path: PdfSource,
     page_start: int = 1,
     page_end: Optional[int] = None,
     top_margin: float = 70.0,
     bottom_margin: float = 70.0,
     min_repeat_ratio: float = 0.6,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+    memory: Optional[MemoryBudget] = None,
 ) -> Dict[str, set]:
     headers_count: Dict[str, int] = {}
     footers_count: Dict[str, int] = {}
     total_pages = 0
 
-    with pdfplumber.open(pdf_path) as pdf:
-        p_end = page_end or len(pdf.pages)
+    with PageLayerReader(pdf_path, cache, backend, memory) as reader, span("blacklist"):
+        p_end = page_end or reader.page_count()
         for i in range(page_start - 1, p_end):
-            page = pdf.pages[i]
-            total_pages += 1
-            words = _extract_words(page)
-            if not words:
-                continue
-
-            lines = _cluster_words_into_lines(words)
-            for lw in lines:
-                txt = _line_text(lw)
-                if not txt:
+            with span("blacklist.page", i + 1):
+                layer = reader.layer(i)
+                total_pages += 1
+                if not layer.words:
                     continue
-                y_top = min(w.top for w in lw)
-                y_bot = max(w.bottom for w in lw)
-                if y_top <= top_margin:
-                    headers_count[txt] = headers_count.get(txt, 0) + 1
-                if (page.height - y_bot) <= bottom_margin:
-                    footers_count[txt] = footers_count.get(txt, 0) + 1
 
-    headers = {t for t, c in headers_count.items() if c / max(total_pages, 1) >= min_repeat_ratio}
-    footers = {t for t, c in footers_count.items() if c / max(total_pages, 1) >= min_repeat_ratio}
-    footers |= {t for t in footers if _looks_like_page_number(t)}
+                records = _line_records(layer.words)
+                _count_margin_lines(records, layer.height, headers_count, footers_count, top_margin, bottom_margin)
+
+    return _blacklist_from_counts(headers_count, footers_count, total_pages, min_repeat_ratio)
 
-    return {"headers": headers, "footers": footers}
+
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _line_template(txt: str) -> str:
+    # "94 Depressive Disorders" and "96 Depressive Disorders" share "# Depressive Disorders"
+    return _DIGITS_RE.sub("#", txt)
+
+
+def _template_hash(txt: str) -> int:
+    # blake2b rather than hash(): the value must be identical in every worker process.
+    digest = hashlib.blake2b(_line_template(txt).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _blacklist_summary(blacklist: Dict[str, set]) -> Dict[str, Any]:
+    """
+    The blacklist as written to the outputs: sorted "headers" and "footers". A sampled
+    (build_header_footer_templates) blacklist lists digit-masked templates rather than
+    the header strings themselves and is marked "digit_masked": true.
+    """
+    summary: Dict[str, Any] = {"headers": sorted(blacklist["headers"]), "footers": sorted(blacklist["footers"])}
+    if "header_hashes" in blacklist:
+        summary["digit_masked"] = True
+    return summary
+
+
+def _stratified_sample_order(indices: List[int], n_strata: int, seed: int) -> List[int]:
+    """
+    Split `indices` into n_strata contiguous strata, shuffle each (seeded), then
+    interleave them: every consecutive run of n_strata pages covers all strata.
+    """
+    rng = random.Random(seed)
+    size = -(-len(indices) // max(n_strata, 1))
+    strata = [indices[k:k + size] for k in range(0, len(indices), size)]
+    for stratum in strata:
+        rng.shuffle(stratum)
+    order: List[int] = []
+    for rnd in range(size):
+        order.extend(stratum[rnd] for stratum in strata if rnd < len(stratum))
+    return order
+
+
+def build_header_footer_templates(
+    pdf_path: PdfSource,
+    page_start: int = 1,
+    page_end: Optional[int] = None,
+    top_margin: float = 70.0,
+    bottom_margin: float = 70.0,
+    min_repeat_ratio: float = 0.6,
+    n_strata: int = 8,
+    min_sample_pages: int = 16,
+    max_sample_ratio: float = 0.25,
+    stable_rounds: int = 2,
+    seed: int = 0,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+    memory: Optional[MemoryBudget] = None,
+) -> Dict[str, set]:
+    """
+    Sampled header/footer blacklist over digit-masked line templates.
+
+    Margin lines are counted per template ("# Depressive Disorders") so running heads
+    that differ only in the page number pool together. Pages are drawn one per stratum
+    per round; after min_sample_pages the run stops as soon as the blacklisted template
+    sets have not changed for stable_rounds rounds, or when max_sample_ratio of the
+    range has been read. Ranges no larger than min_sample_pages are scanned in full.
+
+    Returns {"headers": set(template), "footers": set(template), "header_hashes": set(int),
+    "footer_hashes": set(int)}; the flow filter tests _template_hash(line) of the lines
+    inside the top / bottom margin against header_hashes / footer_hashes.
+    """
+    headers_count: Dict[str, int] = {}
+    footers_count: Dict[str, int] = {}
+    sampled = 0
+
+    def current() -> Tuple[set, set]:
+        headers = {t for t, c in headers_count.items() if c / max(sampled, 1) >= min_repeat_ratio}
+        footers = {t for t, c in footers_count.items() if c / max(sampled, 1) >= min_repeat_ratio}
+        return headers, footers
+
+    with PageLayerReader(pdf_path, cache, backend, memory) as reader:
+        p_end = page_end or reader.page_count()
+        indices = list(range(page_start - 1, p_end))
+        order = _stratified_sample_order(indices, n_strata, seed)
+        budget = max(min_sample_pages, int(len(indices) * max_sample_ratio))
+        round_size = min(n_strata, len(indices)) or 1
+
+        previous: Optional[Tuple[set, set]] = None
+        unchanged = 0
+        for i in order[:budget]:
+            with span("blacklist.page", i + 1):
+                layer = reader.layer(i)
+                sampled += 1
+                if layer.words:
+                    records = [
+                        (x0, _line_template(txt), y_top, y_bot) for x0, txt, y_top, y_bot in _line_records(layer.words)
+                    ]
+                    _count_margin_lines(records, layer.height, headers_count, footers_count, top_margin, bottom_margin)
+
+            if sampled % round_size or sampled < min_sample_pages:
+                continue
+            estimate = current()
+            unchanged = unchanged + 1 if estimate == previous else 0
+            previous = estimate
+            if unchanged >= stable_rounds:
+                break
+
+    headers, footers = current()
+    return {
+        "headers": headers,
+        "footers": footers,
+        "header_hashes": {_template_hash(t) for t in headers},
+        "footer_hashes": {_template_hash(t) for t in footers},
+    }
 
 
 # ===========================
 # Table extraction
 # ===========================
 
-def _extract_tables_best_effort(page: pdfplumber.page.Page) -> List[Dict[str, Any]]:
-    settings = {
-        "vertical_strategy": "lines",
-        "horizontal_strategy": "lines",
-        "intersection_tolerance": 5,
-        "snap_tolerance": 3,
-        "join_tolerance": 3,
-        "edge_min_length": 20,
-        "min_words_vertical": 2,
-        "min_words_horizontal": 2,
-        "text_tolerance": 3,
-    }
-
+def _extract_tables_best_effort(source: BackendPage) -> Tuple[List[Dict[str, Any]], bool]:
+    """Returns (tables, skipped) where skipped means the ruled-lines precheck ruled tables out."""
     tables_out: List[Dict[str, Any]] = []
     try:
-        tables = page.find_tables(table_settings=settings) or []
-        for t in tables:
-            bbox = t.bbox
-            rows = t.extract()
+        tables, skipped = source.tables()
+        for bbox, rows in tables:
             cleaned_rows = []
             for row in rows:
                 cleaned_rows.append([_norm(cell) if cell else "" for cell in row])
             tables_out.append({"bbox": bbox, "rows": cleaned_rows})
     except Exception:
-        pass
+        skipped = False
+
+    return tables_out, skipped
+
 
-    return tables_out
+# ===========================
+# Page layer
+# ===========================
 
+# Bump when the cached payload layout or the word/table extraction logic changes.
+_LAYER_VERSION = 2
+# Bump when the blacklist payload or the way _page_record applies it changes
+# (invalidates resume checkpoints, not the page layer cache).
+_BLACKLIST_VERSION = 2
+
+
+@dataclass
+class PageLayer:
+    """Raw layer of one page: size, words and tables (empty unless requested)."""
+    width: float
+    height: float
+    words: WordStore
+    tables: List[Dict[str, Any]]
+    tables_skipped: bool = False
+
+
+@dataclass
+class MemoryBudget:
+    """
+    Bounds for a PageLayerReader: the backend (and every document-level cache it holds)
+    is closed and reopened after `batch_pages` backend pages. With `rss_budget_mb`, a
+    page that leaves the process above the budget recycles the backend at once and
+    halves the batch size (never below 1).
+    """
+    batch_pages: int = 32
+    rss_budget_mb: Optional[int] = None
+    shrinks: int = 0
+
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this process; Linux /proc, else the peak from getrusage."""
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_bytes()
+
+
+def _peak_rss_bytes(children: bool = False) -> int:
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+class PageLayerReader:
+    """
+    Serves PageLayers by 0-based page index through an extraction backend
+    ("pdfplumber" or "pdfminer", see extraction_backends). With a PageLayerCache
+    the PDF is only opened on a miss, so a warm rerun never reaches the backend.
+    Backend pages are closed as soon as their layer is built; with a MemoryBudget
+    the backend itself is recycled per batch as well.
+
+    Given a DSMDocument and the pdfplumber backend, pages come from the document's
+    open handle and word cache (DSMDocument.backend()) instead of a new handle.
+    """
+
+    def __init__(
+        self,
+        pdf_path: PdfSource,
+        cache: Optional[PageLayerCache] = None,
+        backend: str = "pdfplumber",
+        memory: Optional[MemoryBudget] = None,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown extraction backend {backend!r}; choose from {sorted(BACKENDS)}")
+        self.pdf_path = source_path(pdf_path)
+        self._document = pdf_path if isinstance(pdf_path, DSMDocument) else None
+        self.cache = cache
+        self.backend = backend
+        self.memory = memory
+        self._opened_pages = 0
+        self._pdf: Optional[ExtractionBackend] = None
+        self._pdf_hash = file_content_hash(self.pdf_path) if cache else ""
+        self._params = params_key(
+            {"version": _LAYER_VERSION, "words": WORD_SETTINGS, "tables": TABLE_SETTINGS, "backend": backend}
+        )
+
+    def __enter__(self) -> "PageLayerReader":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+    def _open(self) -> ExtractionBackend:
+        if self._pdf is None:
+            if self._document is not None and self.backend == "pdfplumber":
+                self._pdf = self._document.backend()
+            else:
+                self._pdf = open_backend(self.backend, self.pdf_path)
+        return self._pdf
+
+    def page_count(self) -> int:
+        if self.cache:
+            meta = self.cache.get(self._pdf_hash, "meta", self._params)
+            if meta:
+                return int(meta["n_pages"])
+        n_pages = self._open().page_count()
+        if self.cache:
+            self.cache.put(self._pdf_hash, "meta", self._params, {"n_pages": n_pages})
+        return n_pages
+
+    def layer(self, index: int, with_tables: bool = False) -> PageLayer:
+        with span("layer", index + 1):
+            return self._layer(index, with_tables)
+
+    def _layer(self, index: int, with_tables: bool) -> PageLayer:
+        key = f"p{index:05d}"
+        payload = None
+        if self.cache:
+            with span("layer.cache"):
+                payload = self.cache.get(self._pdf_hash, key, self._params)
+        if payload is not None and (not with_tables or payload["tables"] is not None):
+            return PageLayer(
+                payload["width"],
+                payload["height"],
+                WordStore.from_tuples(payload["words"]),
+                [{"bbox": tuple(t["bbox"]), "rows": t["rows"]} for t in payload["tables"] or []] if with_tables else [],
+                with_tables and payload["tables_skipped"],
+            )
 
-def _word_in_any_bbox(w: Word, bboxes: List[Tuple[float, float, float, float]], pad: float = 2.0) -> bool:
-    for (x0, top, x1, bottom) in bboxes:
-        if (w.x0 >= x0 - pad and w.x1 <= x1 + pad and w.top >= top - pad and w.bottom <= bottom + pad):
-            return True
-    return False
+        # pdfminer interprets the page here; pdfplumber defers that to the first words() call.
+        with span("layer.parse"):
+            page = self._open().page(index)
+        if payload is None:
+            with span("layer.words"):
+                words = page.words()
+            cached_tables = None
+        else:
+            words = WordStore.from_tuples(payload["words"])
+            cached_tables = payload["tables"]
+        tables: List[Dict[str, Any]] = []
+        tables_skipped = False
+        if with_tables:
+            with span("layer.tables"):
+                tables, tables_skipped = _extract_tables_best_effort(page)
+        page.close()
+        self._after_backend_page()
+
+        if self.cache:
+            with span("layer.cache"):
+                self.cache.put(
+                    self._pdf_hash,
+                    key,
+                    self._params,
+                    {
+                        "width": page.width,
+                        "height": page.height,
+                        "words": words.tuples(),
+                        "tables": tables if with_tables else cached_tables,
+                        "tables_skipped": tables_skipped,
+                    },
+                )
+        return PageLayer(page.width, page.height, words, tables, tables_skipped)
+
+    def _after_backend_page(self) -> None:
+        memory = self.memory
+        if memory is None:
+            return
+        self._opened_pages += 1
+        over_budget = (
+            memory.rss_budget_mb is not None and _current_rss_bytes() > memory.rss_budget_mb * 1024 * 1024
+        )
+        if over_budget and memory.batch_pages > 1:
+            memory.batch_pages //= 2
+            memory.shrinks += 1
+        if over_budget or self._opened_pages >= memory.batch_pages:
+            self.close()
+            self._opened_pages = 0
 
 
 # ===========================
-# Main extraction
+# Page assembly
 # ===========================
 
-def extract_dsm_pages_structured(
-    pdf_path: str,
-    page_start: int = 1,
-    page_end: Optional[int] = None,
-    header_footer_blacklist: Optional[Dict[str, set]] = None,
-    remove_headers_footers: bool = True,
-    remove_table_text_from_flow: bool = True,
-    extract_tables: bool = True,
-    top_margin: float = 70.0,
-    bottom_margin: float = 70.0,
-) -> List[Dict[str, Any]]:
-    results: List[Dict[str, Any]] = []
-
+def _page_lines(
+    layer: PageLayer,
+    page_number: int,
+    remove_table_text_from_flow: bool,
+    all_lines: Optional[List[LineRecord]] = None,
+) -> PageLines:
+    """
+    Reduce one page to its flow line records. `all_lines` are the records of the
+    unfiltered words, reused when no table text has to be dropped from the flow.
+    """
+    words = layer.words
+    tables = layer.tables
+
+    table_bboxes = [tuple(t["bbox"]) for t in tables] if tables else []
+    if remove_table_text_from_flow and table_bboxes:
+        with span("lines.table_filter"):
+            outside = TableRegionIndex(table_bboxes).outside(words)
+        lines = _line_records(outside)
+    elif all_lines is not None:
+        lines = all_lines
+    else:
+        lines = _line_records(words)
+
+    return PageLines(page_number, layer.width, layer.height, len(words), tables, lines, layer.tables_skipped)
+
+
+def _page_record(
+    page_lines: PageLines,
+    header_footer_blacklist: Optional[Dict[str, set]],
+    remove_headers_footers: bool,
+    top_margin: float,
+    bottom_margin: float,
+) -> Dict[str, Any]:
     headers_bl = (header_footer_blacklist or {}).get("headers", set())
     footers_bl = (header_footer_blacklist or {}).get("footers", set())
+    # Templates mask digits ("# Depressive Disorders"), so they only apply inside the margins:
+    # in the body they would also match a lone number or a code line.
+    header_hashes = (header_footer_blacklist or {}).get("header_hashes", set())
+    footer_hashes = (header_footer_blacklist or {}).get("footer_hashes", set())
 
-    with pdfplumber.open(pdf_path) as pdf:
-        p_end = page_end or len(pdf.pages)
+    line_tuples: List[Tuple[float, str, float]] = []
+    headers_found: List[str] = []
+    footers_found: List[str] = []
 
-        for i in range(page_start - 1, p_end):
-            page = pdf.pages[i]
-            words = _extract_words(page)
-            tables = _extract_tables_best_effort(page) if extract_tables else []
+    for x0_min, txt, y_top, y_bot in page_lines.lines:
+        in_header = y_top <= top_margin
+        in_footer = (page_lines.height - y_bot) <= bottom_margin
 
-            table_bboxes = [tuple(t["bbox"]) for t in tables] if tables else []
-            if remove_table_text_from_flow and table_bboxes:
-                words_flow = [w for w in words if not _word_in_any_bbox(w, table_bboxes)]
-            else:
-                words_flow = words
+        if in_header:
+            headers_found.append(txt)
+        if in_footer:
+            footers_found.append(txt)
 
-            line_groups = _cluster_words_into_lines(words_flow)
-            line_tuples: List[Tuple[float, str, float]] = []
-            headers_found: List[str] = []
-            footers_found: List[str] = []
+        if remove_headers_footers and (txt in headers_bl or txt in footers_bl):
+            continue
+        if remove_headers_footers and (in_header and header_hashes or in_footer and footer_hashes):
+            line_hash = _template_hash(txt)
+            if (in_header and line_hash in header_hashes) or (in_footer and line_hash in footer_hashes):
+                continue
+        if remove_headers_footers and in_footer and _looks_like_page_number(txt):
+            continue
 
-            for lw in line_groups:
-                txt = _line_text(lw)
-                if not txt:
-                    continue
-                y_top = min(w.top for w in lw)
-                y_bot = max(w.bottom for w in lw)
-                x0_min = min(w.x0 for w in lw)
+        line_tuples.append((x0_min, txt, y_top))
 
-                in_header = y_top <= top_margin
-                in_footer = (page.height - y_bot) <= bottom_margin
+    with span("record.columns", page_lines.page):
+        mode = _detect_columns(line_tuples, page_lines.width)
+        ordered_lines = _order_lines_reading(line_tuples, mode, page_lines.width)
 
-                if in_header:
-                    headers_found.append(txt)
-                if in_footer:
-                    footers_found.append(txt)
+    with span("record.cleanup", page_lines.page):
+        raw_text = "\n".join(ordered_lines)
+        cleaned = _cleanup_text(raw_text)
 
-                if remove_headers_footers and (txt in headers_bl or txt in footers_bl):
-                    continue
-                if remove_headers_footers and in_footer and _looks_like_page_number(txt):
-                    continue
+    return {
+        "page": page_lines.page,
+        "text": cleaned,
+        "headers": sorted(set(headers_found)),
+        "footers": sorted(set(footers_found)),
+        "tables": page_lines.tables,
+        "debug": {
+            "column_mode": mode,
+            "num_words": page_lines.num_words,
+            "num_tables": len(page_lines.tables),
+            "table_detection_skipped": page_lines.tables_skipped,
+        },
+    }
 
-                line_tuples.append((x0_min, txt, y_top))
 
-            mode = _detect_columns(line_tuples, page.width)
-            ordered_lines = _order_lines_reading(line_tuples, mode, page.width)
+def _iter_pages(
+    reader: PageLayerReader,
+    indices: List[int],
+    header_footer_blacklist: Optional[Dict[str, set]],
+    remove_headers_footers: bool,
+    remove_table_text_from_flow: bool,
+    extract_tables: bool,
+    top_margin: float,
+    bottom_margin: float,
+) -> Iterator[Dict[str, Any]]:
+    for i in indices:
+        # The span closes before the yield, so the consumer's time is not charged to the page.
+        with span("page", i + 1):
+            page_lines = _page_lines(reader.layer(i, extract_tables), i + 1, remove_table_text_from_flow)
+            record = _page_record(page_lines, header_footer_blacklist, remove_headers_footers, top_margin, bottom_margin)
+        yield record
+
+
+def _fused_pages(
+    reader: PageLayerReader,
+    indices: List[int],
+    scan_range: range,
+    extract_range: range,
+    remove_table_text_from_flow: bool,
+    extract_tables: bool,
+    top_margin: float,
+    bottom_margin: float,
+) -> Tuple[Dict[str, int], Dict[str, int], int, List[PageLines]]:
+    headers_count: Dict[str, int] = {}
+    footers_count: Dict[str, int] = {}
+    total_pages = 0
+    retained: List[PageLines] = []
 
-            raw_text = "\n".join(ordered_lines)
-            cleaned = _cleanup_text(raw_text)
+    for i in indices:
+        with span("page", i + 1):
+            layer = reader.layer(i, extract_tables and i in extract_range)
 
-            results.append(
-                {
-                    "page": i + 1,
-                    "text": cleaned,
-                    "headers": sorted(set(headers_found)),
-                    "footers": sorted(set(footers_found)),
-                    "tables": tables,
-                    "debug": {"column_mode": mode, "num_words": len(words), "num_tables": len(tables)},
-                }
-            )
+            all_lines: Optional[List[LineRecord]] = None
+            if i in scan_range:
+                total_pages += 1
+                if layer.words:
+                    all_lines = _line_records(layer.words)
+                    _count_margin_lines(all_lines, layer.height, headers_count, footers_count, top_margin, bottom_margin)
 
-    return results
+            if i in extract_range:
+                retained.append(_page_lines(layer, i + 1, remove_table_text_from_flow, all_lines))
 
+    return headers_count, footers_count, total_pages, retained
 
-def extract_dsm_clean_text(
-    pdf_path: str,
-    page_start: int = 1,
-    page_end: Optional[int] = None,
-    blacklist_scan_start: Optional[int] = None,
-    blacklist_scan_end: Optional[int] = None,
+
+# ===========================
+# Page-parallel workers
+# ===========================
+
+# Per-process blacklist, installed once by the pool initializer instead of per chunk.
+_WORKER_BLACKLIST: Dict[str, set] = {}
+
+
+def _init_page_worker(header_footer_blacklist: Optional[Dict[str, set]]) -> None:
+    global _WORKER_BLACKLIST
+    _WORKER_BLACKLIST = header_footer_blacklist or {}
+
+
+def _extract_chunk_worker(
+    pdf_path: PdfSource,
+    indices: List[int],
+    cache: Optional[PageLayerCache],
+    backend: str,
+    options: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        return list(_iter_pages(reader, indices, _WORKER_BLACKLIST, **options))
+
+
+def page_worker_pool(workers: int, header_footer_blacklist: Optional[Dict[str, set]]) -> ProcessPoolExecutor:
+    """
+    A process pool whose workers hold `header_footer_blacklist`, for submit_page_chunk
+    jobs; other jobs can share it.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_page_worker, initargs=(header_footer_blacklist,)
+    )
+
+
+def submit_page_chunk(
+    pool: ProcessPoolExecutor,
+    pdf_path: PdfSource,
+    indices: List[int],
     remove_headers_footers: bool = True,
     remove_table_text_from_flow: bool = True,
     extract_tables: bool = True,
-) -> Dict[str, Any]:
-    scan_start = blacklist_scan_start or page_start
-    scan_end = blacklist_scan_end or page_end
+    top_margin: float = 70.0,
+    bottom_margin: float = 70.0,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+) -> Future:
+    """
+    Extract the 0-based page `indices` on a page_worker_pool, with the pool's blacklist.
+    Read the future with traced_result: a list of page records in `indices` order.
+    """
+    options = {
+        "remove_headers_footers": remove_headers_footers,
+        "remove_table_text_from_flow": remove_table_text_from_flow,
+        "extract_tables": extract_tables,
+        "top_margin": top_margin,
+        "bottom_margin": bottom_margin,
+    }
+    return traced_submit(pool, _extract_chunk_worker, pdf_path, indices, cache, backend, options)
 
-    blacklist = build_header_footer_blacklist(
-        pdf_path,
-        page_start=scan_start,
-        page_end=scan_end,
-        min_repeat_ratio=0.6,
-    )
 
-    pages = extract_dsm_pages_structured(
-        pdf_path,
-        page_start=page_start,
-        page_end=page_end,
-        header_footer_blacklist=blacklist,
-        remove_headers_footers=remove_headers_footers,
-        remove_table_text_from_flow=remove_table_text_from_flow,
-        extract_tables=extract_tables,
-    )
+def _fused_chunk_worker(
+    pdf_path: PdfSource,
+    indices: List[int],
+    scan_range: range,
+    extract_range: range,
+    cache: Optional[PageLayerCache],
+    backend: str,
+    options: Dict[str, Any],
+) -> Tuple[Dict[str, int], Dict[str, int], int, List[PageLines]]:
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        return _fused_pages(reader, indices, scan_range, extract_range, **options)
 
-    return {
-        "blacklist": {"headers": sorted(blacklist["headers"]), "footers": sorted(blacklist["footers"])},
-        "pages": pages,
-    }
+
+def _contiguous_chunks(indices: List[int], n_chunks: int) -> List[List[int]]:
+    size = -(-len(indices) // max(n_chunks, 1))
+    return [indices[k:k + size] for k in range(0, len(indices), size)]
 
 
 # ===========================
-# Formatting utilities
+# Per-page time budget
 # ===========================
 
-HEADER_PATTERNS = [
-    re.compile(r"^\s*\d{1,4}\s+[A-Z][A-Za-z].*(Disorder|Disorders)\s*$"),
-    re.compile(r"^\s*[A-Z][A-Za-z].*(Disorder|Disorders)\s+\d{1,4}\s*$"),
-    re.compile(r"^\s*Depressive\s+Disorders\s*$", re.IGNORECASE),
-]
+# Degraded retry for a page that ran over its budget: no table detection, every word in the flow.
+_DEGRADED_OPTIONS = {"extract_tables": False, "remove_table_text_from_flow": False}
 
 
-def remove_running_headers(text: str) -> str:
-    text = re.sub(r"\s*\b\d{1,4}\s+Depressive\s+Disorders\b\s*", " ", text)
-    text = re.sub(r"\s*\bMajor\s+Depressive\s+Disorder\s+\d{1,4}\b\s*", " ", text)
-    text = re.sub(r"\s*\bDepressive\s+Disorders\b\s*", " ", text)
+def _guarded_page_worker(
+    conn: Connection,
+    pdf_path: str,
+    cache: Optional[PageLayerCache],
+    backend: str,
+    header_footer_blacklist: Optional[Dict[str, set]],
+    options: Dict[str, Any],
+) -> None:
+    """Worker loop: receive (index, degraded), send back (index, record, error); None stops it."""
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        reader._open()  # open before reporting ready, so the first page's budget is not spent on it
+        conn.send("ready")
+        while True:
+            task = conn.recv()
+            if task is None:
+                return
+            index, degraded = task
+            page_options = {**options, **_DEGRADED_OPTIONS} if degraded else options
+            try:
+                record = next(_iter_pages(reader, [index], header_footer_blacklist, **page_options))
+                conn.send((index, record, None))
+            except Exception as exc:
+                conn.send((index, None, f"{type(exc).__name__}: {exc}"))
+
+
+class _GuardedWorker:
+    """One killable page worker process and the task it is running."""
+
+    def __init__(self, ctx: Any, args: Tuple[Any, ...]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_guarded_page_worker, args=(child_conn, *args), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.task: Optional[Tuple[int, bool]] = None
+        self.deadline = 0.0
+
+    def assign(self, task: Tuple[int, bool], budget: float) -> None:
+        self.conn.send(task)
+        self.task = task
+        self.deadline = time.monotonic() + budget
+
+    def stop(self, kill: bool = False) -> None:
+        if kill or self.task is not None:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def _failed_page_record(page_number: int) -> Dict[str, Any]:
+    return {
+        "page": page_number,
+        "text": "",
+        "headers": [],
+        "footers": [],
+        "tables": [],
+        "debug": {"column_mode": None, "num_words": 0, "num_tables": 0, "table_detection_skipped": False},
+    }
 
-    lines = text.splitlines()
-    kept = []
-    for ln in lines:
-        if any(p.match(ln.strip()) for p in HEADER_PATTERNS):
-            continue
-        kept.append(ln)
-    return "\n".join(kept)
 
+def _iter_pages_guarded(
+    pdf_path: PdfSource,
+    indices: List[int],
+    header_footer_blacklist: Optional[Dict[str, set]],
+    options: Dict[str, Any],
+    workers: int,
+    cache: Optional[PageLayerCache],
+    backend: str,
+    page_timeout: float,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Page records in page order, each page run in a killable worker process with a
+    `page_timeout` seconds budget. A page that runs over (or raises, or takes its
+    worker down) is retried once in degraded mode (_DEGRADED_OPTIONS) in a fresh
+    worker under the same budget; if that fails too the page comes back empty.
+    Either way the record gets debug["quarantine"] = {"reason", "retry", ...}, so a
+    run's worst case is bounded by about 2 * page_timeout per page.
+    """
+    ctx = multiprocessing.get_context()
+    # Workers get the path, not a DSMDocument: under fork a child would inherit the
+    # parent's open handle and share its file offset with every other worker.
+    args = (source_path(pdf_path), cache, backend, header_footer_blacklist, options)
+    todo: Deque[Tuple[int, bool]] = deque((i, False) for i in indices)
+    quarantine: Dict[int, Dict[str, Any]] = {}
+    done: Dict[int, Dict[str, Any]] = {}
+    pool: List[_GuardedWorker] = []
+    next_pos = 0
+
+    def finish(index: int, degraded: bool, record: Optional[Dict[str, Any]], reason: Optional[str]) -> None:
+        if reason is None:
+            if degraded:
+                record["debug"]["quarantine"] = quarantine[index]
+            done[index] = record
+        elif not degraded:
+            quarantine[index] = {"reason": reason, "retry": "degraded", "budget_seconds": page_timeout}
+            todo.appendleft((index, True))
+        else:
+            quarantine[index]["retry"] = "failed"
+            quarantine[index]["retry_reason"] = reason
+            record = _failed_page_record(index + 1)
+            record["debug"]["quarantine"] = quarantine[index]
+            done[index] = record
 
-def fix_hyphen_linebreaks(text: str) -> str:
-    return re.sub(r"-\s*\n\s*", "", text)
+    try:
+        while next_pos < len(indices):
+            pool = [w for w in pool if w.process.is_alive() or w.task is not None]
+            while len(pool) < min(workers, len(todo) + sum(w.task is not None for w in pool)):
+                pool.append(_GuardedWorker(ctx, args))
+            for w in pool:
+                if w.ready and w.task is None and todo:
+                    w.assign(todo.popleft(), page_timeout)
+
+            busy = [w for w in pool if w.task is not None]
+            now = time.monotonic()
+            timeout = min((w.deadline - now for w in busy), default=None)
+            ready_conns = mp_wait([w.conn for w in pool], timeout=max(timeout, 0) if timeout is not None else None)
+            for w in pool:
+                if w.conn not in ready_conns:
+                    continue
+                try:
+                    msg = w.conn.recv()
+                except (EOFError, OSError):
+                    msg = None
+                if msg is None and not w.ready:
+                    w.stop(kill=True)
+                    raise RuntimeError(f"Page worker exited during startup (exit code {w.process.exitcode})")
+                if msg == "ready":
+                    w.ready = True
+                    continue
+                task, w.task = w.task, None
+                if msg is None:
+                    # The worker died (crash, OOM kill); its task is retried like a failure.
+                    w.stop(kill=True)
+                    if task is not None:
+                        finish(task[0], task[1], None, f"worker exited with code {w.process.exitcode}")
+                    continue
+                index, record, error = msg
+                finish(index, task[1], record, error and f"error: {error}")
 
+            now = time.monotonic()
+            for w in pool:
+                if w.task is not None and now >= w.deadline:
+                    task, w.task = w.task, None
+                    w.stop(kill=True)
+                    finish(task[0], task[1], None, "timeout")
 
-def normalize_spaces(text: str) -> str:
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r" ?\n ?", "\n", text)
+            while next_pos < len(indices) and indices[next_pos] in done:
+                yield done.pop(indices[next_pos])
+                next_pos += 1
+    finally:
+        for w in pool:
+            if w.process.is_alive():
+                w.stop()
 
-    text = re.sub(r",(?=\S)", ", ", text)
-    text = re.sub(r";(?=\S)", "; ", text)
-    text = re.sub(r":(?=\S)", ": ", text)
 
-    text = re.sub(r"([A-Za-z0-9])\(", r"\1 (", text)
-    text = re.sub(r"\s+([,.;:!?])", r"\1", text)
-    text = re.sub(r"\(\s+", "(", text)
-    text = re.sub(r"\s+\)", ")", text)
+# ===========================
+# Main extraction
+# ===========================
 
-    return text.strip()
+def iter_dsm_pages_structured(
+    pdf_path: PdfSource,
+    page_start: int = 1,
+    page_end: Optional[int] = None,
+    header_footer_blacklist: Optional[Dict[str, set]] = None,
+    remove_headers_footers: bool = True,
+    remove_table_text_from_flow: bool = True,
+    extract_tables: bool = True,
+    top_margin: float = 70.0,
+    bottom_margin: float = 70.0,
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+    page_timeout: Optional[float] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield page records in page order as soon as each one is finished.
+
+    workers > 1 splits the range into contiguous chunks, one per worker process. Each
+    worker opens the PDF itself and receives the blacklist once through the pool
+    initializer; a chunk's pages are yielded once it and every earlier chunk are done.
+
+    With page_timeout (seconds), pages are handed out one at a time to killable
+    workers instead (at least one, even with workers=1); see _iter_pages_guarded.
+    """
+    options = {
+        "remove_headers_footers": remove_headers_footers,
+        "remove_table_text_from_flow": remove_table_text_from_flow,
+        "extract_tables": extract_tables,
+        "top_margin": top_margin,
+        "bottom_margin": bottom_margin,
+    }
 
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        p_end = page_end or reader.page_count()
 
-def collapse_spaced_letters(text: str) -> str:
-    def _collapse(match: re.Match) -> str:
-        return match.group(0).replace(" ", "")
+    yield from _iter_page_indices(
+        pdf_path,
+        list(range(page_start - 1, p_end)),
+        header_footer_blacklist,
+        options,
+        workers,
+        cache,
+        backend,
+        page_timeout,
+    )
 
-    text = re.sub(r"(?<!\w)(?:[A-Za-z]\s){2,}[A-Za-z](?!\w)", _collapse, text)
-    text = re.sub(r"(?<!\d)(?:\d\s){1,}\d(?!\d)", _collapse, text)
-    return text
 
+def _iter_page_indices(
+    pdf_path: PdfSource,
+    indices: List[int],
+    header_footer_blacklist: Optional[Dict[str, set]],
+    options: Dict[str, Any],
+    workers: int,
+    cache: Optional[PageLayerCache],
+    backend: str,
+    page_timeout: Optional[float] = None,
+) -> Iterator[Dict[str, Any]]:
+    if not indices:
+        return
+    if page_timeout is not None:
+        yield from _iter_pages_guarded(
+            pdf_path, indices, header_footer_blacklist, options, max(workers, 1), cache, backend, page_timeout
+        )
+        return
+    if workers <= 1:
+        with PageLayerReader(pdf_path, cache, backend) as reader:
+            yield from _iter_pages(reader, indices, header_footer_blacklist, **options)
+        return
+
+    chunks = _contiguous_chunks(indices, workers)
+    with page_worker_pool(len(chunks), header_footer_blacklist) as pool:
+        n = len(chunks)
+        for chunk_pages in traced_map(
+            pool, _extract_chunk_worker, [pdf_path] * n, chunks, [cache] * n, [backend] * n, [options] * n
+        ):
+            yield from chunk_pages
 
-def normalize_icd_codes(text: str) -> str:
-    def compact(code: str) -> str:
-        return re.sub(r"\s+", "", code)
 
-    text = re.sub(
-        r"\(\s*F\s*([0-9][0-9.\s]*)\)",
-        lambda m: f"(F{compact(m.group(1))})",
-        text,
-    )
-    text = re.sub(
-        r"\bF\s*([0-9][0-9.\s]*[0-9])\b",
-        lambda m: f"F{compact(m.group(1))}",
-        text,
+def extract_dsm_pages_structured(
+    pdf_path: PdfSource,
+    page_start: int = 1,
+    page_end: Optional[int] = None,
+    header_footer_blacklist: Optional[Dict[str, set]] = None,
+    remove_headers_footers: bool = True,
+    remove_table_text_from_flow: bool = True,
+    extract_tables: bool = True,
+    top_margin: float = 70.0,
+    bottom_margin: float = 70.0,
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+    page_timeout: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    return list(
+        iter_dsm_pages_structured(
+            pdf_path,
+            page_start=page_start,
+            page_end=page_end,
+            header_footer_blacklist=header_footer_blacklist,
+            remove_headers_footers=remove_headers_footers,
+            remove_table_text_from_flow=remove_table_text_from_flow,
+            extract_tables=extract_tables,
+            top_margin=top_margin,
+            bottom_margin=bottom_margin,
+            workers=workers,
+            cache=cache,
+            backend=backend,
+            page_timeout=page_timeout,
+        )
     )
-    return text
 
 
-def insert_section_breaks(text: str) -> str:
-    text = re.sub(r"\n(?=[A-Z][A-Za-z].*(Disorder|Disorders)\b)", "\n\n", text)
-    text = re.sub(r"\s*(Note:)\s*", r"\n\n\1 ", text)
-    return text
+_LEADING_PAGE_RE = re.compile(r"^(\d{1,4})\s+[A-Za-z]")
+_TRAILING_PAGE_RE = re.compile(r"[A-Za-z]\s+(\d{1,4})$")
+
+
+def detect_page_offset(
+    pdf_path: PdfSource,
+    sample_pages: int = 16,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+) -> int:
+    """
+    PDF page minus printed page number, by majority vote over running heads
+    ("94 Depressive Disorders" / "Major Depressive Disorder 103") on evenly spaced pages.
+    """
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        n_pages = reader.page_count()
+    votes: Counter = Counter()
+    step = max(n_pages // (sample_pages + 1), 1)
+    for page_no in range(step, n_pages + 1, step):
+        record = extract_dsm_pages_structured(
+            pdf_path, page_no, page_no, extract_tables=False, remove_table_text_from_flow=False,
+            cache=cache, backend=backend,
+        )[0]
+        for line in record["headers"] + record["footers"]:
+            m = _LEADING_PAGE_RE.match(line) or _TRAILING_PAGE_RE.search(line)
+            if m:
+                votes[page_no - int(m.group(1))] += 1
+                break
+    if not votes:
+        raise ValueError("Could not detect the printed page offset; pass --page-offset")
+    offset, count = votes.most_common(1)[0]
+    if count < 3:
+        raise ValueError(f"Printed page offset is ambiguous ({dict(votes)}); pass --page-offset")
+    return offset
+
+
+def _extract_dsm_fused(
+    pdf_path: PdfSource,
+    page_start: int,
+    page_end: Optional[int],
+    scan_start: int,
+    scan_end: Optional[int],
+    remove_headers_footers: bool = True,
+    remove_table_text_from_flow: bool = True,
+    extract_tables: bool = True,
+    top_margin: float = 70.0,
+    bottom_margin: float = 70.0,
+    min_repeat_ratio: float = 0.6,
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+) -> Tuple[Dict[str, set], List[Dict[str, Any]]]:
+    """
+    Single word pass over the union of the blacklist scan range and the extraction range.
+    Margin lines are counted as pages go by, extraction pages are retained as PageLines,
+    and the blacklist is applied to the retained lines once the counts are complete.
+    With workers > 1 each chunk returns its own counts and PageLines, merged in page order.
+    """
+    options = {
+        "remove_table_text_from_flow": remove_table_text_from_flow,
+        "extract_tables": extract_tables,
+        "top_margin": top_margin,
+        "bottom_margin": bottom_margin,
+    }
 
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        n_pages = reader.page_count()
+        scan_range = range(scan_start - 1, scan_end or n_pages)
+        extract_range = range(page_start - 1, page_end or n_pages)
+        indices = sorted(set(scan_range) | set(extract_range))
+
+        if workers <= 1:
+            chunk_results = [_fused_pages(reader, indices, scan_range, extract_range, **options)]
+
+    if workers > 1:
+        chunks = _contiguous_chunks(indices, workers)
+        n = len(chunks)
+        with ProcessPoolExecutor(max_workers=n) as pool:
+            chunk_results = list(
+                traced_map(
+                    pool,
+                    _fused_chunk_worker,
+                    [pdf_path] * n,
+                    chunks,
+                    [scan_range] * n,
+                    [extract_range] * n,
+                    [cache] * n,
+                    [backend] * n,
+                    [options] * n,
+                )
+            )
 
-def format_lettered_criteria(text: str) -> str:
-    text = re.sub(r"\s*([A-Z])\.\s*", r"\n\n\1.\n", text)
-    text = re.sub(
-        r"\bCriteria\s+([A-Z])\s*[\u2013-]\s*([A-Z])\b",
-        lambda m: f"Criteria {m.group(1)}{chr(8211)}{m.group(2)}",
-        text,
-    )
-    return text
+    headers_count: Dict[str, int] = {}
+    footers_count: Dict[str, int] = {}
+    total_pages = 0
+    retained: List[PageLines] = []
+    for chunk_headers, chunk_footers, chunk_total, chunk_retained in chunk_results:
+        for txt, c in chunk_headers.items():
+            headers_count[txt] = headers_count.get(txt, 0) + c
+        for txt, c in chunk_footers.items():
+            footers_count[txt] = footers_count.get(txt, 0) + c
+        total_pages += chunk_total
+        retained.extend(chunk_retained)
+
+    blacklist = _blacklist_from_counts(headers_count, footers_count, total_pages, min_repeat_ratio)
+    pages = []
+    for page_lines in retained:
+        with span("page", page_lines.page):
+            pages.append(_page_record(page_lines, blacklist, remove_headers_footers, top_margin, bottom_margin))
+    return blacklist, pages
 
 
-def format_numbered_list(text: str) -> str:
-    text = re.sub(r"(\b\d{1,2})\.\s*", r"\1. ", text)
-    text = re.sub(r"(?<!\n)(\b\d{1,2}\.)\s*", r"\n\n\1 ", text)
-    return text
+def extract_dsm_clean_text(
+    pdf_path: PdfSource,
+    page_start: int = 1,
+    page_end: Optional[int] = None,
+    blacklist_scan_start: Optional[int] = None,
+    blacklist_scan_end: Optional[int] = None,
+    remove_headers_footers: bool = True,
+    remove_table_text_from_flow: bool = True,
+    extract_tables: bool = True,
+    fused: bool = True,
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+    sampled_blacklist: bool = False,
+    page_timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    sampled_blacklist=True builds a digit-masked template blacklist from a stratified
+    page sample (build_header_footer_templates) instead of counting every scanned
+    page; the extraction pass then runs on its own since there is nothing to fuse.
+    The result's "blacklist" then lists templates ("# Depressive Disorders") and
+    carries "digit_masked": true.
+
+    page_timeout (seconds) bounds every extraction page (_iter_pages_guarded; the
+    blacklist pass reads words only and is not bounded) and adds a "quarantine" list
+    to the result: one entry per page that ran over or failed, with its retry outcome.
+    """
+    scan_start = blacklist_scan_start or page_start
+    scan_end = blacklist_scan_end or page_end
 
+    if fused and not sampled_blacklist and page_timeout is None:
+        blacklist, pages = _extract_dsm_fused(
+            pdf_path,
+            page_start,
+            page_end,
+            scan_start,
+            scan_end,
+            remove_headers_footers=remove_headers_footers,
+            remove_table_text_from_flow=remove_table_text_from_flow,
+            extract_tables=extract_tables,
+            min_repeat_ratio=0.6,
+            workers=workers,
+            cache=cache,
+            backend=backend,
+        )
+    else:
+        build_blacklist = build_header_footer_templates if sampled_blacklist else build_header_footer_blacklist
+        blacklist = build_blacklist(
+            pdf_path,
+            page_start=scan_start,
+            page_end=scan_end,
+            min_repeat_ratio=0.6,
+            cache=cache,
+            backend=backend,
+        )
+
+        pages = extract_dsm_pages_structured(
+            pdf_path,
+            page_start=page_start,
+            page_end=page_end,
+            header_footer_blacklist=blacklist,
+            remove_headers_footers=remove_headers_footers,
+            remove_table_text_from_flow=remove_table_text_from_flow,
+            extract_tables=extract_tables,
+            workers=workers,
+            cache=cache,
+            backend=backend,
+            page_timeout=page_timeout,
+        )
+
+    out = {
+        "blacklist": _blacklist_summary(blacklist),
+        "pages": pages,
+    }
+    if page_timeout is not None:
+        out["quarantine"] = quarantine_list(pages)
+    return out
 
-def format_notes_and_coding(text: str) -> str:
-    text = re.sub(r"\s*(Coding and Recording Procedures)\s*", r"\n\n\1\n", text)
-    text = re.sub(r"\s*(Recording Procedures)\s*", r"\n\n\1\n", text)
-    text = re.sub(r"\s*(Specify:)\s*", r"\n\n\1\n", text)
-    text = re.sub(r"\s*(Specify if:)\s*", r"\n\n\1\n", text)
-    return text
 
+def quarantine_list(pages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """[{"page", "reason", "retry", ...}] for the pages that ran over their time budget or failed."""
+    return [{"page": p["page"], **p["debug"]["quarantine"]} for p in pages if "quarantine" in p["debug"]]
 
-def deglue_common_collapses(text: str) -> str:
-    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
-    text = re.sub(r"([A-Za-z])(\d)", r"\1 \2", text)
-    text = re.sub(r"(\d)([A-Za-z])", r"\1 \2", text)
-    return text
 
+# ===========================
+# Incremental extraction
+# ===========================
 
-def cleanup_blank_lines(text: str) -> str:
-    return re.sub(r"\n{3,}", "\n\n", text).strip()
+def extract_dsm_incremental(
+    pdf_path: PdfSource,
+    out_json: str,
+    page_start: int = 1,
+    page_end: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    blacklist_scan_start: Optional[int] = None,
+    blacklist_scan_end: Optional[int] = None,
+    remove_headers_footers: bool = True,
+    remove_table_text_from_flow: bool = True,
+    extract_tables: bool = True,
+    top_margin: float = 70.0,
+    bottom_margin: float = 70.0,
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+    sampled_blacklist: bool = False,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Resumable extraction merged into an existing output JSON.
+
+    Every page is fingerprinted by (PDF hash, page index, settings hash); the settings
+    hash covers the extraction options and the blacklist in effect. Pages whose
+    checkpointed fingerprint matches are reused, the rest are extracted and appended
+    to the checkpoint one by one. Pages already in `out_json` outside the requested
+    range are kept. Returns the merged output and {"reused", "extracted"} counts.
+    """
+    options = {
+        "remove_headers_footers": remove_headers_footers,
+        "remove_table_text_from_flow": remove_table_text_from_flow,
+        "extract_tables": extract_tables,
+        "top_margin": top_margin,
+        "bottom_margin": bottom_margin,
+    }
+    pdf_hash = file_content_hash(source_path(pdf_path))
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        n_pages = reader.page_count()
+    p_end = page_end or n_pages
+    scan_start = blacklist_scan_start or page_start
+    scan_end = blacklist_scan_end or p_end
+
+    with ExtractionCheckpoint(checkpoint_path or out_json + ".checkpoint.jsonl") as ckpt:
+        blacklist_key = params_key(
+            {
+                "version": _LAYER_VERSION,
+                "blacklist_version": _BLACKLIST_VERSION,
+                "pdf": pdf_hash,
+                "scan": [scan_start, scan_end],
+                "margins": [top_margin, bottom_margin],
+                "min_repeat_ratio": 0.6,
+                "sampled": sampled_blacklist,
+            }
+        )
+        if ckpt.blacklist_key == blacklist_key and ckpt.blacklist is not None:
+            blacklist = ckpt.blacklist
+        else:
+            build_blacklist = build_header_footer_templates if sampled_blacklist else build_header_footer_blacklist
+            blacklist = build_blacklist(
+                pdf_path,
+                page_start=scan_start,
+                page_end=scan_end,
+                top_margin=top_margin,
+                bottom_margin=bottom_margin,
+                min_repeat_ratio=0.6,
+                cache=cache,
+                backend=backend,
+            )
+            ckpt.set_blacklist(blacklist_key, blacklist)
+
+        settings = params_key(
+            {
+                "version": _LAYER_VERSION,
+                "blacklist_version": _BLACKLIST_VERSION,
+                "words": WORD_SETTINGS,
+                "tables": TABLE_SETTINGS,
+                "backend": backend,
+                "options": options,
+                "blacklist": _blacklist_summary(blacklist),
+            }
+        )
+
+        def fingerprint(index: int) -> Dict[str, Any]:
+            return {"pdf": pdf_hash, "page": index, "settings": settings}
+
+        indices = list(range(page_start - 1, p_end))
+        stale = [i for i in indices if ckpt.fresh_record(fingerprint(i)) is None]
+        for record in _iter_page_indices(pdf_path, stale, blacklist, options, workers, cache, backend):
+            ckpt.add(fingerprint(record["page"] - 1), record)
+        ckpt.compact()
+
+        merged: Dict[int, Dict[str, Any]] = {}
+        if os.path.exists(out_json):
+            with open(out_json, "r", encoding="utf-8") as f:
+                for page in json.load(f).get("pages", []):
+                    merged[int(page["page"])] = page
+        for i in indices:
+            merged[i + 1] = ckpt.fresh_record(fingerprint(i))
+
+    out = {
+        "blacklist": _blacklist_summary(blacklist),
+        "pages": [merged[p] for p in sorted(merged)],
+    }
+    _ensure_parent_dir(out_json)
+    tmp_path = out_json + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, out_json)
 
+    return out, {"reused": len(indices) - len(stale), "extracted": len(stale)}
 
-def format_as_document(pages_text: List[str]) -> str:
-    raw = "\n".join(pages_text)
 
-    raw = fix_hyphen_linebreaks(raw)
-    raw = normalize_icd_codes(raw)
-    raw = remove_running_headers(raw)
+# ===========================
+# Bounded-memory extraction
+# ===========================
+
+class _PageSpill:
+    """Append-only JSON-lines spill file for finished page records; iterable any number of times."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix="dsm_pages_", suffix=".spill.jsonl")
+        self._fh: IO[str] = os.fdopen(fd, "w", encoding="utf-8")
+        self.count = 0
+
+    def __enter__(self) -> "_PageSpill":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._fh.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self._fh.flush()
+        with open(self.path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                yield json.loads(line)
+
+
+def _write_pages_json(fh: IO[str], blacklist: Dict[str, Any], pages: Iterable[Dict[str, Any]]) -> None:
+    """Stream {"blacklist", "pages"} to `fh`, byte-identical to json.dump(..., indent=2)."""
+    head = json.dumps({"blacklist": blacklist, "pages": []}, indent=2, ensure_ascii=False)
+    fh.write(head[: -len("]\n}")])
+    n = 0
+    for page in pages:
+        fh.write("\n" if n == 0 else ",\n")
+        fh.write(textwrap.indent(json.dumps(page, indent=2, ensure_ascii=False), "    "))
+        n += 1
+    fh.write("\n  ]\n}" if n else "]\n}")
+
+
+def _bounded_batch_worker(
+    pdf_path: PdfSource,
+    indices: List[int],
+    cache: Optional[PageLayerCache],
+    backend: str,
+    options: Dict[str, Any],
+) -> Tuple[List[Dict[str, Any]], int]:
+    # Each batch opens and closes its own backend, so a worker never accumulates document caches.
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        records = list(_iter_pages(reader, indices, _WORKER_BLACKLIST, **options))
+    return records, _current_rss_bytes()
+
+
+def extract_dsm_bounded(
+    pdf_path: PdfSource,
+    out_json: str,
+    page_start: int = 1,
+    page_end: Optional[int] = None,
+    blacklist_scan_start: Optional[int] = None,
+    blacklist_scan_end: Optional[int] = None,
+    remove_headers_footers: bool = True,
+    remove_table_text_from_flow: bool = True,
+    extract_tables: bool = True,
+    top_margin: float = 70.0,
+    bottom_margin: float = 70.0,
+    batch_pages: int = 32,
+    rss_budget_mb: Optional[int] = None,
+    spill_dir: Optional[str] = None,
+    out_doc: Optional[str] = None,
+    doc_format: str = "txt",
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+    sampled_blacklist: bool = False,
+) -> Dict[str, Any]:
+    """
+    Whole-book extraction whose peak memory does not grow with the page count.
+
+    - every backend page is closed as soon as its layer is built, and the backend
+      itself is reopened every `batch_pages` pages (MemoryBudget), which drops the
+      document-level object caches too;
+    - finished page records go to a JSON-lines spill file (in `spill_dir`, default
+      next to `out_json`) instead of a list; `out_json` and `out_doc` are then
+      streamed from the spill. `out_json` matches extract_dsm_clean_text's output;
+    - with `rss_budget_mb`, going over the budget halves the batch size.
+
+    The blacklist is built in its own pass first (there is no fused pass here).
+    With workers > 1, batches are handed out one at a time, and the next batch is
+    sized after the RSS each worker reports.
+    Returns {"pages", "batch_pages", "shrinks", "peak_rss_mb", "peak_rss_children_mb"}.
+    """
+    memory = MemoryBudget(batch_pages=max(1, batch_pages), rss_budget_mb=rss_budget_mb)
+    options = {
+        "remove_headers_footers": remove_headers_footers,
+        "remove_table_text_from_flow": remove_table_text_from_flow,
+        "extract_tables": extract_tables,
+        "top_margin": top_margin,
+        "bottom_margin": bottom_margin,
+    }
+
+    with PageLayerReader(pdf_path, cache, backend) as reader:
+        p_end = page_end or reader.page_count()
+    build_blacklist = build_header_footer_templates if sampled_blacklist else build_header_footer_blacklist
+    blacklist = build_blacklist(
+        pdf_path,
+        page_start=blacklist_scan_start or page_start,
+        page_end=blacklist_scan_end or p_end,
+        top_margin=top_margin,
+        bottom_margin=bottom_margin,
+        min_repeat_ratio=0.6,
+        cache=cache,
+        backend=backend,
+        memory=memory,
+    )
+    indices = list(range(page_start - 1, p_end))
 
-    raw = normalize_spaces(raw)
-    raw = collapse_spaced_letters(raw)
-    raw = deglue_common_collapses(raw)
+    with _PageSpill(spill_dir or os.path.dirname(os.path.abspath(out_json))) as spill:
+        if workers <= 1:
+            with PageLayerReader(pdf_path, cache, backend, memory) as reader:
+                for record in _iter_pages(reader, indices, blacklist, **options):
+                    spill.add(record)
+        else:
+            budget = rss_budget_mb * 1024 * 1024 if rss_budget_mb is not None else None
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_page_worker,
+                initargs=(blacklist,),
+            ) as pool:
+                pending: Deque[Any] = deque()
+                pos = 0
+                while pos < len(indices) or pending:
+                    while pos < len(indices) and len(pending) < workers:
+                        batch = indices[pos:pos + memory.batch_pages]
+                        pos += len(batch)
+                        pending.append(
+                            traced_submit(pool, _bounded_batch_worker, pdf_path, batch, cache, backend, options)
+                        )
+                    records, worker_rss = traced_result(pending.popleft())
+                    for record in records:
+                        spill.add(record)
+                    if budget is not None and worker_rss > budget and memory.batch_pages > 1:
+                        memory.batch_pages //= 2
+                        memory.shrinks += 1
+
+        bl_lists = _blacklist_summary(blacklist)
+        _ensure_parent_dir(out_json)
+        tmp_path = out_json + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            _write_pages_json(f, bl_lists, spill)
+        os.replace(tmp_path, out_json)
+        if out_doc:
+            _write_doc(spill, out_doc, doc_format)
+        n_pages = spill.count
 
-    raw = insert_section_breaks(raw)
-    raw = format_lettered_criteria(raw)
-    raw = format_numbered_list(raw)
-    raw = format_notes_and_coding(raw)
+    return {
+        "pages": n_pages,
+        "batch_pages": memory.batch_pages,
+        "shrinks": memory.shrinks,
+        "peak_rss_mb": round(_peak_rss_bytes() / (1024 * 1024), 1),
+        "peak_rss_children_mb": round(_peak_rss_bytes(children=True) / (1024 * 1024), 1),
+    }
 
-    return cleanup_blank_lines(raw)
+
+# ===========================
+# Formatting utilities
+# ===========================
+
+def cleanup_blank_lines(text: str) -> str:
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def format_as_document(
+    pages_text: Iterable[str],
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+) -> str:
+    # Run by the precompiled engine in format_engine (benchmark_formatter.py checks it against
+    # the original step-function chain). With workers or a cache, pages are formatted one by
+    # one and stitched (paged_formatter), same output.
+    if workers > 1 or cache:
+        return format_pages_paged(pages_text, "document", workers, cache)
+    raw = "\n".join(pages_text)
+    with span("format.document"):
+        return FORMAT_ENGINE.document(raw)
 
 
 # ===========================
@@ -570,17 +1628,25 @@ _H3_HEADINGS = {
     "Specify if:",
 }
 
+_SEVERITY_LEAD_RE = re.compile(r"^(Mild|Moderate|Severe|With|In)\b")
+_DISORDER_HEADING_RE = re.compile(r"^[A-Z][A-Za-z].*(Disorder|Disorders)\b$")
+_LIST_LEAD_RE = re.compile(r"^(\d+\.\s+)([^,.;:]+)(.*)$")
+_CRITERION_LETTER_RE = re.compile(r"^[A-Z]\.$")
+_NOTE_RE = re.compile(r"^Note:\s*", re.IGNORECASE)
+_NUMBERED_ITEM_RE = re.compile(r"^\d+\.\s+")
+_SPECIFIER_ITEM_RE = re.compile(r"^(With|Without|In)\b")
+
 
 def _is_disorder_heading(line: str) -> bool:
     if "(p." in line or "(pp." in line:
         return False
-    if re.match(r"^(Mild|Moderate|Severe|With|In)\b", line):
+    if _SEVERITY_LEAD_RE.match(line):
         return False
-    return bool(re.match(r"^[A-Z][A-Za-z].*(Disorder|Disorders)\b$", line))
+    return bool(_DISORDER_HEADING_RE.match(line))
 
 
 def _bold_list_lead(line: str) -> str:
-    m = re.match(r"^(\d+\.\s+)([^,.;:]+)(.*)$", line)
+    m = _LIST_LEAD_RE.match(line)
     if not m:
         return line
     lead = m.group(2).strip()
@@ -606,89 +1672,182 @@ def _format_markdown_table(rows: List[List[str]]) -> List[str]:
     return lines
 
 
-def format_as_markdown(pages: List[Dict[str, Any]]) -> str:
-    raw = "\n".join(p.get("text", "") for p in pages)
-
-    raw = fix_hyphen_linebreaks(raw)
-    raw = normalize_icd_codes(raw)
-    raw = remove_running_headers(raw)
-    raw = normalize_spaces(raw)
-    raw = collapse_spaced_letters(raw)
-    raw = deglue_common_collapses(raw)
+class _MarkdownLines:
+    """
+    Line state machine of the Markdown output: a blockquote continues after a Note
+    until the next blank line or block, and "With ..." lines under "Specify if:"
+    become bullets. Feed stripped lines in document order.
+    """
 
-    lines = [ln.strip() for ln in raw.splitlines()]
-    out_lines: List[str] = []
-    in_blockquote = False
-    in_specify_list = False
+    def __init__(self) -> None:
+        self.in_blockquote = False
+        self.in_specify_list = False
 
-    for ln in lines:
+    def render(self, ln: str) -> List[str]:
         if not ln:
-            out_lines.append("")
-            in_blockquote = False
-            in_specify_list = False
-            continue
+            self.in_blockquote = False
+            self.in_specify_list = False
+            return [""]
 
         if _is_disorder_heading(ln):
-            out_lines.extend(["", f"# {ln}", ""])
-            in_blockquote = False
-            continue
+            self.in_blockquote = False
+            return ["", f"# {ln}", ""]
 
         if ln in _H2_HEADINGS:
-            out_lines.extend(["", f"## {ln}", ""])
-            in_blockquote = False
-            continue
+            self.in_blockquote = False
+            return ["", f"## {ln}", ""]
 
         if ln in _H3_HEADINGS:
-            out_lines.extend(["", f"### {ln}", ""])
-            in_blockquote = False
-            in_specify_list = ln == "Specify if:"
-            continue
+            self.in_blockquote = False
+            self.in_specify_list = ln == "Specify if:"
+            return ["", f"### {ln}", ""]
 
-        if re.match(r"^[A-Z]\.$", ln):
-            out_lines.extend(["", f"### {ln}", ""])
-            in_blockquote = False
-            in_specify_list = False
-            continue
+        if _CRITERION_LETTER_RE.match(ln):
+            self.in_blockquote = False
+            self.in_specify_list = False
+            return ["", f"### {ln}", ""]
 
-        if re.match(r"^Note:", ln, re.IGNORECASE):
-            note_body = re.sub(r"^Note:\s*", "", ln, flags=re.IGNORECASE)
-            out_lines.append(f"> **Note:** {note_body}".rstrip())
-            in_blockquote = True
-            in_specify_list = False
-            continue
+        if _NOTE_RE.match(ln):
+            note_body = _NOTE_RE.sub("", ln)
+            self.in_blockquote = True
+            self.in_specify_list = False
+            return [f"> **Note:** {note_body}".rstrip()]
 
         if ln.startswith("Connected footnote"):
-            out_lines.append(f"> {ln}")
-            in_blockquote = True
-            in_specify_list = False
-            continue
+            self.in_blockquote = True
+            self.in_specify_list = False
+            return [f"> {ln}"]
 
-        if re.match(r"^\d+\.\s+", ln):
-            out_lines.append(_bold_list_lead(ln))
-            in_blockquote = False
-            in_specify_list = False
-            continue
+        if _NUMBERED_ITEM_RE.match(ln):
+            self.in_blockquote = False
+            self.in_specify_list = False
+            return [_bold_list_lead(ln)]
 
-        if in_specify_list and re.match(r"^(With|Without|In)\b", ln):
-            out_lines.append(f"- {ln}")
-            continue
+        if self.in_specify_list and _SPECIFIER_ITEM_RE.match(ln):
+            return [f"- {ln}"]
 
-        if in_blockquote:
-            out_lines.append(f"> {ln}")
-            continue
+        if self.in_blockquote:
+            return [f"> {ln}"]
 
-        out_lines.append(ln)
+        return [ln]
 
-    out_lines.append("")
-    for page in pages:
-        tables = page.get("tables") or []
-        for table in tables:
-            rows = table.get("rows") or []
-            md_table = _format_markdown_table(rows)
-            if md_table:
-                out_lines.extend(["", "### Table", *md_table, ""])
 
-    return cleanup_blank_lines("\n".join(out_lines))
+def _markdown_table_lines(tables: Iterable[Dict[str, Any]]) -> List[str]:
+    out_lines: List[str] = []
+    for table in tables:
+        rows = table.get("rows") or []
+        md_table = _format_markdown_table(rows)
+        if md_table:
+            out_lines.extend(["", "### Table", *md_table, ""])
+    return out_lines
+
+
+def format_as_markdown(
+    pages: Iterable[Dict[str, Any]],
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+) -> str:
+    # Single pass over `pages` so a streaming page iterator can be passed directly;
+    # only the page texts and tables are kept.
+    page_tables: List[Dict[str, Any]] = []
+
+    def page_texts() -> Iterator[str]:
+        for page in pages:
+            page_tables.extend(page.get("tables") or [])
+            yield page.get("text", "")
+
+    if workers > 1 or cache:
+        raw = format_pages_paged(page_texts(), "normalize", workers, cache)
+    else:
+        joined = "\n".join(page_texts())
+        with span("format.normalize"):
+            raw = FORMAT_ENGINE.normalize(joined)
+
+    with span("format.markdown"):
+        renderer = _MarkdownLines()
+        out_lines: List[str] = []
+        for ln in raw.splitlines():
+            out_lines.extend(renderer.render(ln.strip()))
+
+        out_lines.append("")
+        out_lines.extend(_markdown_table_lines(page_tables))
+
+        return cleanup_blank_lines("\n".join(out_lines))
+
+
+_BLANK_RUN_RE = re.compile(r"\n{3,}")
+
+
+class _BlankLineWriter:
+    """
+    cleanup_blank_lines applied while writing: a whitespace run is held back until
+    non-space text follows it (then written with 3+ newlines collapsed to 2), so
+    leading and trailing whitespace of the whole output never reach `fh`.
+    """
+
+    def __init__(self, fh: IO[str]):
+        self.fh = fh
+        self._pending = ""
+        self._started = False
+
+    def write(self, text: str) -> None:
+        body = text.rstrip()
+        if not body:
+            if self._started:
+                self._pending += text
+            return
+        if self._started:
+            body = self._pending + body
+        else:
+            body = body.lstrip()
+            self._started = True
+        self.fh.write(_BLANK_RUN_RE.sub("\n\n", body))
+        self._pending = text[len(text.rstrip()) :]
+
+
+def write_markdown_stream(
+    pages: Iterable[Dict[str, Any]],
+    fh: IO[str],
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+) -> None:
+    """
+    format_as_markdown(pages) written to `fh` as pages arrive, byte for byte the same.
+    Text is normalized page by page (paged_formatter) and each finished line goes
+    straight through the line state machine to `fh`; only the open seam, one partial
+    line and the tables (appended at the end, as in format_as_markdown) are held.
+    """
+    page_tables: List[Dict[str, Any]] = []
+
+    def page_texts() -> Iterator[str]:
+        for page in pages:
+            page_tables.extend(page.get("tables") or [])
+            yield page.get("text", "")
+
+    out = _BlankLineWriter(fh)
+    renderer = _MarkdownLines()
+    sep = ""
+
+    def emit(lines: List[str]) -> None:
+        nonlocal sep
+        for line in lines:
+            out.write(sep + line)
+            sep = "\n"
+
+    # Normalized text only has "\n" line breaks (the running-header pass re-joins all
+    # lines with "\n"), so splitting on "\n" matches format_as_markdown's splitlines().
+    partial = ""
+    for piece in iter_pages_paged(page_texts(), "normalize", workers, cache):
+        with span("format.markdown"):
+            *lines, partial = (partial + piece).split("\n")
+            for ln in lines:
+                emit(renderer.render(ln.strip()))
+    with span("format.markdown"):
+        if partial:
+            emit(renderer.render(partial.strip()))
+
+        emit([""])
+        emit(_markdown_table_lines(page_tables))
 
 
 # ===========================
@@ -700,44 +1859,266 @@ def _ensure_parent_dir(path: str) -> None:
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
 
 
+def _tee_jsonl(pages: Iterable[Dict[str, Any]], fh: IO[str]) -> Iterator[Dict[str, Any]]:
+    """Write each page record as one JSON line (flushed) and pass it on."""
+    for page in pages:
+        fh.write(json.dumps(page, ensure_ascii=False) + "\n")
+        fh.flush()
+        yield page
+
+
+def _tag_sections(
+    pages: Iterable[Dict[str, Any]], sections: Optional[PageRangeIndex], page_offset: int
+) -> Iterator[Dict[str, Any]]:
+    """Pass page records on, each with its "section" (family / group / disorder) set when `sections` is given."""
+    for page in pages:
+        yield sections.tag(page, page_offset) if sections else page
+
+
+def _load_sections(args: argparse.Namespace, cache: Optional[PageLayerCache]) -> Tuple[Optional[PageRangeIndex], int]:
+    if not args.sections:
+        return None, 0
+    with open(args.sections, "r", encoding="utf-8") as f:
+        sections = PageRangeIndex.from_hierarchy(json.load(f))
+    if args.page_offset is not None:
+        return sections, args.page_offset
+    return sections, detect_page_offset(args.pdf, cache=cache, backend=args.backend)
+
+
+def _write_doc(
+    pages: Iterable[Dict[str, Any]],
+    out_doc: str,
+    doc_format: str,
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+) -> None:
+    _ensure_parent_dir(out_doc)
+    with open(out_doc, "w", encoding="utf-8") as f:
+        if doc_format == "md":
+            write_markdown_stream(pages, f, workers, cache)
+        else:
+            f.write(format_as_document((p.get("text", "") for p in pages), workers, cache))
+    print(f"Wrote formatted document to {os.path.abspath(out_doc)}")
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--pdf", required=True)
     ap.add_argument("--start", type=int, required=True)
     ap.add_argument("--end", type=int, required=True)
-    ap.add_argument("--out-json", required=True)
+    out = ap.add_mutually_exclusive_group(required=True)
+    out.add_argument("--out-json")
+    out.add_argument(
+        "--out-jsonl",
+        help="Stream page records as JSON lines while extracting; the first line holds the blacklist",
+    )
     ap.add_argument("--out-doc")
     ap.add_argument("--doc-format", choices=["txt", "md"], default="txt")
     ap.add_argument("--no-tables", action="store_true", default=False)
     ap.add_argument("--no-header-footer-removal", action="store_true", default=False)
-    args = ap.parse_args()
-
-    extracted = extract_dsm_clean_text(
-        args.pdf,
-        page_start=args.start,
-        page_end=args.end,
-        remove_headers_footers=not args.no_header_footer_removal,
-        remove_table_text_from_flow=not args.no_tables,
-        extract_tables=not args.no_tables,
+    ap.add_argument("--workers", type=int, default=1, help="Extract contiguous page chunks in N worker processes")
+    ap.add_argument(
+        "--format-workers",
+        type=int,
+        default=1,
+        help="Format pages in N worker processes (stitched at page edges; output is unchanged)",
     )
-
-    _ensure_parent_dir(args.out_json)
-    with open(args.out_json, "w", encoding="utf-8") as f:
-        json.dump(extracted, f, indent=2, ensure_ascii=False)
-
-    print(f"Wrote structured extraction to {os.path.abspath(args.out_json)}")
+    ap.add_argument(
+        "--cache-dir",
+        help="Persistent cache directory (page layers: words + tables; and formatted pages for --out-doc)",
+    )
+    ap.add_argument("--cache-max-mb", type=int, default=512)
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="Reuse unchanged pages from the checkpoint and merge results into the existing --out-json",
+    )
+    ap.add_argument("--checkpoint", help="Checkpoint path for --resume (default: <out-json>.checkpoint.jsonl)")
+    ap.add_argument(
+        "--backend",
+        choices=sorted(BACKENDS),
+        default="pdfplumber",
+        help="Page extraction backend (pdfminer reads the LTChar stream directly and is faster)",
+    )
+    ap.add_argument(
+        "--sampled-blacklist",
+        action="store_true",
+        default=False,
+        help="Build a digit-masked template blacklist from a stratified page sample",
+    )
+    ap.add_argument(
+        "--low-memory",
+        action="store_true",
+        default=False,
+        help="Bounded-memory run: close pages eagerly, recycle the backend per batch, spill records to disk",
+    )
+    ap.add_argument("--batch-pages", type=int, default=32, help="Pages per backend batch in --low-memory mode")
+    ap.add_argument("--rss-budget-mb", type=int, help="Halve the batch size whenever RSS exceeds this (--low-memory)")
+    ap.add_argument("--spill-dir", help="Directory for the --low-memory spill file (default: next to --out-json)")
+    ap.add_argument(
+        "--page-timeout",
+        type=float,
+        help="Per-page time budget in seconds: pages run in killable workers, a page over budget is "
+        "retried without tables and listed under \"quarantine\" in the output",
+    )
+    ap.add_argument(
+        "--sections",
+        help="Hierarchy JSON (build_family_hierarchy output, e.g. data/dsm_families.json): tag every page "
+        "record with the family, group and disorder its printed page falls in",
+    )
+    ap.add_argument("--page-offset", type=int, help="PDF page minus printed page for --sections (default: detect)")
+    ap.add_argument(
+        "--profile",
+        help="Time every stage; write the per-page breakdown and stage summary as JSON here "
+        "(plus <path>.folded, collapsed stacks for flame graph tools)",
+    )
+    args = ap.parse_args()
+    if args.resume and not args.out_json:
+        ap.error("--resume requires --out-json")
+    if args.low_memory and (args.resume or not args.out_json):
+        ap.error("--low-memory requires --out-json and cannot be combined with --resume")
+    if args.page_timeout is not None and (args.resume or args.low_memory):
+        ap.error("--page-timeout cannot be combined with --resume or --low-memory")
+    if args.sections and (args.resume or args.low_memory):
+        ap.error("--sections cannot be combined with --resume or --low-memory")
+
+    if not args.profile:
+        _run(args)
+        return
+    start_tracing()
+    try:
+        _run(args)
+    finally:
+        tracer = stop_tracing()
+        _ensure_parent_dir(args.profile)
+        report = write_profile(tracer, args.profile)
+        by_self = sorted(report["stages"].items(), key=lambda kv: -kv[1]["self_ms"])
+        print(f"Wrote profile to {os.path.abspath(args.profile)}")
+        for name, stats in by_self[:8]:
+            print(f"  {name:<20} {stats['self_ms'] / 1000:8.2f}s self  {stats['count']:>6} calls")
+        print(f"  slowest pages: {report['slowest_pages'][:10]}")
+
+
+def _run(args: argparse.Namespace) -> None:
+    cache = PageLayerCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+    sections, page_offset = _load_sections(args, cache)
+
+    if args.out_jsonl:
+        # Streaming needs the blacklist up front, so it runs as its own pass first.
+        build_blacklist = build_header_footer_templates if args.sampled_blacklist else build_header_footer_blacklist
+        blacklist = build_blacklist(
+            args.pdf,
+            page_start=args.start,
+            page_end=args.end,
+            min_repeat_ratio=0.6,
+            cache=cache,
+            backend=args.backend,
+        )
+        pages_iter = iter_dsm_pages_structured(
+            args.pdf,
+            page_start=args.start,
+            page_end=args.end,
+            header_footer_blacklist=blacklist,
+            remove_headers_footers=not args.no_header_footer_removal,
+            remove_table_text_from_flow=not args.no_tables,
+            extract_tables=not args.no_tables,
+            workers=args.workers,
+            cache=cache,
+            backend=args.backend,
+            page_timeout=args.page_timeout,
+        )
+        _ensure_parent_dir(args.out_jsonl)
+        with open(args.out_jsonl, "w", encoding="utf-8") as f:
+            header = {"blacklist": _blacklist_summary(blacklist)}
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            pages = _tee_jsonl(_tag_sections(pages_iter, sections, page_offset), f)
+            if args.out_doc:
+                _write_doc(pages, args.out_doc, args.doc_format, args.format_workers, cache)
+            else:
+                for _ in pages:
+                    pass
+        print(f"Wrote streamed extraction to {os.path.abspath(args.out_jsonl)}")
+        return
+
+    if args.low_memory:
+        stats = extract_dsm_bounded(
+            args.pdf,
+            args.out_json,
+            page_start=args.start,
+            page_end=args.end,
+            remove_headers_footers=not args.no_header_footer_removal,
+            remove_table_text_from_flow=not args.no_tables,
+            extract_tables=not args.no_tables,
+            batch_pages=args.batch_pages,
+            rss_budget_mb=args.rss_budget_mb,
+            spill_dir=args.spill_dir,
+            out_doc=args.out_doc,
+            doc_format=args.doc_format,
+            workers=args.workers,
+            cache=cache,
+            backend=args.backend,
+            sampled_blacklist=args.sampled_blacklist,
+        )
+        print(f"Wrote structured extraction to {os.path.abspath(args.out_json)}")
+        print(
+            f"Peak RSS {stats['peak_rss_mb']} MB (workers {stats['peak_rss_children_mb']} MB); "
+            f"{stats['pages']} pages, final batch size {stats['batch_pages']}, {stats['shrinks']} shrink(s)"
+        )
+        return
+
+    if args.resume:
+        extracted, stats = extract_dsm_incremental(
+            args.pdf,
+            args.out_json,
+            page_start=args.start,
+            page_end=args.end,
+            checkpoint_path=args.checkpoint,
+            remove_headers_footers=not args.no_header_footer_removal,
+            remove_table_text_from_flow=not args.no_tables,
+            extract_tables=not args.no_tables,
+            workers=args.workers,
+            cache=cache,
+            backend=args.backend,
+            sampled_blacklist=args.sampled_blacklist,
+        )
+        print(f"Reused {stats['reused']} pages, extracted {stats['extracted']} pages")
+        print(f"Merged structured extraction into {os.path.abspath(args.out_json)}")
+        # The document covers the requested range only, not every page merged into the JSON.
+        doc_pages = [p for p in extracted["pages"] if args.start <= p["page"] <= args.end]
+    else:
+        extracted = extract_dsm_clean_text(
+            args.pdf,
+            page_start=args.start,
+            page_end=args.end,
+            remove_headers_footers=not args.no_header_footer_removal,
+            remove_table_text_from_flow=not args.no_tables,
+            extract_tables=not args.no_tables,
+            workers=args.workers,
+            cache=cache,
+            backend=args.backend,
+            sampled_blacklist=args.sampled_blacklist,
+            page_timeout=args.page_timeout,
+        )
+        if sections:
+            for page in extracted["pages"]:
+                sections.tag(page, page_offset)
+
+        _ensure_parent_dir(args.out_json)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(extracted, f, indent=2, ensure_ascii=False)
+
+        print(f"Wrote structured extraction to {os.path.abspath(args.out_json)}")
+        doc_pages = extracted.get("pages", [])
+        for entry in extracted.get("quarantine", []):
+            print(f"Quarantined page {entry['page']}: {entry['reason']}, retry {entry['retry']}")
+
+    if not args.no_tables:
+        skipped = sum(1 for p in doc_pages if p["debug"].get("table_detection_skipped"))
+        print(f"Table detection skipped on {skipped} of {len(doc_pages)} pages (no ruled lines)")
 
     if args.out_doc:
-        pages = extracted.get("pages", [])
-        if args.doc_format == "md":
-            doc = format_as_markdown(pages)
-        else:
-            pages_text = [p.get("text", "") for p in pages]
-            doc = format_as_document(pages_text)
-        _ensure_parent_dir(args.out_doc)
-        with open(args.out_doc, "w", encoding="utf-8") as f:
-            f.write(doc)
-        print(f"Wrote formatted document to {os.path.abspath(args.out_doc)}")
+        _write_doc(doc_pages, args.out_doc, args.doc_format, args.format_workers, cache)
 
 
 if __name__ == "__main__":
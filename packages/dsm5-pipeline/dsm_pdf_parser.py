@@ -1,10 +1,14 @@
 import argparse
+import bisect
 import json
 import os
-import pdfplumber
 import re
 from typing import Any, Dict, List, Optional, Tuple
 
+from dataset_sqlite import write_structured_sqlite
+from dsm_document import DSMDocument, PdfSource, open_document, source_path
+from page_layer_cache import PageLayerCache, file_content_hash, params_key
+
 DSM5_FAMILY_TITLES: List[str] = [
     "Neurodevelopmental Disorders",
     "Schizophrenia Spectrum and Other Psychotic Disorders",
@@ -33,31 +37,84 @@ DSM5_FAMILY_TITLES: List[str] = [
 #---------------------------------------------------------
 # Basic
 #---------------------------------------------------------
-def extract_all_text(path: str) -> str:
+def extract_all_text(path: PdfSource) -> str:
     """Concatenate text from all pages into a single string."""
-    chunks: List[str] = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            chunks.append(page.extract_text() or "")
-    return "\n".join(chunks)
+    with open_document(path) as doc:
+        return doc.page_range_text(1, doc.page_count())
 
 
-def extract_page_range(path: str, start_page: int, end_page: int) -> str:
+def extract_page_range(path: PdfSource, start_page: int, end_page: int) -> str:
     """Extract a subset of pages (1-based inclusive)."""
-    chunks: List[str] = []
-    with pdfplumber.open(path) as pdf:
-        for i in range(start_page - 1, end_page):
-            chunks.append(pdf.pages[i].extract_text() or "")
-    return "\n".join(chunks)
+    with open_document(path) as doc:
+        return doc.page_range_text(start_page, end_page)
 
 
 #---------------------------------------------------------
 # Classification Parsing
 #---------------------------------------------------------
 
-def get_classification_text(path: str) -> str:
-    # adjust page numbers to match your copy
-    return extract_page_range(path, start_page=10, end_page=49)
+# The section opens with a "DSM-5 / Classification" title page; every later page
+# carries the running head "x DSM-5 Classification" / "DSM-5 Classification xi".
+_CLASSIFICATION_HEAD_RE = re.compile(
+    r"^(?:[ivxlcdm]+ )?DSM-5 Classification(?: [ivxlcdm]+)?(?: |$)", re.IGNORECASE
+)
+# Points from the top of the page searched for the head: the running head sits at ~60pt,
+# the title page's two-line "DSM-5 / Classification" reaches ~100pt.
+_CLASSIFICATION_HEAD_BAND = 100.0
+# Bump when the detection rule or the cached payload changes.
+_CLASSIFICATION_CACHE_VERSION = 2
+
+
+def _has_classification_head(page_text: str) -> bool:
+    top = " ".join(page_text.split("\n", 3)[:3])
+    return bool(_CLASSIFICATION_HEAD_RE.match(re.sub(r"\s+", " ", top).strip()))
+
+
+def find_classification_section(
+    path: PdfSource,
+    cache: Optional[PageLayerCache] = None,
+    max_scan_pages: int = 120,
+) -> Dict[str, Any]:
+    """
+    {"start", "end", "text"}: the 1-based inclusive PDF pages of the DSM-5
+    Classification section and their extracted text.
+
+    Pages are read from the front until the run of pages headed "DSM-5
+    Classification" ends. Only the top band of a page is read to look for the head;
+    the full text is extracted for the section's pages alone.
+    With a cache the result is stored under the PDF's content hash: later runs on
+    the same file skip the scan, and a different edition gets its own entry.
+    """
+    if cache:
+        pdf_hash = file_content_hash(source_path(path))
+        params = params_key({"section": "classification", "version": _CLASSIFICATION_CACHE_VERSION})
+        hit = cache.get(pdf_hash, "classification", params)
+        if hit is not None:
+            return hit
+
+    texts: List[str] = []
+    start: Optional[int] = None
+    with open_document(path) as doc:
+        for page_no in range(1, min(doc.page_count(), max_scan_pages) + 1):
+            if _has_classification_head(doc.page_band_text(page_no, _CLASSIFICATION_HEAD_BAND)):
+                if start is None:
+                    start = page_no
+                texts.append(doc.page_text(page_no))
+            elif start is not None:
+                break
+    if start is None:
+        raise ValueError(
+            f"No 'DSM-5 Classification' pages in the first {max_scan_pages} pages of {source_path(path)}"
+        )
+
+    section = {"start": start, "end": start + len(texts) - 1, "text": "\n".join(texts)}
+    if cache:
+        cache.put(pdf_hash, "classification", params, section)
+    return section
+
+
+def get_classification_text(path: PdfSource, cache: Optional[PageLayerCache] = None) -> str:
+    return find_classification_section(path, cache)["text"]
 
 
 def extract_disorder_classes(classification_text: str) -> List[Tuple[str, int]]:
@@ -67,15 +124,7 @@ def extract_disorder_classes(classification_text: str) -> List[Tuple[str, int]]:
       Neurodevelopmental Disorders (17)
       Bipolar and Related Disorders (65)
     """
-    normalized = re.sub(r"-\s*\n", "-", classification_text)
-    normalized = re.sub(r"\s+", " ", normalized)
-    classes: List[Tuple[str, int]] = []
-    for title in DSM5_FAMILY_TITLES:
-        pattern = rf"{re.escape(title)}\s*\((\d+)\)"
-        match = re.search(pattern, normalized)
-        if match:
-            classes.append((title, int(match.group(1))))
-    return classes
+    return _classes_from_tokens(tokenize_classification(classification_text))
 
 
 def extract_diagnostic_groups(
@@ -84,87 +133,7 @@ def extract_diagnostic_groups(
     """
     Map each DSM-5 family to a list of (diagnostic_group, page) tuples.
     """
-    lines = classification_text.splitlines()
-    groups: Dict[str, List[Tuple[str, int]]] = {}
-    current_family: Optional[str] = None
-    roman_re = re.compile(r"^[ivxlcdm]+$", re.IGNORECASE)
-    heading_re = re.compile(r"\((\d{1,3})\)\s*$")
-    heading_token_re = re.compile(r"^[A-Za-z][A-Za-z &'’/,–—\-()]+$")
-
-    def should_skip(line: str) -> bool:
-        stripped = line.strip()
-        if not stripped:
-            return True
-        if roman_re.match(stripped):
-            return True
-        if "DSM-5 Classification" in stripped:
-            return True
-        return False
-
-    def compose_heading(start_idx: int) -> Tuple[Optional[str], Optional[int], int]:
-        parts: List[str] = []
-        idx = start_idx
-        while idx < len(lines) and len(parts) < 4:
-            segment = lines[idx].strip()
-            if not segment or should_skip(segment):
-                break
-            prefix = segment.split("(", 1)[0].strip()
-            if prefix and ")" in prefix and "(" not in prefix:
-                break
-            if prefix and not heading_token_re.match(prefix):
-                break
-            parts.append(segment)
-            candidate = re.sub(r"\s+", " ", " ".join(parts)).strip()
-            match = heading_re.search(candidate)
-            if match:
-                title = candidate[: match.start()].strip()
-                if not title:
-                    return None, None, idx + 1
-                return title, int(match.group(1)), idx + 1
-            idx += 1
-        return None, None, start_idx + 1
-
-    i = 0
-    while i < len(lines):
-        raw_line = lines[i]
-        if should_skip(raw_line):
-            i += 1
-            continue
-
-        stripped = raw_line.strip()
-        if not stripped or not stripped[0].isupper():
-            i += 1
-            continue
-
-        prefix = stripped.split("(", 1)[0].strip()
-        if prefix and ")" in prefix and "(" not in prefix:
-            i += 1
-            continue
-        if prefix and not heading_token_re.match(prefix):
-            i += 1
-            continue
-
-        title, page, next_idx = compose_heading(i)
-        if not title or page is None:
-            i = next_idx
-            continue
-
-        title = re.sub(r"\s+", " ", title)
-
-        words = re.findall(r"[A-Za-z]+", title)
-
-        if title in DSM5_FAMILY_TITLES:
-            current_family = title
-        elif (
-            current_family
-            and not any(ch.isdigit() for ch in title)
-            and (len(words) >= 2 or title in {"Parasomnias"})
-        ):
-            groups.setdefault(current_family, []).append((title, page))
-
-        i = next_idx
-
-    return groups
+    return _groups_from_tokens(tokenize_classification(classification_text))
 
 
 def extract_disorder_names(classification_text: str) -> List[Tuple[str, str]]:
@@ -189,128 +158,427 @@ CRITERIA_DEMO_CONFIG = {
 }
 
 
-def parse_specifier_blocks(trail_text: str) -> List[Dict[str, Any]]:
-    if not trail_text:
-        return []
-    lines = [line.strip() for line in trail_text.strip().splitlines()]
-    specifiers: List[Dict[str, Any]] = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        if not line:
-            i += 1
-            continue
-        lowered = line.lower()
-        if lowered.startswith("specify"):
+_SPEC_PAGE_END_RE = re.compile(r"\(\d{1,3}\)\s*$")
+_SPEC_CODE_RE = re.compile(rf"({CODE_PATTERN})\s+\(([^)]+)\)\s+(.+)")
+_SPEC_SPLIT_RE = re.compile(r",\s*|\;\s*")
+
+
+def _specifier_label(heading: str) -> str:
+    heading_lower = heading.lower()
+    if "current severity" in heading_lower:
+        return "Current Severity"
+    if heading_lower.startswith("specify whether"):
+        return "Specifiers"
+    if heading_lower.startswith("specify if"):
+        return "Specifiers"
+    label = heading.replace("Specify", "").strip(": ")
+    return label or "Specifiers"
+
+
+def _specifier_values(option_lines: List[str]) -> List[Dict[str, Optional[str]]]:
+    values: List[Dict[str, Optional[str]]] = []
+    for opt_line in option_lines:
+        code_match = _SPEC_CODE_RE.match(opt_line)
+        if code_match:
+            values.append(
+                {
+                    "label": code_match.group(3).strip(),
+                    "icd9_code": code_match.group(1).strip(),
+                    "icd10_code": code_match.group(2).strip(),
+                }
+            )
+        else:
+            for part in _SPEC_SPLIT_RE.split(opt_line):
+                cleaned = part.strip()
+                if cleaned:
+                    values.append(
+                        {
+                            "label": cleaned,
+                            "icd9_code": None,
+                            "icd10_code": None,
+                        }
+                    )
+    return values
+
+
+class _SpecifierReader:
+    """
+    parse_specifier_blocks as a line-at-a-time state machine, so the classification
+    tokenizer can read specifier trails in the same pass as the entries.
+
+    A "Specify ...:" line opens a block; option lines follow until a blank line
+    (consumed), a "Specify" / "Note" line or a line ending in "(page)" (both read
+    again as block starts), or the end of the trail.
+    """
+
+    def __init__(self) -> None:
+        self.blocks: List[Dict[str, Any]] = []
+        self._label: Optional[str] = None
+        self._options: List[str] = []
+
+    def feed(self, chunk: str) -> None:
+        """One trail line (as joined with "\n" into the trail text)."""
+        for line in (chunk + "\n").splitlines():
+            self._line(line.strip())
+
+    def _line(self, line: str) -> None:
+        if self._label is not None:
+            if not line:
+                self._close()
+                return
+            if line.lower().startswith(("specify", "note")) or _SPEC_PAGE_END_RE.search(line):
+                self._close()
+            else:
+                self._options.append(line)
+                return
+        if line.lower().startswith("specify"):
             heading = line
             after_colon = ""
             if ":" in line:
                 heading, after_colon = line.split(":", 1)
                 after_colon = after_colon.strip()
-            heading_lower = heading.lower()
-            if "current severity" in heading_lower:
-                label = "Current Severity"
-            elif heading_lower.startswith("specify whether"):
-                label = "Specifiers"
-            elif heading_lower.startswith("specify if"):
-                label = "Specifiers"
+            self._label = _specifier_label(heading)
+            self._options = [after_colon] if after_colon else []
+
+    def _close(self) -> None:
+        values = _specifier_values(self._options)
+        if values:
+            self.blocks.append({"label": self._label, "type": "enum", "values": values})
+        self._label = None
+        self._options = []
+
+    def finish(self) -> List[Dict[str, Any]]:
+        if self._label is not None:
+            self._close()
+        return self.blocks
+
+
+def parse_specifier_blocks(trail_text: str) -> List[Dict[str, Any]]:
+    if not trail_text:
+        return []
+    reader = _SpecifierReader()
+    reader.feed(trail_text.strip())
+    return reader.finish()
+
+
+#---------------------------------------------------------
+# Classification tokenizer
+#---------------------------------------------------------
+
+_ROMAN_RE = re.compile(r"^[ivxlcdm]+$", re.IGNORECASE)
+_HEADING_PAGE_RE = re.compile(r"\((\d{1,3})\)\s*$")
+_HEADING_TOKEN_RE = re.compile(r"^[A-Za-z][A-Za-z &'’/,–—\-()]+$")
+_ENTRY_HEAD_RE = re.compile(rf"\s*({CODE_PATTERN})\s+\(([^)]+)\)(?:\s+|$)")
+_ENTRY_PAGE_RE = re.compile(r"\((\d{1,3})\)")
+_CODE_LINE_RE = re.compile(rf"\s*{CODE_PATTERN}\s+\(")
+_TRAILING_HYPHEN_RE = re.compile(r"-\s*$")
+_LINE_SPACES_RE = re.compile(r"[ \t]+")
+
+
+def _is_heading_segment(stripped: str) -> bool:
+    """A line that can be part of a chapter / group heading (not a page head, roman folio or code line)."""
+    if not stripped or _ROMAN_RE.match(stripped) or "DSM-5 Classification" in stripped:
+        return False
+    prefix = stripped.split("(", 1)[0].strip()
+    if prefix and ")" in prefix:
+        return False
+    if prefix and not _HEADING_TOKEN_RE.match(prefix):
+        return False
+    return True
+
+
+def tokenize_classification(classification_text: str) -> List[Dict[str, Any]]:
+    """
+    Single pass over the classification lines, emitting tokens in line order:
+      {"kind": "family", "name", "page", "line"}     chapter heading, e.g. "Depressive Disorders (155)"
+      {"kind": "group", "name", "page", "line"}      other heading of 2+ words without digits
+      {"kind": "entry", "icd9", "icd10", "name", "page", "line"}
+      {"kind": "specifier", "label", "type", "values", "line"}   blocks after an entry (its "line")
+
+    Headings are 1-4 consecutive heading-like lines (upper-case first line) ending
+    in "(page)". Entries start at a line beginning "<code> (<icd10>)"; the name runs
+    on until the first "(page)", and may cross lines but not the start of another
+    code line. Entry lines are read with hyphenated line breaks joined ("ge-" +
+    "netic"). The lines between one entry and the next are fed to a specifier
+    reader as they go by (the parse_specifier_blocks state machine), so the text
+    is read once. "line" is the 0-based line index.
+
+    Codes are only recognised at the start of a line, and family titles only as
+    headings; on the bundled classification text the views below give the same
+    results as the earlier whole-text regex passes.
+    """
+    tokens: List[Dict[str, Any]] = []
+    raw_lines = classification_text.split("\n")
+    last = len(raw_lines) - 1
+
+    # Heading state: the heading-like lines since the last non-heading line or "(page)" line.
+    run: List[Tuple[int, str]] = []
+
+    # Entry state: the entry whose trailing text is being collected, and an open
+    # candidate (code line seen, "(page)" not yet).
+    trail: Optional[_SpecifierReader] = None
+    trail_skipped = False
+    trail_line = 0
+    cand: Optional[Dict[str, Any]] = None
+    hyphen_carry: Optional[str] = None
+
+    def heading(index: int, stripped: str) -> None:
+        if not _is_heading_segment(stripped):
+            run.clear()
+            return
+        run.append((index, stripped))
+        del run[:-4]
+        if not _HEADING_PAGE_RE.search(stripped):
+            return
+        parts = run[:]
+        run.clear()
+        start = next((k for k, (_, seg) in enumerate(parts) if seg[0].isupper()), None)
+        if start is None:
+            return
+        candidate = re.sub(r"\s+", " ", " ".join(seg for _, seg in parts[start:])).strip()
+        match = _HEADING_PAGE_RE.search(candidate)
+        title = candidate[: match.start()].strip()
+        if not title:
+            return
+        item = {"name": title, "page": int(match.group(1)), "line": parts[start][0]}
+        if title in DSM5_FAMILY_TITLES:
+            tokens.append({"kind": "family", **item})
+        elif not any(ch.isdigit() for ch in title) and (
+            len(re.findall(r"[A-Za-z]+", title)) >= 2 or title == "Parasomnias"
+        ):
+            tokens.append({"kind": "group", **item})
+
+    def close_trail() -> None:
+        if trail is not None and not trail_skipped:
+            for block in trail.finish():
+                tokens.append({"kind": "specifier", **block, "line": trail_line})
+
+    def open_entry(name_end: int, page: str, rest: str) -> None:
+        nonlocal trail, trail_skipped, trail_line, cand
+        name = cand["name"][:name_end].strip()
+        close_trail()
+        trail_skipped = "DSM-5 Classification" in name or name.lower().startswith(("specify", "note"))
+        if not trail_skipped:
+            tokens.append(
+                {
+                    "kind": "entry",
+                    "icd9": cand["icd9"],
+                    "icd10": cand["icd10"],
+                    "name": name,
+                    "page": int(page),
+                    "line": cand["line"],
+                }
+            )
+        trail, trail_line = _SpecifierReader(), cand["line"]
+        trail.feed(rest)
+        cand = None
+
+    def extend_name(segment: str) -> None:
+        # Append one line to the candidate's name and look for the first "(page)" with a non-empty name before it.
+        offset = len(cand["name"])
+        cand["name"] += segment
+        for m in _ENTRY_PAGE_RE.finditer(segment):
+            at = offset + m.start()
+            name_end = max(len(cand["name"][:at].rstrip()), 1)
+            if name_end <= at:
+                open_entry(name_end, m.group(1), segment[m.end():])
+                return
+
+    def entry_line(index: int, line: str) -> None:
+        nonlocal cand
+        if cand is not None:
+            if not line.strip():
+                cand["pending"].append(line)
+                cand["lines"].append(line)
+                return
+            if cand["name"] and _CODE_LINE_RE.match(line):
+                # The name cannot run into another code line: no entry here, the lines are trailing text.
+                if trail is not None:
+                    for pending in cand["lines"]:
+                        trail.feed(pending)
+                cand = None
             else:
-                label = heading.replace("Specify", "").strip(": ")
-                label = label or "Specifiers"
-            option_lines: List[str] = []
-            if after_colon:
-                option_lines.append(after_colon)
-            i += 1
-            while i < len(lines):
-                nxt = lines[i]
-                if not nxt:
-                    i += 1
-                    break
-                nxt_lower = nxt.lower()
-                if nxt_lower.startswith(("specify", "note")):
-                    break
-                if re.search(r"\(\d{1,3}\)\s*$", nxt):
-                    break
-                option_lines.append(nxt)
-                i += 1
-            values: List[Dict[str, Optional[str]]] = []
-            parsed_code_line = False
-            for opt_line in option_lines:
-                code_match = re.match(
-                    rf"({CODE_PATTERN})\s+\(([^)]+)\)\s+(.+)", opt_line
-                )
-                if code_match:
-                    parsed_code_line = True
-                    values.append(
-                        {
-                            "label": code_match.group(3).strip(),
-                            "icd9_code": code_match.group(1).strip(),
-                            "icd10_code": code_match.group(2).strip(),
-                        }
-                    )
+                cand["lines"].append(line)
+                if cand["name"]:
+                    extend_name("\n" + "\n".join(cand["pending"] + [line]))
                 else:
-                    parts = re.split(r",\s*|\;\s*", opt_line)
-                    for part in parts:
-                        cleaned = part.strip()
-                        if cleaned:
-                            values.append(
-                                {
-                                    "label": cleaned,
-                                    "icd9_code": None,
-                                    "icd10_code": None,
-                                }
-                            )
-            if values:
-                specifiers.append(
-                    {
-                        "label": label,
-                        "type": "enum",
-                        "values": values,
-                    }
-                )
+                    extend_name(line.lstrip())
+                if cand is not None:
+                    cand["pending"] = []
+                return
+        head = _ENTRY_HEAD_RE.match(line)
+        if head and (head.end() < len(line) or index < last):
+            cand = {
+                "icd9": head.group(1).strip(),
+                "icd10": head.group(2).strip(),
+                "name": "",
+                "pending": [],
+                "lines": [line],
+                "line": index,
+            }
+            if head.end() < len(line):
+                extend_name(line[head.end():])
+        elif trail is not None:
+            trail.feed(line)
+
+    for index, raw in enumerate(raw_lines):
+        heading(index, raw.strip())
+
+        # Entry lines: "-\s*\n\s*" joins a hyphenated break (and any blank lines after it), then [ \t]+ -> " ".
+        if hyphen_carry is not None:
+            if not raw.strip() and index < last:
+                continue
+            raw = hyphen_carry + raw.lstrip()
+            hyphen_carry = None
+        hyphen = _TRAILING_HYPHEN_RE.search(raw)
+        if hyphen and index < last:
+            hyphen_carry = raw[: hyphen.start()]
             continue
-        i += 1
-    return specifiers
+        entry_line(index, _LINE_SPACES_RE.sub(" ", raw))
+
+    if cand is not None and trail is not None:
+        for pending in cand["lines"]:
+            trail.feed(pending)
+    close_trail()
+    return tokens
+
+
+def _classes_from_tokens(tokens: List[Dict[str, Any]]) -> List[Tuple[str, int]]:
+    first: Dict[str, int] = {}
+    for tok in tokens:
+        if tok["kind"] == "family":
+            first.setdefault(tok["name"], tok["page"])
+    return [(title, first[title]) for title in DSM5_FAMILY_TITLES if title in first]
+
+
+def _groups_from_tokens(tokens: List[Dict[str, Any]]) -> Dict[str, List[Tuple[str, int]]]:
+    groups: Dict[str, List[Tuple[str, int]]] = {}
+    current_family: Optional[str] = None
+    for tok in tokens:
+        if tok["kind"] == "family":
+            current_family = tok["name"]
+        elif tok["kind"] == "group" and current_family:
+            groups.setdefault(current_family, []).append((tok["name"], tok["page"]))
+    return groups
+
+
+def _entries_from_tokens(tokens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    entries: List[Dict[str, Any]] = []
+    for tok in tokens:
+        if tok["kind"] == "entry":
+            entries.append(
+                {
+                    "icd9": tok["icd9"],
+                    "icd10": tok["icd10"],
+                    "name": tok["name"],
+                    "page": tok["page"],
+                    "specifiers": [],
+                }
+            )
+        elif tok["kind"] == "specifier" and entries:
+            entries[-1]["specifiers"].append({k: tok[k] for k in ("label", "type", "values")})
+    return entries
+
+
+#---------------------------------------------------------
+# Page-range index
+#---------------------------------------------------------
+
+class PageRangeIndex:
+    """
+    Printed page -> family / group / disorder, by bisection over sorted range starts.
+
+    Each level holds inclusive (start, end) ranges that do not overlap, as
+    build_family_hierarchy lays them out: a family or group runs until the next
+    one starts, and a disorder runs until the next disorder of its family starts
+    on a later page. When several disorders start on the same page, the page maps
+    to the last one listed (its text is what runs on into the following pages).
+
+    Example:
+        index = PageRangeIndex.from_hierarchy(json.load(open("data/dsm_families.json")))
+        index.section(151)   # {"family": "Depressive Disorders", "group": None, "disorder": ...}
+    """
+
+    LEVELS = ("family", "group", "disorder")
+
+    def __init__(self, ranges: Dict[str, List[Tuple[int, int, str, Any]]]):
+        """`ranges`: level -> [(start, end, name, item)], in any order."""
+        self._starts: Dict[str, List[int]] = {}
+        self._ends: Dict[str, List[int]] = {}
+        self._names: Dict[str, List[str]] = {}
+        self._items: Dict[str, List[Any]] = {}
+        for level in self.LEVELS:
+            rows = sorted(ranges.get(level, []), key=lambda row: row[0])
+            self._starts[level] = [row[0] for row in rows]
+            self._ends[level] = [row[1] for row in rows]
+            self._names[level] = [row[2] for row in rows]
+            self._items[level] = [row[3] for row in rows]
+
+    @classmethod
+    def from_hierarchy(cls, hierarchy: List[Dict[str, Any]]) -> "PageRangeIndex":
+        """
+        Index a build_family_hierarchy() result (or data/dsm_families.json). Also
+        accepts flat family ranges ([{"name", "page_start", "page_end"}]).
+        """
+        ranges: Dict[str, List[Tuple[int, int, str, Any]]] = {level: [] for level in cls.LEVELS}
+        for fam in hierarchy:
+            fam_start = fam.get("page", fam.get("page_start"))
+            fam_end = fam.get("page_end")
+            if fam_start is None or fam_end is None:
+                continue
+            ranges["family"].append((fam_start, fam_end, fam.get("family") or fam.get("name"), fam))
+            disorders = list(fam.get("disorders", []))
+            for grp in fam.get("groups", []):
+                ranges["group"].append((grp["page"], grp.get("page_end", fam_end), grp["name"], grp))
+                disorders.extend(grp["disorders"])
+            disorders.sort(key=lambda d: d["page"])
+            starts = [d["page"] for d in disorders]
+            for d in disorders:
+                nxt = bisect.bisect_right(starts, d["page"])
+                end = starts[nxt] - 1 if nxt < len(starts) else fam_end
+                ranges["disorder"].append((d["page"], end, d["name"], d))
+        return cls(ranges)
+
+    def _find(self, level: str, page: int) -> int:
+        i = bisect.bisect_right(self._starts[level], page) - 1
+        return i if i >= 0 and page <= self._ends[level][i] else -1
+
+    def lookup(self, page: int, level: str = "family") -> Optional[Any]:
+        """The item (hierarchy dict) covering printed page `page` at `level`, or None."""
+        i = self._find(level, page)
+        return self._items[level][i] if i >= 0 else None
+
+    def bounds(self, page: int, level: str = "family") -> Optional[Tuple[int, int]]:
+        """Inclusive (start, end) printed pages of the `level` range covering `page`, or None."""
+        i = self._find(level, page)
+        return (self._starts[level][i], self._ends[level][i]) if i >= 0 else None
+
+    def section(self, page: int) -> Dict[str, Optional[str]]:
+        """{"family", "group", "disorder"} names covering printed page `page` (None where nothing does)."""
+        out: Dict[str, Optional[str]] = {}
+        for level in self.LEVELS:
+            i = self._find(level, page)
+            out[level] = self._names[level][i] if i >= 0 else None
+        return out
+
+    def tag(self, record: Dict[str, Any], page_offset: int) -> Dict[str, Any]:
+        """Set record["section"] for an extraction page record (1-based PDF page = printed page + page_offset)."""
+        record["section"] = self.section(record["page"] - page_offset)
+        return record
 
 
 def extract_disorder_entries(classification_text: str) -> List[Dict[str, Any]]:
     """
     Return list of dicts with icd9, icd10, name, page, and specifier text extracted from the classification block.
     """
-    normalized = re.sub(r"-\s*\n\s*", "", classification_text)
-    normalized = re.sub(r"[ \t]+", " ", normalized)
-    pattern = re.compile(
-        rf"({CODE_PATTERN})\s+\(([^)]+)\)\s+"
-        rf"((?:(?!\n\s*{CODE_PATTERN}\s+\().)+?)\s*\((\d{{1,3}})\)",
-        re.DOTALL,
-    )
-    entries: List[Dict[str, Any]] = []
-    matches = list(pattern.finditer(normalized))
-    for idx, match in enumerate(matches):
-        icd9, icd10, name, page = match.group(1), match.group(2), match.group(3), match.group(4)
-        cleaned_name = name.strip()
-        if "DSM-5 Classification" in cleaned_name:
-            continue
-        if cleaned_name.lower().startswith(("specify", "note")):
-            continue
-        next_start = matches[idx + 1].start() if idx + 1 < len(matches) else len(normalized)
-        trail_text = normalized[match.end():next_start].strip()
-        entries.append(
-            {
-                "icd9": icd9.strip(),
-                "icd10": icd10.strip(),
-                "name": cleaned_name,
-                "page": int(page),
-                "specifiers": parse_specifier_blocks(trail_text),
-            }
-        )
-    return entries
+    return _entries_from_tokens(tokenize_classification(classification_text))
 
 
 def build_family_hierarchy(classification_text: str) -> List[Dict[str, Any]]:
-    families = extract_disorder_classes(classification_text)
-    groups_by_family = extract_diagnostic_groups(classification_text)
-    disorder_entries = extract_disorder_entries(classification_text)
+    tokens = tokenize_classification(classification_text)
+    families = _classes_from_tokens(tokens)
+    groups_by_family = _groups_from_tokens(tokens)
+    disorder_entries = _entries_from_tokens(tokens)
 
     if not families:
         return []
@@ -340,13 +608,11 @@ def build_family_hierarchy(classification_text: str) -> List[Dict[str, Any]]:
 
     def compute_ranges(items: List[Dict[str, Any]], default_end: int) -> None:
         for idx, item in enumerate(items):
-            start = item["page"]
             end = (
                 items[idx + 1]["page"]
                 if idx + 1 < len(items)
                 else default_end
             )
-            item["_range"] = (start, end)
             item["page_end"] = end - 1
 
     for idx, fam in enumerate(family_objects):
@@ -355,26 +621,15 @@ def build_family_hierarchy(classification_text: str) -> List[Dict[str, Any]]:
             if idx + 1 < len(family_objects)
             else classification_end + 1
         )
-        fam["_range"] = (fam["page"], family_end)
         fam["page_end"] = family_end - 1
         compute_ranges(fam["groups"], family_end)
 
+    index = PageRangeIndex.from_hierarchy(family_objects)
     for entry in disorder_entries:
-        assigned_family: Optional[Dict[str, Any]] = None
-        for fam in family_objects:
-            start, end = fam["_range"]
-            if start <= entry["page"] < end:
-                assigned_family = fam
-                break
+        assigned_family = index.lookup(entry["page"], "family")
         if not assigned_family:
             continue
-
-        target_group: Optional[Dict[str, Any]] = None
-        for grp in assigned_family["groups"]:
-            g_start, g_end = grp["_range"]
-            if g_start <= entry["page"] < g_end:
-                target_group = grp
-                break
+        target_group = index.lookup(entry["page"], "group")
 
         record = {
             "icd9": entry["icd9"],
@@ -389,11 +644,6 @@ def build_family_hierarchy(classification_text: str) -> List[Dict[str, Any]]:
         else:
             assigned_family["disorders"].append(record)
 
-    for fam in family_objects:
-        fam.pop("_range", None)
-        for grp in fam["groups"]:
-            grp.pop("_range", None)
-
     return family_objects
 
 
@@ -417,11 +667,16 @@ def make_unique_id(base: str, existing: set) -> str:
 
 def export_structured_dataset(
     hierarchy: List[Dict[str, Any]],
-    output_dir: str,
+    output_dir: Optional[str],
     disorder_descriptions: Optional[Dict[str, str]] = None,
     specifier_details: Optional[Dict[str, Dict[str, str]]] = None,
+    sqlite_path: Optional[str] = None,
 ) -> None:
-    os.makedirs(output_dir, exist_ok=True)
+    """
+    Split `hierarchy` into families/groups/disorders/specifiers records and write
+    them as JSON files to `output_dir` and/or as an indexed SQLite database to
+    `sqlite_path` (see dataset_sqlite).
+    """
 
     family_ids: Dict[str, str] = {}
     group_records: Dict[str, Dict[str, Any]] = {}
@@ -553,14 +808,18 @@ def export_structured_dataset(
         for disorder in family["disorders"]:
             register_disorder(disorder, None)
 
-    with open(os.path.join(output_dir, "families.json"), "w", encoding="utf-8") as fh:
-        json.dump({"families": family_payload}, fh, indent=2)
-    with open(os.path.join(output_dir, "groups.json"), "w", encoding="utf-8") as fh:
-        json.dump({"groups": group_payload}, fh, indent=2)
-    with open(os.path.join(output_dir, "disorders.json"), "w", encoding="utf-8") as fh:
-        json.dump({"disorders": disorder_payload}, fh, indent=2)
-    with open(os.path.join(output_dir, "specifiers.json"), "w", encoding="utf-8") as fh:
-        json.dump({"specifiers": specifier_payload}, fh, indent=2)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "families.json"), "w", encoding="utf-8") as fh:
+            json.dump({"families": family_payload}, fh, indent=2)
+        with open(os.path.join(output_dir, "groups.json"), "w", encoding="utf-8") as fh:
+            json.dump({"groups": group_payload}, fh, indent=2)
+        with open(os.path.join(output_dir, "disorders.json"), "w", encoding="utf-8") as fh:
+            json.dump({"disorders": disorder_payload}, fh, indent=2)
+        with open(os.path.join(output_dir, "specifiers.json"), "w", encoding="utf-8") as fh:
+            json.dump({"specifiers": specifier_payload}, fh, indent=2)
+    if sqlite_path:
+        write_structured_sqlite(sqlite_path, family_payload, group_payload, disorder_payload, specifier_payload)
 
 
 def normalize_text_block(text: str) -> str:
@@ -610,13 +869,16 @@ def parse_severity_table(raw_text: str) -> Dict[str, str]:
     return entries
 
 
-def build_demo_criteria(path: str) -> Tuple[List[Dict[str, Any]], Dict[str, str], Dict[str, Dict[str, str]]]:
+def build_demo_criteria(path: PdfSource) -> Tuple[List[Dict[str, Any]], Dict[str, str], Dict[str, Dict[str, str]]]:
     results: List[Dict[str, Any]] = []
     descriptions: Dict[str, str] = {}
     specifier_details: Dict[str, Dict[str, str]] = {}
+    with open_document(path) as doc:
+        raw_texts = {
+            disorder_id: doc.page_range_text(*cfg["pages"]) for disorder_id, cfg in CRITERIA_DEMO_CONFIG.items()
+        }
     for disorder_id, cfg in CRITERIA_DEMO_CONFIG.items():
-        start_page, end_page = cfg["pages"]
-        raw_text = extract_page_range(path, start_page, end_page)
+        raw_text = raw_texts[disorder_id]
         normalized = normalize_text_block(raw_text)
         segment = normalized
         start_marker = cfg.get("start_marker")
@@ -681,30 +943,50 @@ if __name__ == "__main__":
         "--structured-dir",
         help="If provided, also export split families/groups/disorders JSON files to this directory",
     )
+    parser.add_argument(
+        "--sqlite",
+        help="If provided, also export the structured dataset as an indexed SQLite database to this path",
+    )
     parser.add_argument(
         "--demo-criteria-output",
         help="Optional path to write proof-of-concept criteria JSON for selected disorders",
     )
+    parser.add_argument(
+        "--cache-dir",
+        help="Cache the detected classification section here, keyed by the PDF's content hash",
+    )
     args = parser.parse_args()
 
-    classification_text = get_classification_text(args.dsm_path)
+    cache = PageLayerCache(args.cache_dir) if args.cache_dir else None
+    document = DSMDocument(args.dsm_path)
+    section = find_classification_section(document, cache)
+    print(f"Classification section: PDF pages {section['start']}-{section['end']}")
+    classification_text = section["text"]
     demo_criteria: List[Dict[str, Any]] = []
     description_overrides: Dict[str, str] = {}
     specifier_details: Dict[str, Dict[str, str]] = {}
-    if args.demo_criteria_output or args.structured_dir:
+    if args.demo_criteria_output or args.structured_dir or args.sqlite:
         demo_criteria, description_overrides, specifier_details = build_demo_criteria(
-            args.dsm_path
+            document
         )
+    document.close()
     hierarchy = build_family_hierarchy(classification_text)
     with open(args.output, "w", encoding="utf-8") as fh:
         json.dump(hierarchy, fh, indent=2)
     print(f"Wrote {len(hierarchy)} families to {args.output}")
 
-    if args.structured_dir:
+    if args.structured_dir or args.sqlite:
         export_structured_dataset(
-            hierarchy, args.structured_dir, description_overrides, specifier_details
+            hierarchy,
+            args.structured_dir,
+            description_overrides,
+            specifier_details,
+            sqlite_path=args.sqlite,
         )
-        print(f"Structured dataset written to {args.structured_dir}")
+        if args.structured_dir:
+            print(f"Structured dataset written to {args.structured_dir}")
+        if args.sqlite:
+            print(f"Structured dataset written to {args.sqlite} (SQLite)")
 
     if args.demo_criteria_output:
         with open(args.demo_criteria_output, "w", encoding="utf-8") as fh:
@@ -0,0 +1,349 @@
+"""
+extraction_backends.py
+
+Pluggable per-page extraction backends.
+
+A backend opens one PDF and serves BackendPage objects by 0-based page index.
+Each page exposes its size, its words (as a WordStore), its ruling edges and
+its ruled tables. Two backends ship:
+- "pdfplumber": the pdfplumber convenience layer (page.extract_words / find_tables)
+- "pdfminer": drives pdfminer's interpreter directly and builds words straight
+  from the LTChar stream, skipping pdfplumber's per-object dict conversion.
+  Word grouping reproduces pdfplumber's for WORD_SETTINGS, so both backends
+  yield the same words.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+import pdfplumber
+from pdfminer.converter import PDFPageAggregator
+from pdfminer.layout import LTChar, LTContainer, LTCurve, LTLine, LTRect
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve_all
+from pdfplumber.table import TableFinder
+from pdfplumber.utils import curve_to_edges, extract_text, line_to_edge, rect_to_edges
+from pdfplumber.utils.text import LIGATURES
+
+from word_store import WordStore
+
+WORD_SETTINGS: Dict[str, Any] = {
+    "use_text_flow": True,
+    "keep_blank_chars": False,
+    "extra_attrs": ["x0", "x1", "top", "bottom"],
+}
+
+TABLE_SETTINGS: Dict[str, Any] = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "intersection_tolerance": 5,
+    "snap_tolerance": 3,
+    "join_tolerance": 3,
+    "edge_min_length": 20,
+    "min_words_vertical": 2,
+    "min_words_horizontal": 2,
+    "text_tolerance": 3,
+}
+
+# (bbox, raw cell rows) as found on the page, before any text cleanup
+RawTable = Tuple[Tuple[float, float, float, float], List[List[Optional[str]]]]
+
+
+class BackendPage(Protocol):
+    width: float
+    height: float
+
+    def words(self) -> WordStore: ...
+
+    def edges(self) -> List[Dict[str, Any]]: ...
+
+    def tables(self) -> Tuple[List[RawTable], bool]:
+        """(tables, skipped); skipped means the ruled-lines precheck ruled tables out."""
+        ...
+
+    def close(self) -> None:
+        """Drop whatever parsed layout the page holds on to."""
+        ...
+
+
+class ExtractionBackend(Protocol):
+    name: str
+
+    def page_count(self) -> int: ...
+
+    def page(self, index: int) -> BackendPage: ...
+
+    def close(self) -> None: ...
+
+
+# ---------------------------
+# Shared helpers
+# ---------------------------
+
+def has_ruled_lines(edges: List[Dict[str, Any]]) -> bool:
+    """
+    Cheap precheck for the "lines" table strategy: a cell needs two distinct vertical and
+    two distinct horizontal rules, and snapping/joining only ever merges edges, so a page
+    with fewer than two raw edges of either orientation cannot yield a table.
+    """
+    n_h = n_v = 0
+    for e in edges:
+        if e["orientation"] == "h":
+            n_h += 1
+        else:
+            n_v += 1
+        if n_h >= 2 and n_v >= 2:
+            return True
+    return False
+
+
+def _char_in_bbox(char: Dict[str, Any], bbox: Tuple[float, float, float, float]) -> bool:
+    # Same midpoint test pdfplumber's Table.extract uses for cell membership.
+    v_mid = (char["top"] + char["bottom"]) / 2
+    h_mid = (char["x0"] + char["x1"]) / 2
+    x0, top, x1, bottom = bbox
+    return h_mid >= x0 and h_mid < x1 and v_mid >= top and v_mid < bottom
+
+
+def table_cell_texts(table: Any, chars: List[Dict[str, Any]]) -> List[List[Optional[str]]]:
+    """
+    Table.extract() without its per-row scan of every char on the page: the page's
+    chars (the same list the words came from) are narrowed to the table bbox once,
+    and rows/cells filter that subset. Rows lie inside the table bbox, so the result
+    is identical.
+    """
+    table_chars = [c for c in chars if _char_in_bbox(c, table.bbox)]
+    out: List[List[Optional[str]]] = []
+    for row in table.rows:
+        row_chars = [c for c in table_chars if _char_in_bbox(c, row.bbox)]
+        cells: List[Optional[str]] = []
+        for cell in row.cells:
+            if cell is None:
+                cells.append(None)
+                continue
+            cell_chars = [c for c in row_chars if _char_in_bbox(c, cell)]
+            cells.append(extract_text(cell_chars) if cell_chars else "")
+        out.append(cells)
+    return out
+
+
+# ---------------------------
+# pdfplumber backend
+# ---------------------------
+
+def word_store_from_dicts(words_raw: List[Dict[str, Any]]) -> WordStore:
+    """pdfplumber extract_words() dicts -> WordStore, dropping blank words."""
+    items = []
+    for w in words_raw:
+        t = (w.get("text") or "").strip()
+        if not t:
+            continue
+        items.append((t, float(w["x0"]), float(w["x1"]), float(w["top"]), float(w["bottom"])))
+    return WordStore.from_tuples(items)
+
+
+class PdfplumberPage:
+    def __init__(self, page: pdfplumber.page.Page):
+        self._page = page
+        self.width = page.width
+        self.height = page.height
+
+    def words(self) -> WordStore:
+        return word_store_from_dicts(self._page.extract_words(**WORD_SETTINGS) or [])
+
+    def edges(self) -> List[Dict[str, Any]]:
+        # Memoized on the pdfplumber page, so find_tables reuses the same list.
+        return self._page.edges
+
+    def tables(self) -> Tuple[List[RawTable], bool]:
+        if not has_ruled_lines(self.edges()):
+            return [], True
+        found = self._page.find_tables(table_settings=TABLE_SETTINGS) or []
+        chars = self._page.chars
+        return [(t.bbox, table_cell_texts(t, chars)) for t in found], False
+
+    def close(self) -> None:
+        # pdfplumber keeps the layout and object dicts on every visited page until flushed.
+        self._page.close()
+
+
+class PdfplumberBackend:
+    name = "pdfplumber"
+
+    def __init__(self, pdf_path: str):
+        self._pdf = pdfplumber.open(pdf_path)
+
+    def page_count(self) -> int:
+        return len(self._pdf.pages)
+
+    def page(self, index: int) -> PdfplumberPage:
+        return PdfplumberPage(self._pdf.pages[index])
+
+    def close(self) -> None:
+        self._pdf.close()
+
+
+# ---------------------------
+# Direct pdfminer backend
+# ---------------------------
+
+class _EdgeSheet:
+    """Just enough of a pdfplumber page for TableFinder's "lines" strategy."""
+
+    def __init__(self, edges: List[Dict[str, Any]], bbox: Tuple[float, float, float, float]):
+        self.edges = edges
+        self.bbox = bbox
+
+
+def _page_geometry(page_obj: PDFPage) -> Tuple[float, Tuple[float, float, float, float]]:
+    """(height, mediabox) exactly as pdfplumber.Page derives them (rotation, inverted y)."""
+    rotation = (resolve_all(page_obj.attrs.get("Rotate")) or 0) % 360
+    raw = resolve_all(page_obj.attrs.get("MediaBox"))
+    x0, x1 = sorted((raw[0], raw[2]))
+    y0, y1 = sorted((raw[1], raw[3]))
+    if rotation in (90, 270):
+        x0, y0, x1, y1 = y0, x0, y1, x1
+    mb_height = y1 - y0
+    mediabox = (x0, mb_height - y1, x1, mb_height - y0)
+    return mediabox[3] - mediabox[1], mediabox
+
+
+class PdfminerPage:
+    def __init__(self, layout: Any, page_obj: PDFPage):
+        self.height, self.mediabox = _page_geometry(page_obj)
+        self.width = self.mediabox[2] - self.mediabox[0]
+        self._chars: List[Dict[str, Any]] = []
+        self._lines: List[Dict[str, Any]] = []
+        self._rects: List[Dict[str, Any]] = []
+        self._curves: List[Dict[str, Any]] = []
+        self._edges: Optional[List[Dict[str, Any]]] = None
+        self._collect(layout)
+
+    def _box(self, obj: Any) -> Dict[str, Any]:
+        mb_x0, mb_top = self.mediabox[:2]
+        top = (self.height - obj.y1) + mb_top
+        box = {
+            "x0": obj.x0 + mb_x0 if mb_x0 != 0 else obj.x0,
+            "x1": obj.x1 + mb_x0 if mb_x0 != 0 else obj.x1,
+            "y0": obj.y0,
+            "y1": obj.y1,
+            "top": top,
+            "bottom": (self.height - obj.y0) + mb_top,
+            "doctop": top,
+            "width": obj.width,
+            "height": obj.height,
+        }
+        return box
+
+    def _collect(self, container: Any) -> None:
+        # Same traversal as pdfplumber with laparams=None: containers are only walked.
+        for obj in container:
+            if isinstance(obj, LTContainer):
+                self._collect(obj)
+            elif isinstance(obj, LTChar):
+                char = self._box(obj)
+                char.update({"text": obj.get_text(), "upright": obj.upright, "size": obj.size})
+                self._chars.append(char)
+            elif isinstance(obj, LTCurve):
+                shape = self._box(obj)
+                if isinstance(obj, LTLine):
+                    shape["object_type"] = "line"
+                    self._lines.append(shape)
+                elif isinstance(obj, LTRect):
+                    shape["object_type"] = "rect"
+                    self._rects.append(shape)
+                else:
+                    shape["object_type"] = "curve"
+                    mb_x0, mb_top = self.mediabox[:2]
+                    shape["pts"] = [(mb_x0 + x, mb_top + self.height - y) for x, y in obj.pts]
+                    self._curves.append(shape)
+
+    def words(self) -> WordStore:
+        """
+        pdfplumber's WordExtractor with WORD_SETTINGS: chars are grouped by consecutive
+        identical (upright, x0, x1, top, bottom), and whitespace/empty chars split words.
+        Within such a group every char passes the x/y tolerance test, so no other split
+        can happen.
+        """
+        items = []
+        key: Optional[Tuple[Any, ...]] = None
+        parts: List[str] = []
+
+        def flush() -> None:
+            if parts:
+                t = "".join(parts).strip()
+                if t:
+                    items.append((t, key[1], key[2], key[3], key[4]))
+                parts.clear()
+
+        for c in self._chars:
+            char_key = (c["upright"], c["x0"], c["x1"], c["top"], c["bottom"])
+            if char_key != key:
+                flush()
+                key = char_key
+            text = c["text"]
+            if not text or text.isspace():
+                flush()
+            else:
+                parts.append(LIGATURES.get(text, text))
+        flush()
+        return WordStore.from_tuples(items)
+
+    def edges(self) -> List[Dict[str, Any]]:
+        if self._edges is None:
+            edges = [line_to_edge(line) for line in self._lines]
+            for rect in self._rects:
+                edges.extend(rect_to_edges(rect))
+            for curve in self._curves:
+                edges.extend(curve_to_edges(curve))
+            self._edges = edges
+        return self._edges
+
+    def tables(self) -> Tuple[List[RawTable], bool]:
+        if not has_ruled_lines(self.edges()):
+            return [], True
+        found = TableFinder(_EdgeSheet(self.edges(), self.mediabox), TABLE_SETTINGS).tables
+        return [(t.bbox, table_cell_texts(t, self._chars)) for t in found], False
+
+    def close(self) -> None:
+        self._chars, self._lines, self._rects, self._curves, self._edges = [], [], [], [], None
+
+
+class PdfminerBackend:
+    name = "pdfminer"
+
+    def __init__(self, pdf_path: str):
+        self._fh = open(pdf_path, "rb")
+        self._doc = PDFDocument(PDFParser(self._fh), password="")
+        self._pages = list(PDFPage.create_pages(self._doc))
+        self._rsrcmgr = PDFResourceManager()
+
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def page(self, index: int) -> PdfminerPage:
+        page_obj = self._pages[index]
+        device = PDFPageAggregator(self._rsrcmgr, pageno=index + 1, laparams=None)
+        PDFPageInterpreter(self._rsrcmgr, device).process_page(page_obj)
+        return PdfminerPage(device.get_result(), page_obj)
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+BACKENDS = {
+    PdfplumberBackend.name: PdfplumberBackend,
+    PdfminerBackend.name: PdfminerBackend,
+}
+
+
+def open_backend(name: str, pdf_path: str) -> ExtractionBackend:
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown extraction backend {name!r}; choose from {sorted(BACKENDS)}") from None
+    return backend_cls(pdf_path)
@@ -0,0 +1,102 @@
+"""
+extraction_checkpoint.py
+
+Per-page checkpoint for resumable, incremental DSM extraction.
+
+The checkpoint is a JSON-lines file kept next to the output JSON. Each line is
+either a blacklist line:
+    {"blacklist_key": "...", "blacklist": {"headers": [...], "footers": [...], ...}}
+or a page line:
+    {"fingerprint": {"pdf": <sha256>, "page": <0-based index>, "settings": <hash>}, "record": {...}}
+
+Page lines are appended and flushed as soon as a page is finished, so a crashed
+run loses at most the page in flight (a torn last line is ignored on load).
+A page is reused on the next run only if its stored fingerprint matches exactly.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from typing import Any, Dict, IO, Optional, Tuple
+
+
+def _blacklist_lists(blacklist: Dict[str, set]) -> Dict[str, Any]:
+    # Every set in the blacklist (headers, footers, template hashes) round-trips as a sorted list.
+    return {key: sorted(values) for key, values in blacklist.items()}
+
+
+class ExtractionCheckpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.blacklist_key: Optional[str] = None
+        self.blacklist: Optional[Dict[str, set]] = None
+        self.pages: Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self._fh: Optional[IO[str]] = None
+        self._load()
+
+    def __enter__(self) -> "ExtractionCheckpoint":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if "blacklist_key" in entry:
+                    self.blacklist_key = entry["blacklist_key"]
+                    self.blacklist = {k: set(v) for k, v in entry["blacklist"].items()}
+                elif "fingerprint" in entry:
+                    fp = entry["fingerprint"]
+                    self.pages[int(fp["page"])] = (fp, entry["record"])
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        if self._fh is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._fh = open(self.path, "a", encoding="utf-8")
+        self._fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._fh.flush()
+
+    def fresh_record(self, fingerprint: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Stored record for fingerprint["page"] if it was produced under the same fingerprint."""
+        entry = self.pages.get(int(fingerprint["page"]))
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+
+    def set_blacklist(self, key: str, blacklist: Dict[str, set]) -> None:
+        self.blacklist_key = key
+        self.blacklist = blacklist
+        self._append({"blacklist_key": key, "blacklist": _blacklist_lists(blacklist)})
+
+    def add(self, fingerprint: Dict[str, Any], record: Dict[str, Any]) -> None:
+        self.pages[int(fingerprint["page"])] = (fingerprint, record)
+        self._append({"fingerprint": fingerprint, "record": record})
+
+    def compact(self) -> None:
+        """Rewrite the file with only the latest blacklist and one line per page."""
+        self.close()
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            if self.blacklist_key is not None and self.blacklist is not None:
+                entry = {"blacklist_key": self.blacklist_key, "blacklist": _blacklist_lists(self.blacklist)}
+                fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            for page in sorted(self.pages):
+                fp, record = self.pages[page]
+                fh.write(json.dumps({"fingerprint": fp, "record": record}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,270 @@
+"""
+family_batch.py
+
+Hierarchy-driven batch extraction + formatting: one JSON/MD/TXT set per DSM-5 family.
+
+Family page ranges come from families.json (page_start/page_end) or, with
+--from-pdf, straight from build_family_hierarchy on the classification section.
+Those are printed page numbers; the PDF page offset is detected from the running
+heads (or given with --page-offset).
+
+Every page in the union of the family ranges is extracted exactly once, so pages
+shared at family boundaries are not extracted twice. With --workers > 1 one
+process pool runs both the extraction chunks (a few in flight at a time, in page
+order) and the per-family formatting jobs: a family is submitted to it as soon as
+its last page comes out of extraction, and its page records are dropped once no
+family still waiting needs them.
+
+Example:
+    python family_batch.py --pdf data/DSM-5-By-American-Psychiatric-Association.pdf --out-dir data/disorders --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from dsm_document import PdfSource
+from dsm_document_formatter import (
+    build_header_footer_blacklist,
+    detect_page_offset,
+    format_as_document,
+    format_as_markdown,
+    iter_dsm_pages_structured,
+    page_worker_pool,
+    submit_page_chunk,
+)
+from dsm_pdf_parser import DSM5_FAMILY_TITLES, PageRangeIndex, build_family_hierarchy, get_classification_text
+from extraction_backends import BACKENDS
+from page_layer_cache import PageLayerCache
+from tracing import traced_result
+
+# Pages per extraction job: small enough that families are released (and their
+# records dropped) soon after their last page, large enough to amortize a job.
+_CHUNK_PAGES = 8
+
+
+def load_family_ranges(
+    families_json: Optional[str] = None,
+    hierarchy: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    [{"name", "page_start", "page_end"}] in DSM5_FAMILY_TITLES order, printed page numbers.
+    Accepts the structured families.json ({"families": [{name, page_start, page_end}]})
+    or a build_family_hierarchy() result ([{family, page, page_end}]).
+    """
+    if hierarchy is None:
+        with open(families_json, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        items = data["families"] if isinstance(data, dict) else data
+    else:
+        items = hierarchy
+
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        name = item.get("name") or item.get("family")
+        start = item.get("page_start", item.get("page"))
+        end = item.get("page_end")
+        if name in DSM5_FAMILY_TITLES and start is not None and end is not None:
+            by_name[name] = {"name": name, "page_start": int(start), "page_end": int(end)}
+    return [by_name[name] for name in DSM5_FAMILY_TITLES if name in by_name]
+
+
+def family_file_stem(name: str) -> str:
+    """'Depressive Disorders' -> 'Depressive_Disorders' (matches data/disorders/)."""
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+
+
+def _page_runs(pages: List[int]) -> List[Tuple[int, int]]:
+    """Sorted unique pages -> inclusive (start, end) runs of consecutive pages."""
+    runs: List[Tuple[int, int]] = []
+    for p in pages:
+        if runs and p == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], p)
+        else:
+            runs.append((p, p))
+    return runs
+
+
+def _write_family(
+    stem: str,
+    out_dir: str,
+    blacklist: Dict[str, List[str]],
+    pages: List[Dict[str, Any]],
+    formats: Tuple[str, ...],
+) -> List[str]:
+    written = []
+    if "json" in formats:
+        path = os.path.join(out_dir, f"{stem}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"blacklist": blacklist, "pages": pages}, f, indent=2, ensure_ascii=False)
+        written.append(path)
+    if "md" in formats:
+        path = os.path.join(out_dir, f"{stem}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(format_as_markdown(pages))
+        written.append(path)
+    if "txt" in formats:
+        path = os.path.join(out_dir, f"{stem}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(format_as_document(p.get("text", "") for p in pages))
+        written.append(path)
+    return written
+
+
+def run_family_batch(
+    pdf_path: PdfSource,
+    families: List[Dict[str, Any]],
+    out_dir: str,
+    page_offset: Optional[int] = None,
+    formats: Tuple[str, ...] = ("json", "md", "txt"),
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+    backend: str = "pdfplumber",
+    sections: Optional[PageRangeIndex] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Extract and format every family in `families` (see load_family_ranges).
+    Returns one summary dict per family: name, pdf_start, pdf_end, files.
+
+    Every page record is tagged with its "section" from `sections` (default: an
+    index of the family ranges alone; pass one built from the full hierarchy to
+    get groups and disorders too).
+    """
+    if page_offset is None:
+        page_offset = detect_page_offset(pdf_path, cache=cache, backend=backend)
+    if sections is None:
+        sections = PageRangeIndex.from_hierarchy(families)
+    os.makedirs(out_dir, exist_ok=True)
+
+    spans = [(fam, fam["page_start"] + page_offset, fam["page_end"] + page_offset) for fam in families]
+    all_pages = sorted({p for _, start, end in spans for p in range(start, end + 1)})
+    if not all_pages:
+        return []
+
+    # One blacklist over the whole span, so a page shared by two families gets one record.
+    blacklist = build_header_footer_blacklist(
+        pdf_path, page_start=all_pages[0], page_end=all_pages[-1], min_repeat_ratio=0.6,
+        cache=cache, backend=backend,
+    )
+    bl_lists = {"headers": sorted(blacklist["headers"]), "footers": sorted(blacklist["footers"])}
+
+    # Families become ready in order of their last page.
+    waiting = sorted(spans, key=lambda span: span[2])
+    # Page -> number of families still waiting for it; a record is dropped at zero.
+    users: Counter = Counter(p for _, start, end in spans for p in range(start, end + 1))
+    records: Dict[int, Dict[str, Any]] = {}
+    summaries: Dict[str, Dict[str, Any]] = {}
+    futures: List[Tuple[Dict[str, Any], Future]] = []
+    pool = page_worker_pool(workers, blacklist) if workers > 1 else None
+
+    def release_ready(done_through: int) -> None:
+        while waiting and waiting[0][2] <= done_through:
+            fam, start, end = waiting.pop(0)
+            pages = [records[p] for p in range(start, end + 1)]
+            for p in range(start, end + 1):
+                users[p] -= 1
+                if not users[p]:
+                    del records[p]
+            args = (family_file_stem(fam["name"]), out_dir, bl_lists, pages, formats)
+            summaries[fam["name"]] = {"name": fam["name"], "pdf_start": start, "pdf_end": end}
+            if pool is None:
+                summaries[fam["name"]]["files"] = _write_family(*args)
+            else:
+                futures.append((fam, pool.submit(_write_family, *args)))
+
+    def add(record: Dict[str, Any]) -> None:
+        records[record["page"]] = sections.tag(record, page_offset)
+        release_ready(record["page"])
+
+    try:
+        if pool is None:
+            for run_start, run_end in _page_runs(all_pages):
+                for record in iter_dsm_pages_structured(
+                    pdf_path,
+                    page_start=run_start,
+                    page_end=run_end,
+                    header_footer_blacklist=blacklist,
+                    cache=cache,
+                    backend=backend,
+                ):
+                    add(record)
+        else:
+            # At most `workers` extraction chunks are queued, so the formatting jobs
+            # submitted as families complete run between them rather than after all of them.
+            indices = [p - 1 for p in all_pages]
+            chunks = [indices[k:k + _CHUNK_PAGES] for k in range(0, len(indices), _CHUNK_PAGES)]
+            pending: Deque[Future] = deque()
+            pos = 0
+            while pos < len(chunks) or pending:
+                while pos < len(chunks) and len(pending) < workers:
+                    pending.append(submit_page_chunk(pool, pdf_path, chunks[pos], cache=cache, backend=backend))
+                    pos += 1
+                for record in traced_result(pending.popleft()):
+                    add(record)
+        for fam, future in futures:
+            summaries[fam["name"]]["files"] = future.result()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return [summaries[fam["name"]] for fam in families]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Extract + format every DSM-5 family in one batch")
+    ap.add_argument("--pdf", default="data/DSM-5-By-American-Psychiatric-Association.pdf")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--families-json", default="dsm5_data/families.json")
+    src.add_argument(
+        "--from-pdf",
+        action="store_true",
+        default=False,
+        help="Take family page ranges from build_family_hierarchy on the PDF's classification section",
+    )
+    ap.add_argument("--out-dir", default="data/disorders")
+    ap.add_argument("--page-offset", type=int, help="PDF page minus printed page (default: detect)")
+    ap.add_argument("--families", nargs="+", help="Only these family names (default: all DSM5_FAMILY_TITLES)")
+    ap.add_argument("--formats", nargs="+", choices=["json", "md", "txt"], default=["json", "md", "txt"])
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--cache-dir")
+    ap.add_argument("--backend", choices=sorted(BACKENDS), default="pdfplumber")
+    args = ap.parse_args()
+
+    cache = PageLayerCache(args.cache_dir) if args.cache_dir else None
+    if args.from_pdf:
+        hierarchy = build_family_hierarchy(get_classification_text(args.pdf, cache))
+        families = load_family_ranges(hierarchy=hierarchy)
+        sections = PageRangeIndex.from_hierarchy(hierarchy)
+    else:
+        families = load_family_ranges(args.families_json)
+        sections = None
+    if args.families:
+        unknown = set(args.families) - {fam["name"] for fam in families}
+        if unknown:
+            ap.error(f"Unknown families: {sorted(unknown)}")
+        families = [fam for fam in families if fam["name"] in args.families]
+
+    summaries = run_family_batch(
+        args.pdf,
+        families,
+        args.out_dir,
+        page_offset=args.page_offset,
+        formats=tuple(args.formats),
+        workers=args.workers,
+        cache=cache,
+        backend=args.backend,
+        sections=sections,
+    )
+    for s in summaries:
+        print(f"{s['pdf_start']:>4}-{s['pdf_end']:<4} {s['name']}: {len(s['files'])} file(s)")
+    print(f"Wrote {len(summaries)} families to {os.path.abspath(args.out_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+format_engine.py
+
+Compiled rule engine behind format_as_document / format_as_markdown.
+
+The original step functions (fix_hyphen_linebreaks, normalize_spaces, ...; kept
+as the reference chain in benchmark_formatter.py) compile their patterns on each call and run about 30
+whole-document re.sub passes. Here the same rule set is compiled once and
+applied with fewer, cheaper scans:
+- rules that commute are fused into one pattern (the ", ; :" spacing rules,
+  the running-header line patterns)
+- every rule carries a literal it cannot match without, and is skipped when
+  that literal is absent (most rules on a single page)
+- leading \s* / lookbehinds are moved behind a literal or character class, so
+  the regex engine can jump to candidate positions instead of trying every
+  offset; "\s*X" rules search for X and absorb the whitespace run before it
+  while the output is assembled in one parts buffer
+
+Output is identical to the step-function chain; benchmark_formatter.py checks
+that and compares throughput.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from types import CodeType, FunctionType
+from typing import Callable, List, Optional, Sequence, Union
+
+Repl = Union[str, Callable[[re.Match], str]]
+
+
+def _compact_spaces(code: str) -> str:
+    return re.sub(r"\s+", "", code)
+
+
+def _collapse(match: re.Match) -> str:
+    return match.group(0).replace(" ", "")
+
+
+# Bump on any change to this module that fingerprint() cannot see (it hashes the rules,
+# their apply() code and the module functions a replacement calls, nothing else).
+ENGINE_VERSION = 1
+
+
+def _code_digest(code: CodeType, seen: Optional[set] = None) -> str:
+    """Bytecode and constants of `code`, nested code objects and the module functions it names."""
+    seen = set() if seen is None else seen
+    seen.add(code)
+    parts = [code.co_code.hex()]
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            parts.append(_code_digest(const, seen) if const not in seen else "")
+        else:
+            parts.append(repr(const))
+    for name in code.co_names:
+        fn = globals().get(name)
+        if isinstance(fn, FunctionType) and fn.__code__ not in seen:
+            parts.append(name + ":" + _code_digest(fn.__code__, seen))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class _Rule:
+    """One re.sub pass, skipped when `guard` (a literal every match contains) is absent."""
+
+    def __init__(self, pattern: str, repl: Repl, guard: Optional[str] = None, flags: int = 0):
+        self.rx = re.compile(pattern, flags)
+        self.repl = repl
+        self.guard = guard
+
+    def apply(self, text: str) -> str:
+        if self.guard is not None and self.guard not in text:
+            return text
+        return self.rx.sub(self.repl, text)
+
+
+class _SpaceLedRule(_Rule):
+    """
+    re.sub(r"\s*" + pattern, repl) without the leading \s*, which would make the
+    regex engine try every offset. The rest of the pattern must start with a
+    non-space character: its leftmost match then fixes where the full match
+    starts (the beginning of the whitespace run before it, never before the end
+    of the previous match).
+    """
+
+    def apply(self, text: str) -> str:
+        if self.guard is not None and self.guard not in text:
+            return text
+        parts: List[str] = []
+        last = 0
+        for m in self.rx.finditer(text):
+            start = m.start()
+            while start > last and text[start - 1].isspace():
+                start -= 1
+            parts.append(text[last:start])
+            parts.append(self.repl(m) if callable(self.repl) else m.expand(self.repl))
+            last = m.end()
+        if not parts:
+            return text
+        parts.append(text[last:])
+        return "".join(parts)
+
+
+class _DropLines:
+    """splitlines() + drop lines whose stripped text matches + "\n".join (always re-joined)."""
+
+    def __init__(self, patterns: Sequence[str]):
+        self.rx = re.compile("|".join(f"(?:{p})" for p in patterns))
+
+    def apply(self, text: str) -> str:
+        match = self.rx.match
+        return "\n".join(ln for ln in text.splitlines() if not match(ln.strip()))
+
+
+class _Strip:
+    def apply(self, text: str) -> str:
+        return text.strip()
+
+
+# Same patterns as the reference HEADER_PATTERNS (benchmark_formatter); the last one is case-insensitive.
+_HEADER_LINE_PATTERNS = [
+    r"^\s*\d{1,4}\s+[A-Z][A-Za-z].*(Disorder|Disorders)\s*$",
+    r"^\s*[A-Z][A-Za-z].*(Disorder|Disorders)\s+\d{1,4}\s*$",
+    r"(?i:^\s*Depressive\s+Disorders\s*$)",
+]
+
+# fix_hyphen_linebreaks, normalize_icd_codes, remove_running_headers, normalize_spaces,
+# collapse_spaced_letters, deglue_common_collapses
+NORMALIZE_RULES = [
+    _Rule(r"-\s*\n\s*", "", guard="-"),
+    _Rule(r"\(\s*F\s*([0-9][0-9.\s]*)\)", lambda m: f"(F{_compact_spaces(m.group(1))})", guard="F"),
+    _Rule(r"F(?<!\wF)\s*([0-9][0-9.\s]*[0-9])\b", lambda m: f"F{_compact_spaces(m.group(1))}", guard="F"),
+    _SpaceLedRule(r"\d(?<!\w\d)\d{0,3}\s+Depressive\s+Disorders\b\s*", " ", guard="Depressive"),
+    _SpaceLedRule(r"Major(?<!\wMajor)\s+Depressive\s+Disorder\s+\d{1,4}\b\s*", " ", guard="Major"),
+    _SpaceLedRule(r"Depressive(?<!\wDepressive)\s+Disorders\b\s*", " ", guard="Depressive"),
+    _DropLines(_HEADER_LINE_PATTERNS),
+    # [ \t]+ -> " ", leaving runs that already are a single space alone
+    _Rule(r"\t[ \t]*| [ \t]+", " "),
+    # " ?\n ?" -> "\n", only where a space is actually next to the newline
+    _Rule(r" \n ?|\n ", "\n"),
+    _Rule(r"([,;:])(?=\S)", r"\1 "),
+    _Rule(r"\((?<=[A-Za-z0-9]\()", " (", guard="("),
+    _Rule(r"\s+([,.;:!?])", r"\1"),
+    _Rule(r"\(\s+", "(", guard="("),
+    _Rule(r"\s+\)", ")", guard=")"),
+    _Strip(),
+    # (?<!\w)(?:[A-Za-z]\s){2,}[A-Za-z](?!\w), with the lookbehind after the first letter
+    _Rule(r"[A-Za-z](?<!\w[A-Za-z])(?:\s[A-Za-z]){2,}(?!\w)", _collapse),
+    # (?<!\d)(?:\d\s){1,}\d(?!\d)
+    _Rule(r"\d(?<!\d\d)(?:\s\d)+(?!\d)", _collapse),
+    # aB -> a B, a1 -> a 1, 1a -> 1 a (matched on the second character where that is cheaper)
+    _Rule(r"[A-Z](?<=[a-z][A-Z])", r" \g<0>"),
+    _Rule(r"\d(?<=[A-Za-z]\d)", r" \g<0>"),
+    _Rule(r"(\d)([A-Za-z])", r"\1 \2"),
+]
+
+# insert_section_breaks, format_lettered_criteria, format_numbered_list,
+# format_notes_and_coding, cleanup_blank_lines
+DOCUMENT_RULES = [
+    _Rule(r"\n(?=[A-Z][A-Za-z].*(Disorder|Disorders)\b)", "\n\n", guard="Disorder"),
+    _SpaceLedRule(r"(Note:)\s*", r"\n\n\1 ", guard="Note:"),
+    _SpaceLedRule(r"([A-Z])\.\s*", r"\n\n\1.\n", guard="."),
+    _Rule(
+        r"Criteria(?<!\wCriteria)\s+([A-Z])\s*[\u2013-]\s*([A-Z])\b",
+        lambda m: f"Criteria {m.group(1)}{chr(8211)}{m.group(2)}",
+        guard="Criteria",
+    ),
+    # (\b\d{1,2})\.\s*  and  (?<!\n)(\b\d{1,2}\.)\s*, boundary checks moved after the first digit
+    _Rule(r"(\d(?<!\w\d)\d?)\.\s*", r"\1. ", guard="."),
+    _Rule(r"(\d(?<![\w\n]\d)\d?\.)\s*", r"\n\n\1 ", guard="."),
+    _SpaceLedRule(r"(Coding and Recording Procedures)\s*", r"\n\n\1\n", guard="Coding and Recording Procedures"),
+    _SpaceLedRule(r"(Recording Procedures)\s*", r"\n\n\1\n", guard="Recording Procedures"),
+    _SpaceLedRule(r"(Specify:)\s*", r"\n\n\1\n", guard="Specify:"),
+    _SpaceLedRule(r"(Specify if:)\s*", r"\n\n\1\n", guard="Specify if:"),
+    _Rule(r"\n{3,}", "\n\n", guard="\n\n\n"),
+    _Strip(),
+]
+
+
+class FormatterEngine:
+    def __init__(self, normalize_rules: Sequence = NORMALIZE_RULES, document_rules: Sequence = DOCUMENT_RULES):
+        self.normalize_rules = list(normalize_rules)
+        self.document_rules = list(document_rules)
+
+    def fingerprint(self) -> str:
+        """
+        Short hash of the rule set, for caching formatted text: per rule its class and
+        apply() code, pattern, flags, guard and replacement (a callable by its code and
+        that of the module functions it calls), in order, plus ENGINE_VERSION.
+        """
+        h = hashlib.sha256(f"{ENGINE_VERSION}\x1e".encode("utf-8"))
+        for rule in self.normalize_rules + [None] + self.document_rules:
+            rx = getattr(rule, "rx", None)
+            repl = getattr(rule, "repl", "")
+            if callable(repl):
+                repl = _code_digest(repl.__code__)
+            fields = [
+                type(rule).__name__,
+                _code_digest(type(rule).apply.__code__) if rule is not None else "",
+                rx.pattern if rx else "",
+                str(rx.flags) if rx else "",
+                repr(getattr(rule, "guard", None)),
+                repl,
+            ]
+            h.update(("\x1f".join(fields) + "\x1e").encode("utf-8"))
+        return h.hexdigest()[:16]
+
+    def normalize(self, raw: str) -> str:
+        """Text cleanup shared by the plain-text and Markdown output."""
+        for rule in self.normalize_rules:
+            raw = rule.apply(raw)
+        return raw
+
+    def document(self, raw: str) -> str:
+        """normalize() plus the plain-text layout rules: format_as_document's text pipeline."""
+        text = self.normalize(raw)
+        for rule in self.document_rules:
+            text = rule.apply(text)
+        return text
+
+
+ENGINE = FormatterEngine()
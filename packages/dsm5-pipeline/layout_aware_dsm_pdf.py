@@ -24,6 +24,8 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import pdfplumber
 
+from dsm_document import DSMDocument, PdfSource, open_document
+
 
 # ---------------------------
 # Utilities
@@ -118,12 +120,13 @@ class Word:
     bottom: float
 
 
-def _extract_words(page: pdfplumber.page.Page) -> List[Word]:
-    words_raw = page.extract_words(
+def _extract_words(doc: DSMDocument, page_no: int) -> List[Word]:
+    words_raw = doc.page_words(
+        page_no,
         use_text_flow=True,
         keep_blank_chars=False,
         extra_attrs=["x0", "x1", "top", "bottom"],
-    ) or []
+    )
     words: List[Word] = []
     for w in words_raw:
         t = (w.get("text") or "").strip()
@@ -208,12 +211,78 @@ def _order_lines_reading(lines: List[Tuple[float, str, float]], mode: str, page_
     return left_sorted + right_sorted
 
 
+# ---------------------------
+# Per-page line records
+# ---------------------------
+
+# (x0_min, text, y_top, y_bottom) for one clustered line
+LineRecord = Tuple[float, str, float, float]
+
+
+@dataclass
+class PageLines:
+    """
+    Compact per-page form kept between the margin count and the flow pass:
+    clustered line records plus the page facts needed to finish the page.
+    """
+    page: int
+    width: float
+    height: float
+    num_words: int
+    tables: List[Dict[str, Any]]
+    lines: List[LineRecord]
+    tables_skipped: bool = False
+
+
+def _line_records(line_groups: List[List[Word]]) -> List[LineRecord]:
+    """
+    Reduce clustered word groups to (x0_min, text, y_top, y_bottom), dropping empty lines.
+    """
+    records: List[LineRecord] = []
+    for lw in line_groups:
+        txt = _line_text(lw)
+        if not txt:
+            continue
+        records.append((min(w.x0 for w in lw), txt, min(w.top for w in lw), max(w.bottom for w in lw)))
+    return records
+
+
+def _count_margin_lines(
+    records: List[LineRecord],
+    page_height: float,
+    headers_count: Dict[str, int],
+    footers_count: Dict[str, int],
+    top_margin: float,
+    bottom_margin: float,
+) -> None:
+    for _, txt, y_top, y_bot in records:
+        if y_top <= top_margin:
+            headers_count[txt] = headers_count.get(txt, 0) + 1
+        if (page_height - y_bot) <= bottom_margin:
+            footers_count[txt] = footers_count.get(txt, 0) + 1
+
+
+def _blacklist_from_counts(
+    headers_count: Dict[str, int],
+    footers_count: Dict[str, int],
+    total_pages: int,
+    min_repeat_ratio: float,
+) -> Dict[str, set]:
+    headers = {t for t, c in headers_count.items() if c / max(total_pages, 1) >= min_repeat_ratio}
+    footers = {t for t, c in footers_count.items() if c / max(total_pages, 1) >= min_repeat_ratio}
+
+    # Also treat pure page number-ish lines as footers
+    footers |= {t for t in footers if _looks_like_page_number(t)}
+
+    return {"headers": headers, "footers": footers}
+
+
 # ---------------------------
 # Header/footer detection
 # ---------------------------
 
 def build_header_footer_blacklist(
-    pdf_path: str,
+    pdf_path: PdfSource,
     page_start: int = 1,
     page_end: Optional[int] = None,
     top_margin: float = 70.0,
@@ -228,45 +297,43 @@ def build_header_footer_blacklist(
     footers_count: Dict[str, int] = {}
     total_pages = 0
 
-    with pdfplumber.open(pdf_path) as pdf:
-        p_end = page_end or len(pdf.pages)
+    with open_document(pdf_path) as doc:
+        p_end = page_end or doc.page_count()
         for i in range(page_start - 1, p_end):
-            page = pdf.pages[i]
+            page = doc.page(i + 1)
             total_pages += 1
-            words = _extract_words(page)
+            words = _extract_words(doc, i + 1)
             if not words:
                 continue
 
-            lines = _cluster_words_into_lines(words)
-            for lw in lines:
-                txt = _line_text(lw)
-                if not txt:
-                    continue
-                y_top = min(w.top for w in lw)
-                y_bot = max(w.bottom for w in lw)
-                if y_top <= top_margin:
-                    headers_count[txt] = headers_count.get(txt, 0) + 1
-                if (page.height - y_bot) <= bottom_margin:
-                    footers_count[txt] = footers_count.get(txt, 0) + 1
+            records = _line_records(_cluster_words_into_lines(words))
+            _count_margin_lines(records, page.height, headers_count, footers_count, top_margin, bottom_margin)
 
-    headers = {t for t, c in headers_count.items() if c / max(total_pages, 1) >= min_repeat_ratio}
-    footers = {t for t, c in footers_count.items() if c / max(total_pages, 1) >= min_repeat_ratio}
-
-    # Also treat pure page number-ish lines as footers
-    footers |= {t for t in footers if _looks_like_page_number(t)}
-
-    return {"headers": headers, "footers": footers}
+    return _blacklist_from_counts(headers_count, footers_count, total_pages, min_repeat_ratio)
 
 
 # ---------------------------
 # Table extraction
 # ---------------------------
 
-def _extract_tables_best_effort(page: pdfplumber.page.Page) -> List[Dict[str, Any]]:
+def _has_ruled_lines(page: pdfplumber.page.Page) -> bool:
+    """
+    Cheap precheck before find_tables: the "lines" strategy needs at least two vertical
+    and two horizontal rules to form a cell (snapping only merges edges, never adds).
+    page.edges is memoized on the page, so find_tables reuses the same list.
+    """
+    n_h = sum(1 for e in page.edges if e["orientation"] == "h")
+    return n_h >= 2 and len(page.edges) - n_h >= 2
+
+
+def _extract_tables_best_effort(page: pdfplumber.page.Page) -> Tuple[List[Dict[str, Any]], bool]:
     """
     Best-effort table extraction. For DSM PDFs, line-drawn tables often work well.
-    Returns list of {bbox, rows}.
+    Returns (list of {bbox, rows}, skipped); skipped pages failed the ruled-lines precheck.
     """
+    if not _has_ruled_lines(page):
+        return [], True
+
     settings = {
         "vertical_strategy": "lines",
         "horizontal_strategy": "lines",
@@ -294,7 +361,7 @@ def _extract_tables_best_effort(page: pdfplumber.page.Page) -> List[Dict[str, An
         # Some PDFs/pages won't support line-based tables
         pass
 
-    return tables_out
+    return tables_out, False
 
 
 def _word_in_any_bbox(w: Word, bboxes: List[Tuple[float, float, float, float]], pad: float = 2.0) -> bool:
@@ -308,8 +375,88 @@ def _word_in_any_bbox(w: Word, bboxes: List[Tuple[float, float, float, float]],
 # Main extraction
 # ---------------------------
 
+def _page_lines(
+    page: pdfplumber.page.Page,
+    page_number: int,
+    words: List[Word],
+    remove_table_text_from_flow: bool,
+    all_lines: Optional[List[LineRecord]] = None,
+) -> PageLines:
+    """
+    Extract tables and reduce one page to its narrative-flow line records.
+    all_lines: records of the unfiltered words, reused when no table text is dropped.
+    """
+    tables, tables_skipped = _extract_tables_best_effort(page)
+
+    table_bboxes = [tuple(t["bbox"]) for t in tables] if tables else []
+    if remove_table_text_from_flow and table_bboxes:
+        words_flow = [w for w in words if not _word_in_any_bbox(w, table_bboxes)]
+        lines = _line_records(_cluster_words_into_lines(words_flow))
+    elif all_lines is not None:
+        lines = all_lines
+    else:
+        lines = _line_records(_cluster_words_into_lines(words))
+
+    return PageLines(page_number, page.width, page.height, len(words), tables, lines, tables_skipped)
+
+
+def _page_record(
+    page_lines: PageLines,
+    headers_bl: set,
+    footers_bl: set,
+    remove_headers_footers: bool,
+    top_margin: float,
+    bottom_margin: float,
+) -> Dict[str, Any]:
+    """
+    Apply the header/footer blacklist to retained line records and build the page dict.
+    """
+    # Line tuples: (x0_min, text, y_top)
+    line_tuples: List[Tuple[float, str, float]] = []
+    headers_found: List[str] = []
+    footers_found: List[str] = []
+
+    for x0_min, txt, y_top, y_bot in page_lines.lines:
+        in_header = y_top <= top_margin
+        in_footer = (page_lines.height - y_bot) <= bottom_margin
+
+        if in_header:
+            headers_found.append(txt)
+        if in_footer:
+            footers_found.append(txt)
+
+        # Optionally drop known repeating header/footer lines from flow
+        if remove_headers_footers and (txt in headers_bl or txt in footers_bl):
+            continue
+        # Also drop pure page-number footer lines by heuristic
+        if remove_headers_footers and in_footer and _looks_like_page_number(txt):
+            continue
+
+        line_tuples.append((x0_min, txt, y_top))
+
+    mode = _detect_columns(line_tuples, page_lines.width)
+    ordered_lines = _order_lines_reading(line_tuples, mode, page_lines.width)
+
+    raw_text = "\n".join(ordered_lines)
+    cleaned = _cleanup_text(raw_text)
+
+    return {
+        "page": page_lines.page,
+        "text": cleaned,
+        "headers": sorted(set(headers_found)),
+        "footers": sorted(set(footers_found)),
+        "tables": page_lines.tables,
+        "debug": {
+            "column_mode": mode,
+            "num_words": page_lines.num_words,
+            "num_tables": len(page_lines.tables),
+            "table_detection_skipped": page_lines.tables_skipped,
+        },
+    }
+
+
 def extract_dsm_pages_structured(
-    pdf_path: str,
+    pdf_path: PdfSource,
     page_start: int = 1,
     page_end: Optional[int] = None,
     header_footer_blacklist: Optional[Dict[str, set]] = None,
@@ -331,88 +478,98 @@ def extract_dsm_pages_structured(
     headers_bl = (header_footer_blacklist or {}).get("headers", set())
     footers_bl = (header_footer_blacklist or {}).get("footers", set())
 
-    with pdfplumber.open(pdf_path) as pdf:
-        p_end = page_end or len(pdf.pages)
+    with open_document(pdf_path) as doc:
+        p_end = page_end or doc.page_count()
 
         for i in range(page_start - 1, p_end):
-            page = pdf.pages[i]
-            words = _extract_words(page)
-            tables = _extract_tables_best_effort(page)
-
-            table_bboxes = [tuple(t["bbox"]) for t in tables] if tables else []
-            if remove_table_text_from_flow and table_bboxes:
-                words_flow = [w for w in words if not _word_in_any_bbox(w, table_bboxes)]
-            else:
-                words_flow = words
-
-            # Cluster into lines
-            line_groups = _cluster_words_into_lines(words_flow)
-            # Convert to line tuples: (x0_min, text, y_top, y_bottom)
-            line_tuples: List[Tuple[float, str, float]] = []
-            headers_found: List[str] = []
-            footers_found: List[str] = []
-
-            for lw in line_groups:
-                txt = _line_text(lw)
-                if not txt:
-                    continue
-                y_top = min(w.top for w in lw)
-                y_bot = max(w.bottom for w in lw)
-                x0_min = min(w.x0 for w in lw)
-
-                in_header = y_top <= top_margin
-                in_footer = (page.height - y_bot) <= bottom_margin
-
-                if in_header:
-                    headers_found.append(txt)
-                if in_footer:
-                    footers_found.append(txt)
-
-                # Optionally drop known repeating header/footer lines from flow
-                if remove_headers_footers and (txt in headers_bl or txt in footers_bl):
-                    continue
-                # Also drop pure page-number footer lines by heuristic
-                if remove_headers_footers and in_footer and _looks_like_page_number(txt):
-                    continue
-
-                line_tuples.append((x0_min, txt, y_top))
-
-            mode = _detect_columns(line_tuples, page.width)
-            ordered_lines = _order_lines_reading(line_tuples, mode, page.width)
-
-            raw_text = "\n".join(ordered_lines)
-            cleaned = _cleanup_text(raw_text)
-
+            page = doc.page(i + 1)
+            page_lines = _page_lines(page, i + 1, _extract_words(doc, i + 1), remove_table_text_from_flow)
             results.append(
-                {
-                    "page": i + 1,
-                    "text": cleaned,
-                    "headers": sorted(set(headers_found)),
-                    "footers": sorted(set(footers_found)),
-                    "tables": tables,
-                    "debug": {"column_mode": mode, "num_words": len(words), "num_tables": len(tables)},
-                }
+                _page_record(page_lines, headers_bl, footers_bl, remove_headers_footers, top_margin, bottom_margin)
             )
 
     return results
 
 
+def _extract_dsm_fused(
+    pdf_path: PdfSource,
+    page_start: int,
+    page_end: Optional[int],
+    scan_start: int,
+    scan_end: Optional[int],
+    remove_headers_footers: bool = True,
+    remove_table_text_from_flow: bool = True,
+    top_margin: float = 70.0,
+    bottom_margin: float = 70.0,
+    min_repeat_ratio: float = 0.6,
+) -> Tuple[Dict[str, set], List[Dict[str, Any]]]:
+    """
+    Fused pass: words are extracted once per page over the union of the scan range
+    and the extraction range. Margin lines are counted while pages go by, extraction
+    pages are kept as compact PageLines, and the blacklist is applied at the end.
+    Produces the same output as build_header_footer_blacklist + extract_dsm_pages_structured.
+    """
+    headers_count: Dict[str, int] = {}
+    footers_count: Dict[str, int] = {}
+    total_pages = 0
+    retained: List[PageLines] = []
+
+    with open_document(pdf_path) as doc:
+        n_pages = doc.page_count()
+        scan_range = range(scan_start - 1, scan_end or n_pages)
+        extract_range = range(page_start - 1, page_end or n_pages)
+
+        for i in sorted(set(scan_range) | set(extract_range)):
+            page = doc.page(i + 1)
+            words = _extract_words(doc, i + 1)
+
+            all_lines: Optional[List[LineRecord]] = None
+            if i in scan_range:
+                total_pages += 1
+                if words:
+                    all_lines = _line_records(_cluster_words_into_lines(words))
+                    _count_margin_lines(
+                        all_lines, page.height, headers_count, footers_count, top_margin, bottom_margin
+                    )
+
+            if i in extract_range:
+                retained.append(_page_lines(page, i + 1, words, remove_table_text_from_flow, all_lines))
+
+    blacklist = _blacklist_from_counts(headers_count, footers_count, total_pages, min_repeat_ratio)
+    pages = [
+        _page_record(
+            page_lines,
+            blacklist["headers"],
+            blacklist["footers"],
+            remove_headers_footers,
+            top_margin,
+            bottom_margin,
+        )
+        for page_lines in retained
+    ]
+    return blacklist, pages
+
+
 # ---------------------------
 # Convenience wrapper
 # ---------------------------
 
 def extract_dsm_clean_text(
-    pdf_path: str,
+    pdf_path: PdfSource,
     page_start: int = 1,
     page_end: Optional[int] = None,
     blacklist_scan_start: Optional[int] = None,
     blacklist_scan_end: Optional[int] = None,
+    fused: bool = True,
 ) -> Dict[str, Any]:
     """
     One-stop helper:
     1) Build header/footer blacklist from a scan range (defaults to extraction range)
     2) Extract structured pages with headers/footers removed and tables separated
 
+    With fused=True (default) both steps share a single word pass per page;
+    fused=False runs them as two separate passes over the PDF.
+
     Returns:
     {
       "blacklist": {"headers": [...], "footers": [...]},
@@ -422,21 +579,33 @@ def extract_dsm_clean_text(
     scan_start = blacklist_scan_start or page_start
     scan_end = blacklist_scan_end or page_end
 
-    blacklist = build_header_footer_blacklist(
-        pdf_path,
-        page_start=scan_start,
-        page_end=scan_end,
-        min_repeat_ratio=0.6,
-    )
-
-    pages = extract_dsm_pages_structured(
-        pdf_path,
-        page_start=page_start,
-        page_end=page_end,
-        header_footer_blacklist=blacklist,
-        remove_headers_footers=True,
-        remove_table_text_from_flow=True,
-    )
+    if fused:
+        blacklist, pages = _extract_dsm_fused(
+            pdf_path,
+            page_start,
+            page_end,
+            scan_start,
+            scan_end,
+            remove_headers_footers=True,
+            remove_table_text_from_flow=True,
+            min_repeat_ratio=0.6,
+        )
+    else:
+        blacklist = build_header_footer_blacklist(
+            pdf_path,
+            page_start=scan_start,
+            page_end=scan_end,
+            min_repeat_ratio=0.6,
+        )
+
+        pages = extract_dsm_pages_structured(
+            pdf_path,
+            page_start=page_start,
+            page_end=page_end,
+            header_footer_blacklist=blacklist,
+            remove_headers_footers=True,
+            remove_table_text_from_flow=True,
+        )
 
     return {"blacklist": {"headers": sorted(blacklist["headers"]), "footers": sorted(blacklist["footers"])}, "pages": pages}
 
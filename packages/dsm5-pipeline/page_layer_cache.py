@@ -0,0 +1,138 @@
+"""
+page_layer_cache.py
+
+Persistent, content-addressed cache of the raw per-page layer of a PDF
+(words with coordinates, page size, table bboxes/rows).
+
+Entries are keyed by:
+- the PDF's content hash (sha256 of the file bytes, so renames/copies still hit)
+- the 0-based page index
+- a hash of the extraction parameters (word + table settings)
+
+Each entry is one small JSON file. The directory is capped at `max_bytes`;
+when a write pushes it over the cap, least-recently-used entries (by mtime,
+bumped on every hit) are evicted until it fits again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple
+
+_HASH_MEMO: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_content_hash(path: str) -> str:
+    """sha256 of the file bytes, memoized per (path, size, mtime) within the process."""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    cached = _HASH_MEMO.get(memo_key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    _HASH_MEMO[memo_key] = digest
+    return digest
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    """Short stable hash of a JSON-serializable parameter dict."""
+    blob = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+class PageLayerCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Ship only the configuration to worker processes; each one re-scans lazily.
+        return {"cache_dir": self.cache_dir, "max_bytes": self.max_bytes, "_size": None}
+
+    def _path(self, pdf_hash: str, key: str, params: str) -> str:
+        return os.path.join(self.cache_dir, f"{pdf_hash[:24]}_{params}_{key}.json")
+
+    def get(self, pdf_hash: str, key: str, params: str) -> Optional[Dict[str, Any]]:
+        path = self._path(pdf_hash, key, params)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                payload = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return payload
+
+    def put(self, pdf_hash: str, key: str, params: str, payload: Dict[str, Any]) -> None:
+        path = self._path(pdf_hash, key, params)
+        blob = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(blob)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += len(blob) - old_size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries: List[Tuple[float, int, str]] = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, target_bytes: Optional[int] = None) -> int:
+        """
+        Drop least-recently-used entries until the cache is at or below target_bytes
+        (defaults to 90% of max_bytes, so a full cache doesn't evict on every write).
+        Returns the number of entries removed.
+        """
+        target = int(self.max_bytes * 0.9) if target_bytes is None else target_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        return removed
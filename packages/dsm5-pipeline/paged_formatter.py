@@ -0,0 +1,227 @@
+"""
+paged_formatter.py
+
+Page-parallel formatting with cross-page stitching.
+
+format_as_document / format_as_markdown format "\n".join(pages), and rules can
+reach across page edges: a word hyphenated over the edge, a code or numbered
+item split across it, a paragraph running on. Here each page is planned on
+its own (in worker processes, as pages arrive):
+
+- safe cuts: the first and last newline of the page where the rule set is known
+  to split cleanly. A cut sits between a sentence end ("...word.") and a line
+  starting a new sentence, and formatting a few lines on either side together
+  gives exactly the two sides formatted apart, joined by "\n" or "\n\n" (that
+  join is recorded with the cut)
+- core: the text between the first and last cut, formatted on its own
+
+A seam is then the tail of page N after its last cut plus the head of page N+1
+before its first cut, with any cut-less pages in between. Seams are formatted
+as one unit, so hyphenation, numbered items and paragraphs that cross page edges
+come out exactly as in a whole-document run. The result is cores, seams and
+joins concatenated; it equals the whole-document output.
+
+With a cache, page plans are keyed by the page text and seams by their own text,
+so editing one page re-formats that page and the seams on either side of it only.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from format_engine import ENGINE
+from page_layer_cache import PageLayerCache, params_key
+from tracing import span, traced_result, traced_submit
+
+# Lines of context on each side of a candidate cut for the split check.
+SEAM_CONTEXT_LINES = 3
+# Bump when the plan payload or the cut rules change.
+_PLAN_VERSION = 1
+
+MODES = ("document", "normalize")
+
+
+def _formatter(mode: str) -> Callable[[str], str]:
+    if mode not in MODES:
+        raise ValueError(f"Unknown paged formatting mode {mode!r}; choose from {MODES}")
+    return ENGINE.document if mode == "document" else ENGINE.normalize
+
+
+def _cut_candidates(text: str) -> Iterator[int]:
+    """Newlines between "<lowercase>." / "?" / "!" and a line starting "<Upper><lower>"."""
+    c = text.find("\n")
+    while c != -1:
+        if (
+            2 <= c < len(text) - 2
+            and text[c - 1] in ".?!"
+            and text[c - 2].islower()
+            and text[c + 1].isupper()
+            and text[c + 2].islower()
+        ):
+            yield c
+        c = text.find("\n", c + 1)
+
+
+def _split_join(fmt: Callable[[str], str], text: str, c: int) -> Optional[str]:
+    """
+    The join fmt() puts between the two sides of the newline at `c`, or None when
+    the lines around it don't split cleanly. Needs SEAM_CONTEXT_LINES full lines on
+    both sides inside the page; a window cut short by the page edge could hide a
+    line that runs on into the next page.
+    """
+    x_start = c
+    for _ in range(SEAM_CONTEXT_LINES):
+        x_start = text.rfind("\n", 0, x_start)
+        if x_start < 0:
+            return None
+    y_end = c
+    for _ in range(SEAM_CONTEXT_LINES):
+        y_end = text.find("\n", y_end + 1)
+        if y_end < 0:
+            return None
+    x, y = text[x_start + 1 : c], text[c + 1 : y_end]
+    fx, fy, fxy = fmt(x), fmt(y), fmt(x + "\n" + y)
+    if not fx or not fy or len(fx) + len(fy) >= len(fxy):
+        return None
+    if not (fxy.startswith(fx) and fxy.endswith(fy)):
+        return None
+    join = fxy[len(fx) : len(fxy) - len(fy)]
+    return join if join in ("\n", "\n\n") else None
+
+
+def page_cuts(fmt: Callable[[str], str], text: str) -> List[Tuple[int, str]]:
+    """[(offset, join)] for the first and last safe cut of a page (one entry if they coincide)."""
+    candidates = list(_cut_candidates(text))
+    first: Optional[Tuple[int, str]] = None
+    for c in candidates:
+        join = _split_join(fmt, text, c)
+        if join is not None:
+            first = (c, join)
+            break
+    if first is None:
+        return []
+    for c in reversed(candidates):
+        if c <= first[0]:
+            break
+        join = _split_join(fmt, text, c)
+        if join is not None:
+            return [first, (c, join)]
+    return [first]
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _cache_params(mode: str) -> str:
+    return params_key(
+        {"mode": mode, "rules": ENGINE.fingerprint(), "context": SEAM_CONTEXT_LINES, "version": _PLAN_VERSION}
+    )
+
+
+def _page_plan(text: str, mode: str, cache: Optional[PageLayerCache]) -> Dict[str, Any]:
+    """Safe cuts of one page plus its formatted core (None unless it has two cuts)."""
+    with span("format.plan"):
+        return _build_page_plan(text, mode, cache)
+
+
+def _build_page_plan(text: str, mode: str, cache: Optional[PageLayerCache]) -> Dict[str, Any]:
+    if cache:
+        params, key = _cache_params(mode), _text_key(text)
+        plan = cache.get(key, "page", params)
+        if plan is not None:
+            return plan
+    fmt = _formatter(mode)
+    cuts = page_cuts(fmt, text)
+    core = fmt(text[cuts[0][0] + 1 : cuts[1][0]]) if len(cuts) == 2 else None
+    plan = {"cuts": [[c, join] for c, join in cuts], "core": core}
+    if cache:
+        cache.put(key, "page", params, plan)
+    return plan
+
+
+def _format_seam(raw: str, mode: str, cache: Optional[PageLayerCache]) -> str:
+    with span("format.seam"):
+        return _build_seam(raw, mode, cache)
+
+
+def _build_seam(raw: str, mode: str, cache: Optional[PageLayerCache]) -> str:
+    if cache:
+        params, key = _cache_params(mode), _text_key(raw)
+        hit = cache.get(key, "seam", params)
+        if hit is not None:
+            return hit["text"]
+    text = _formatter(mode)(raw)
+    if cache:
+        cache.put(key, "seam", params, {"text": text})
+    return text
+
+
+def iter_pages_paged(
+    pages_text: Iterable[str],
+    mode: str = "document",
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+) -> Iterator[str]:
+    """
+    Pieces of ENGINE.document("\n".join(pages_text)) (or .normalize with
+    mode="normalize"), yielded in order as soon as they are final. `pages_text` may
+    be a streaming iterator: each page is planned as soon as it arrives, and only
+    pages whose plan has not been stitched yet are held.
+    """
+    _formatter(mode)  # reject an unknown mode before starting workers
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    queue: Deque[Tuple[str, Union[Dict[str, Any], Future]]] = deque()
+    pending: List[str] = []  # raw text of the open seam, one entry per page
+
+    def stitch(text: str, plan: Dict[str, Any]) -> Iterator[str]:
+        cuts = plan["cuts"]
+        if not cuts:
+            pending.append(text)
+            return
+        first, first_join = cuts[0]
+        pending.append(text[:first])
+        yield _format_seam("\n".join(pending), mode, cache)
+        yield first_join
+        last = first
+        if len(cuts) == 2:
+            last, last_join = cuts[1]
+            yield plan["core"]
+            yield last_join
+        pending[:] = [text[last + 1 :]]
+
+    def drain(block: bool) -> Iterator[str]:
+        while queue:
+            text, plan = queue[0]
+            if isinstance(plan, Future):
+                if not block and not plan.done():
+                    return
+                plan = traced_result(plan)
+            queue.popleft()
+            yield from stitch(text, plan)
+
+    try:
+        for text in pages_text:
+            if pool is None:
+                yield from stitch(text, _page_plan(text, mode, cache))
+                continue
+            queue.append((text, traced_submit(pool, _page_plan, text, mode, cache)))
+            yield from drain(block=False)
+        yield from drain(block=True)
+        yield _format_seam("\n".join(pending), mode, cache)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def format_pages_paged(
+    pages_text: Iterable[str],
+    mode: str = "document",
+    workers: int = 1,
+    cache: Optional[PageLayerCache] = None,
+) -> str:
+    """ENGINE.document("\n".join(pages_text)) (or .normalize), computed page by page."""
+    return "".join(iter_pages_paged(pages_text, mode, workers, cache))
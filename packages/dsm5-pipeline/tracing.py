@@ -0,0 +1,244 @@
+"""
+tracing.py
+
+Lightweight timing spans for the extraction and formatting hot paths.
+
+    with span("layer.words"):
+        words = page.words()
+
+Tracing is off by default: span() then returns a shared no-op context manager,
+so an instrumented call costs one global lookup. start_tracing() installs a
+Tracer that aggregates as it goes (no event log): per stack path a call count,
+total and self time, and per page the total time per span name. A span's page is the one given to it or
+inherited from the innermost enclosing span that has one.
+
+Worker processes run their own Tracer: traced_map / traced_submit run the task
+under a fresh Tracer seeded with the submitting stack, and traced_result / the
+traced_map iterator fold the worker's totals back into the parent's. Times are
+summed across processes, so with workers they add up to more than wall time.
+
+Example:
+    start_tracing()
+    extract_dsm_clean_text(pdf, 144, 160)
+    write_profile(stop_tracing(), "profile.json")   # + profile.json.folded
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+Frame = List[Any]  # [name, page, seconds spent in child spans]
+
+
+class Tracer:
+    def __init__(self, stack: Optional[List[Frame]] = None):
+        self.stack: List[Frame] = [[name, page, 0.0] for name, page, _ in stack or []]
+        self.paths: Dict[Tuple[str, ...], List[float]] = {}  # path -> [count, total s, self s]
+        self.pages: Dict[int, Dict[str, float]] = {}  # page -> span name -> total s ("" -> self s of all)
+        self.started = time.perf_counter()
+
+    def record(self, path: Tuple[str, ...], page: Optional[int], seconds: float, own: float) -> None:
+        stat = self.paths.get(path)
+        if stat is None:
+            self.paths[path] = [1, seconds, own]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] += own
+        if page is not None:
+            by_name = self.pages.setdefault(page, {})
+            by_name[path[-1]] = by_name.get(path[-1], 0.0) + seconds
+            by_name[""] = by_name.get("", 0.0) + own
+
+    def state(self) -> Dict[str, Any]:
+        return {"paths": self.paths, "pages": self.pages}
+
+    def merge(self, state: Dict[str, Any]) -> None:
+        for path, (count, seconds, own) in state["paths"].items():
+            stat = self.paths.setdefault(path, [0, 0.0, 0.0])
+            stat[0] += count
+            stat[1] += seconds
+            stat[2] += own
+        for page, by_name in state["pages"].items():
+            mine = self.pages.setdefault(page, {})
+            for name, seconds in by_name.items():
+                mine[name] = mine.get(name, 0.0) + seconds
+
+    def folded(self) -> List[str]:
+        """Collapsed stacks ("a;b;c <self microseconds>"), the input format of flamegraph.pl / speedscope."""
+        return [f"{';'.join(path)} {int(stat[2] * 1e6)}" for path, stat in sorted(self.paths.items())]
+
+    def report(self, top: int = 20) -> Dict[str, Any]:
+        """
+        {"wall_seconds", "stages", "flame", "slowest_pages", "pages"}: per span name
+        count / total / self time, per stack path the same (largest total first), and
+        per page the total time of each span name, with the `top` slowest pages listed.
+        """
+        stages: Dict[str, Dict[str, float]] = {}
+        for path, (count, seconds, own) in self.paths.items():
+            stage = stages.setdefault(path[-1], {"count": 0, "total_ms": 0.0, "self_ms": 0.0})
+            stage["count"] += count
+            stage["self_ms"] += own * 1000
+            # A span nested in one of the same name is already inside that one's total.
+            if path[-1] not in path[:-1]:
+                stage["total_ms"] += seconds * 1000
+        for stage in stages.values():
+            stage["total_ms"] = round(stage["total_ms"], 3)
+            stage["self_ms"] = round(stage["self_ms"], 3)
+
+        flame = [
+            {
+                "stack": ";".join(path),
+                "count": int(count),
+                "total_ms": round(seconds * 1000, 3),
+                "self_ms": round(own * 1000, 3),
+            }
+            for path, (count, seconds, own) in self.paths.items()
+        ]
+        flame.sort(key=lambda row: -row["total_ms"])
+
+        # A page's total is the self time of every span attributed to it, so nesting is not double counted.
+        pages = [
+            {
+                "page": page,
+                "total_ms": round(by_name.get("", 0.0) * 1000, 3),
+                "stages": {name: round(s * 1000, 3) for name, s in sorted(by_name.items()) if name},
+            }
+            for page, by_name in sorted(self.pages.items())
+        ]
+
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": dict(sorted(stages.items(), key=lambda kv: -kv[1]["total_ms"])),
+            "flame": flame,
+            "slowest_pages": [p["page"] for p in sorted(pages, key=lambda p: -p["total_ms"])[:top]],
+            "pages": pages,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "page", "t0")
+
+    def __init__(self, tracer: Tracer, name: str, page: Optional[int]):
+        self.tracer = tracer
+        self.name = name
+        self.page = page
+
+    def __enter__(self) -> None:
+        stack = self.tracer.stack
+        if self.page is None and stack:
+            self.page = stack[-1][1]
+        stack.append([self.name, self.page, 0.0])
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        seconds = time.perf_counter() - self.t0
+        stack = self.tracer.stack
+        path = tuple(frame[0] for frame in stack)
+        child = stack.pop()[2]
+        if stack:
+            stack[-1][2] += seconds
+        self.tracer.record(path, self.page, seconds, seconds - child)
+
+
+_NOOP = _NoopSpan()
+_TRACER: Optional[Tracer] = None
+
+
+def span(name: str, page: Optional[int] = None) -> Any:
+    """Time the enclosed block as `name` (optionally attributed to 1-based PDF page `page`)."""
+    if _TRACER is None:
+        return _NOOP
+    return _Span(_TRACER, name, page)
+
+
+def start_tracing() -> Tracer:
+    global _TRACER
+    _TRACER = Tracer()
+    return _TRACER
+
+
+def stop_tracing() -> Optional[Tracer]:
+    """Stop tracing; returns the Tracer that was active (or None)."""
+    global _TRACER
+    tracer, _TRACER = _TRACER, None
+    return tracer
+
+
+def active() -> Optional[Tracer]:
+    return _TRACER
+
+
+# ===========================
+# Worker processes
+# ===========================
+
+class _TracedResult:
+    __slots__ = ("value", "state")
+
+    def __init__(self, value: Any, state: Dict[str, Any]):
+        self.value = value
+        self.state = state
+
+
+def _run_traced(stack: List[Frame], fn: Callable[..., Any], *args: Any) -> _TracedResult:
+    global _TRACER
+    # A forked worker inherits the parent's Tracer; replace it so nothing is counted twice.
+    _TRACER = Tracer(stack)
+    try:
+        value = fn(*args)
+        return _TracedResult(value, _TRACER.state())
+    finally:
+        _TRACER = None
+
+
+def _unwrap(result: Any) -> Any:
+    if isinstance(result, _TracedResult):
+        if _TRACER is not None:
+            _TRACER.merge(result.state)
+        return result.value
+    return result
+
+
+def traced_submit(pool: Executor, fn: Callable[..., Any], *args: Any) -> Future:
+    """pool.submit(fn, *args), traced in the worker when tracing is on; read it with traced_result."""
+    if _TRACER is None:
+        return pool.submit(fn, *args)
+    return pool.submit(_run_traced, list(_TRACER.stack), fn, *args)
+
+
+def traced_result(future: Future) -> Any:
+    return _unwrap(future.result())
+
+
+def traced_map(pool: Executor, fn: Callable[..., Any], *iterables: Iterable[Any]) -> Iterator[Any]:
+    """pool.map(fn, *iterables), with the workers' spans merged into the active Tracer."""
+    if _TRACER is None:
+        return pool.map(fn, *iterables)
+    columns = [list(it) for it in iterables]
+    n = min(len(c) for c in columns) if columns else 0
+    stacks = [list(_TRACER.stack)] * n
+    return (_unwrap(r) for r in pool.map(_run_traced, stacks, [fn] * n, *columns))
+
+
+def write_profile(tracer: Tracer, path: str, top: int = 20) -> Dict[str, Any]:
+    """Write tracer.report() to `path` and the collapsed stacks to `path` + ".folded"."""
+    report = tracer.report(top)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(path + ".folded", "w", encoding="utf-8") as f:
+        f.write("\n".join(tracer.folded()) + "\n")
+    return report
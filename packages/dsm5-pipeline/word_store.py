@@ -0,0 +1,202 @@
+"""
+word_store.py
+
+Array-backed word layer for one PDF page.
+
+Instead of one Python object per word, a WordStore keeps:
+- a NumPy structured array of boxes (x0, x1, top, bottom)
+- one concatenated text buffer plus an offset table (word k = text[off[k]:off[k+1]])
+
+Line clustering, line bbox extents and table-region masks (via a per-page
+grid index) run as array operations over it; callers only build per-word objects when they need them.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BOX_DTYPE = np.dtype([("x0", "f8"), ("x1", "f8"), ("top", "f8"), ("bottom", "f8")])
+
+# (text, x0, x1, top, bottom)
+WordTuple = Tuple[str, float, float, float, float]
+
+
+class WordStore:
+    def __init__(self, boxes: np.ndarray, text: str, offsets: np.ndarray):
+        self.boxes = boxes
+        self.text = text
+        self.offsets = offsets
+        # Plain-int copy of the offsets: slicing the text buffer with NumPy scalars is slow.
+        self._off = offsets.tolist()
+
+    @classmethod
+    def from_tuples(cls, items: Iterable[Sequence]) -> "WordStore":
+        items = list(items)
+        boxes = np.array([(x0, x1, top, bottom) for _, x0, x1, top, bottom in items], dtype=BOX_DTYPE)
+        return cls._with_texts(boxes, [t for t, *_ in items])
+
+    @classmethod
+    def _with_texts(cls, boxes: np.ndarray, texts: List[str]) -> "WordStore":
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        if texts:
+            offsets[1:] = np.cumsum([len(t) for t in texts])
+        return cls(boxes, "".join(texts), offsets)
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def text_at(self, k: int) -> str:
+        return self.text[self._off[k]:self._off[k + 1]]
+
+    def texts(self, idx: Iterable[int]) -> List[str]:
+        if isinstance(idx, np.ndarray):
+            idx = idx.tolist()
+        off, text = self._off, self.text
+        return [text[off[k]:off[k + 1]] for k in idx]
+
+    def tuples(self, idx: Optional[np.ndarray] = None) -> List[WordTuple]:
+        """Materialize (text, x0, x1, top, bottom) tuples, for all words or just `idx`."""
+        boxes = self.boxes if idx is None else self.boxes[idx]
+        texts = self.texts(range(len(self)) if idx is None else idx)
+        return list(zip(texts, *(boxes[f].tolist() for f in BOX_DTYPE.names)))
+
+    def take(self, idx: np.ndarray) -> "WordStore":
+        """New store holding only the words at `idx` (in that order)."""
+        idx = np.asarray(idx, dtype=np.int64)
+        return WordStore._with_texts(self.boxes[idx], self.texts(idx))
+
+
+def cluster_lines(store: WordStore, y_tol: float = 3.0) -> List[np.ndarray]:
+    """
+    Group words into lines by 'top' with tolerance, returning index arrays into
+    `store`, each ordered by x0. Same grouping as the list-based clusterer: words
+    sorted by (top, x0); a line starts at a word and takes every following word
+    whose top is within y_tol of the line's first word.
+    """
+    n = len(store)
+    if n == 0:
+        return []
+    tops = store.boxes["top"]
+    x0s = store.boxes["x0"]
+    order = np.lexsort((x0s, tops))
+    sorted_tops = tops[order]
+
+    lines: List[np.ndarray] = []
+    start = 0
+    while start < n:
+        y_ref = sorted_tops[start]
+        end = int(np.searchsorted(sorted_tops, y_ref + y_tol, side="right"))
+        # searchsorted compares top <= y_ref + y_tol; the reference check is
+        # top - y_ref <= y_tol, so fix up the boundary against float rounding.
+        while end < n and sorted_tops[end] - y_ref <= y_tol:
+            end += 1
+        while end > start + 1 and sorted_tops[end - 1] - y_ref > y_tol:
+            end -= 1
+        seg = order[start:end]
+        lines.append(seg[np.argsort(x0s[seg], kind="stable")])
+        start = end
+    return lines
+
+
+def line_extents(store: WordStore, lines: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-line (x0_min, top_min, bottom_max) via segmented reductions."""
+    if not lines:
+        empty = np.empty(0, dtype="f8")
+        return empty, empty, empty
+    flat = np.concatenate(lines)
+    starts = np.zeros(len(lines), dtype=np.int64)
+    starts[1:] = np.cumsum([len(seg) for seg in lines])[:-1]
+    boxes = store.boxes[flat]
+    return (
+        np.minimum.reduceat(boxes["x0"], starts),
+        np.minimum.reduceat(boxes["top"], starts),
+        np.maximum.reduceat(boxes["bottom"], starts),
+    )
+
+
+class TableRegionIndex:
+    """
+    Uniform-grid index over a page's (padded) table bboxes.
+
+    A word can only be fully inside a bbox if its (x0, top) corner is, so each
+    bbox is registered in every grid cell its padded extent covers and a word is
+    tested only against the bboxes of the cell holding its corner. The final test
+    is the exact padded-containment check, so answers match a linear scan.
+    """
+
+    def __init__(
+        self,
+        bboxes: Sequence[Tuple[float, float, float, float]],
+        pad: float = 2.0,
+        cell: float = 36.0,
+    ):
+        self.pad = pad
+        self.cell = cell
+        self.bboxes = np.array([tuple(b) for b in bboxes], dtype="f8").reshape(-1, 4)
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+        for k, (x0, top, x1, bottom) in enumerate(self.bboxes.tolist()):
+            for cx in range(math.floor((x0 - pad) / cell), math.floor((x1 + pad) / cell) + 1):
+                for cy in range(math.floor((top - pad) / cell), math.floor((bottom + pad) / cell) + 1):
+                    self.grid.setdefault((cx, cy), []).append(k)
+
+    def __bool__(self) -> bool:
+        return bool(self.grid)
+
+    def contains(self, x0: float, x1: float, top: float, bottom: float) -> bool:
+        """Is the word box inside any table region (padded)?"""
+        pad = self.pad
+        for k in self.grid.get((math.floor(x0 / self.cell), math.floor(top / self.cell)), ()):
+            bx0, btop, bx1, bbottom = self.bboxes[k]
+            if x0 >= bx0 - pad and x1 <= bx1 + pad and top >= btop - pad and bottom <= bbottom + pad:
+                return True
+        return False
+
+    def mask(self, store: WordStore) -> np.ndarray:
+        """Batch form of contains(): boolean mask over every word in `store`."""
+        inside = np.zeros(len(store), dtype=bool)
+        if not self.grid or not len(store):
+            return inside
+        b = store.boxes
+        cx = np.floor(b["x0"] / self.cell).astype(np.int64)
+        cy = np.floor(b["top"] / self.cell).astype(np.int64)
+        keys = (cx << 32) + cy
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        pad = self.pad
+        for (gx, gy), ids in self.grid.items():
+            key = (gx << 32) + gy
+            lo = np.searchsorted(sorted_keys, key, side="left")
+            hi = np.searchsorted(sorted_keys, key, side="right")
+            if lo == hi:
+                continue
+            sel = order[lo:hi]
+            wb = b[sel]
+            hit = np.zeros(len(sel), dtype=bool)
+            for k in ids:
+                bx0, btop, bx1, bbottom = self.bboxes[k]
+                hit |= (
+                    (wb["x0"] >= bx0 - pad)
+                    & (wb["x1"] <= bx1 + pad)
+                    & (wb["top"] >= btop - pad)
+                    & (wb["bottom"] <= bbottom + pad)
+                )
+            inside[sel] |= hit
+        return inside
+
+    def outside(self, store: WordStore) -> WordStore:
+        """The words of `store` not inside any table region, original order kept."""
+        if not self:
+            return store
+        return store.take(np.flatnonzero(~self.mask(store)))
+
+
+def inside_any_bbox(
+    store: WordStore,
+    bboxes: List[Tuple[float, float, float, float]],
+    pad: float = 2.0,
+) -> np.ndarray:
+    """Boolean mask of words fully inside any (x0, top, x1, bottom) bbox, padded."""
+    return TableRegionIndex(bboxes, pad).mask(store)